@@ -0,0 +1,78 @@
+"""
+Бенчмарк времени старта screenshot_parser
+Проверяет, что импорт укладывается в бюджет и не тянет тяжелые зависимости
+
+Запуск:
+    python benchmark_startup.py
+    STARTUP_BUDGET_MS=100 STARTUP_RUNS=5 python benchmark_startup.py
+
+Код возврата 1 - регрессия (превышен бюджет или загружен тяжелый модуль)
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Бюджет на импорт screenshot_parser (медиана по запускам)
+STARTUP_BUDGET_MS = float(os.getenv('STARTUP_BUDGET_MS', '100'))
+STARTUP_RUNS = int(os.getenv('STARTUP_RUNS', '5'))
+
+# Модули, которые должны загружаться только в стадии, где нужны
+HEAVY_MODULES = ['playwright', 'PIL', 'requests', 'httpx', 'tweepy', 'openai', 'image_pipeline']
+
+CHECK_MODULES_CODE = (
+    "import sys, screenshot_parser; "
+    f"print('HEAVY:' + ','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def measure_import_ms():
+    """Импортирует screenshot_parser в чистом процессе, возвращает кумулятивное время (мс)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import screenshot_parser'],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    for line in result.stderr.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| screenshot_parser$', line)
+        if match:
+            return int(match.group(1)) / 1000
+    raise RuntimeError(f"Не удалось измерить импорт:\n{result.stderr[-2000:]}")
+
+
+def loaded_heavy_modules():
+    """Список тяжелых модулей, загруженных импортом screenshot_parser"""
+    result = subprocess.run(
+        [sys.executable, '-c', CHECK_MODULES_CODE],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    line = next((l for l in result.stdout.splitlines() if l.startswith('HEAVY:')), 'HEAVY:')
+    return [m for m in line[len('HEAVY:'):].split(',') if m]
+
+
+def main():
+    timings = [measure_import_ms() for _ in range(STARTUP_RUNS)]
+    median = statistics.median(timings)
+    heavy = loaded_heavy_modules()
+
+    print(f"Импорт screenshot_parser: медиана {median:.1f} мс (min {min(timings):.1f}, max {max(timings):.1f}, запусков {STARTUP_RUNS})")
+    print(f"Бюджет: {STARTUP_BUDGET_MS:.0f} мс")
+
+    failed = False
+    if median > STARTUP_BUDGET_MS:
+        print(f"✗ Превышен бюджет старта: {median:.1f} > {STARTUP_BUDGET_MS:.0f} мс")
+        failed = True
+    if heavy:
+        print(f"✗ При импорте загружены тяжелые модули: {', '.join(heavy)}")
+        failed = True
+
+    if not failed:
+        print("✓ Старт в бюджете")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Circuit breaker по домену источника
+Version: 1.0.0
+
+Захват, закончившийся отказом домена (антибот, таймаут навигации), увеличивает
+счетчик домена в CACHE_DIR/circuit_breaker.json. После BREAKER_FAILURE_THRESHOLD
+таких захватов подряд домен "разомкнут" на BREAKER_COOLDOWN_HOURS: следующие
+запуски не тратят на него попытки. После паузы разрешается одна пробная попытка:
+успех сбрасывает счетчик, отказ снова размыкает цепь.
+"""
+
+import logging
+import os
+import time
+
+from json_cache import load_json_cache, save_json_cache
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_BREAKER_PATH = os.path.join(os.getenv('CACHE_DIR', '.cache'), 'circuit_breaker.json')
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '3'))
+BREAKER_COOLDOWN_HOURS = float(os.getenv('BREAKER_COOLDOWN_HOURS', '6'))
+
+_breaker_state = None
+
+
+def load_breaker_state():
+    """Загружает (один раз за процесс) состояние доменов"""
+    global _breaker_state
+    if _breaker_state is None:
+        _breaker_state = load_json_cache(CIRCUIT_BREAKER_PATH, "circuit breaker")
+    return _breaker_state
+
+
+def save_breaker_state():
+    """Сохраняет состояние доменов"""
+    save_json_cache(CIRCUIT_BREAKER_PATH, load_breaker_state(), "circuit breaker")
+
+
+def get_open_until(domain):
+    """
+    Время (unix), до которого домен разомкнут
+
+    Returns:
+        float или None если попытки разрешены
+    """
+    entry = load_breaker_state().get(domain)
+    if entry and entry.get('open_until', 0) > time.time():
+        return entry['open_until']
+    return None
+
+
+def record_failure(domain, failure):
+    """Засчитывает захват, закончившийся отказом домена; размыкает цепь на пороге"""
+    state = load_breaker_state()
+    entry = state.setdefault(domain, {"failures": 0})
+    entry['failures'] += 1
+    entry['last_failure'] = failure
+    entry['failed_at'] = time.time()
+
+    if entry['failures'] >= BREAKER_FAILURE_THRESHOLD:
+        entry['open_until'] = time.time() + BREAKER_COOLDOWN_HOURS * 3600
+        logger.warning(
+            f"  🔌 {domain}: {entry['failures']} отказов подряд ({failure}) - "
+            f"домен пропускается {BREAKER_COOLDOWN_HOURS:g} ч"
+        )
+    else:
+        logger.info(f"  🔌 {domain}: отказ {entry['failures']}/{BREAKER_FAILURE_THRESHOLD} ({failure})")
+    save_breaker_state()
+
+
+def record_success(domain):
+    """Успешный захват замыкает цепь и сбрасывает счетчик"""
+    if load_breaker_state().pop(domain, None) is not None:
+        logger.info(f"  🔌 {domain}: захват успешен, счетчик отказов сброшен")
+        save_breaker_state()
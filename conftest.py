@@ -0,0 +1,22 @@
+"""
+Общие фикстуры pytest
+
+test_screenshot.py - ручной скрипт с браузером (python test_screenshot.py <source_key>),
+pytest его не собирает.
+"""
+
+import pytest
+
+import history_store
+
+collect_ignore = ["test_screenshot.py"]
+
+
+@pytest.fixture
+def history_db(tmp_path, monkeypatch):
+    """Пустая база истории во временной директории (без импорта старого JSON)"""
+    history_store.close_history_db()
+    monkeypatch.setattr(history_store, 'HISTORY_DB_PATH', str(tmp_path / 'publication_history.db'))
+    monkeypatch.setattr(history_store, 'LEGACY_HISTORY_PATH', str(tmp_path / 'publication_history.json'))
+    yield history_store
+    history_store.close_history_db()
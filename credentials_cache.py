@@ -0,0 +1,86 @@
+"""
+Кэш проверки учетных данных (Telegram, Twitter, OpenAI)
+Version: 1.0.0
+
+Результат проверки хранится в CACHE_DIR/credentials.json по sha256 от токена:
+- валидный токен не проверяется повторно CREDENTIALS_TTL_HOURS
+- невалидный (401 на реальном запросе) - сервис пропускается CREDENTIALS_INVALID_TTL_HOURS
+- смена токена = другой хэш = новая проверка
+Сами токены в кэш не пишутся.
+"""
+
+import hashlib
+import logging
+import os
+import time
+
+from json_cache import load_json_cache, save_json_cache
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_CACHE_PATH = os.path.join(os.getenv('CACHE_DIR', '.cache'), 'credentials.json')
+CREDENTIALS_TTL_HOURS = float(os.getenv('CREDENTIALS_TTL_HOURS', '24'))
+CREDENTIALS_INVALID_TTL_HOURS = float(os.getenv('CREDENTIALS_INVALID_TTL_HOURS', '1'))
+
+_credentials_cache = None
+
+
+def hash_secret(*parts):
+    """sha256 от секретов (токен или набор ключей)"""
+    return hashlib.sha256("\0".join(part or '' for part in parts).encode('utf-8')).hexdigest()
+
+
+def load_credentials_cache():
+    """Загружает (один раз за процесс) кэш проверок"""
+    global _credentials_cache
+    if _credentials_cache is None:
+        _credentials_cache = load_json_cache(CREDENTIALS_CACHE_PATH, "кэша учетных данных")
+    return _credentials_cache
+
+
+def save_credentials_cache():
+    """Сохраняет кэш проверок"""
+    save_json_cache(CREDENTIALS_CACHE_PATH, load_credentials_cache(), "кэш учетных данных")
+
+
+def get_cached_validation(service, secret_hash):
+    """
+    Возвращает действующий результат проверки
+
+    Returns:
+        dict: {"valid": bool, "info": dict, "checked_at": float} или None
+              (нет записи, другой токен или истек TTL)
+    """
+    entry = load_credentials_cache().get(service)
+    if not entry or entry.get('hash') != secret_hash:
+        return None
+
+    ttl_hours = CREDENTIALS_TTL_HOURS if entry.get('valid') else CREDENTIALS_INVALID_TTL_HOURS
+    if time.time() - entry.get('checked_at', 0) > ttl_hours * 3600:
+        return None
+    return entry
+
+
+def store_validation(service, secret_hash, valid, info=None):
+    """Запоминает результат проверки (после getMe или реального запроса)"""
+    cache = load_credentials_cache()
+    previous = cache.get(service)
+    # Уже подтвержден недавно - не переписываем файл на каждом успешном запросе
+    if (valid and previous and previous.get('hash') == secret_hash and previous.get('valid')
+            and time.time() - previous.get('checked_at', 0) < CREDENTIALS_TTL_HOURS * 3600 / 2):
+        return
+    cache[service] = {
+        "hash": secret_hash,
+        "valid": valid,
+        "info": info or {},
+        "checked_at": time.time()
+    }
+    save_credentials_cache()
+
+
+def invalidate(service):
+    """Сбрасывает результат проверки: следующая проверка пойдет в сеть"""
+    cache = load_credentials_cache()
+    if cache.pop(service, None) is not None:
+        logger.info(f"  🔑 Кэш проверки {service} сброшен")
+        save_credentials_cache()
@@ -0,0 +1,188 @@
+"""
+История публикаций в SQLite
+Version: 1.0.0
+
+- publications: журнал публикаций (только добавление), индекс (source, ts)
+- state: служебные значения (twitter_retry_at и т.п.)
+- Разовый импорт из publication_history.json при первом открытии
+- Одно соединение на процесс, выборки cooldown / окна heatmap - один индексный запрос
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', 'publication_history.db')
+LEGACY_HISTORY_PATH = 'publication_history.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS publications (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    ts REAL NOT NULL,
+    published_at TEXT NOT NULL,
+    name TEXT,
+    telegram INTEGER,
+    twitter INTEGER,
+    dhash TEXT,
+    imported INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_publications_source_ts ON publications (source, ts);
+CREATE TABLE IF NOT EXISTS state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_connection = None
+
+
+def get_history_db():
+    """Открывает (один раз за процесс) базу истории и импортирует старый JSON"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(HISTORY_DB_PATH)
+        _connection.executescript(SCHEMA)
+        import_legacy_history(_connection)
+        count = _connection.execute("SELECT COUNT(*) FROM publications").fetchone()[0]
+        logger.info(f"✓ История публикаций: {HISTORY_DB_PATH} ({count} записей)")
+    return _connection
+
+
+def close_history_db():
+    """Закрывает соединение (в конце запуска, перед коммитом файла базы)"""
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+def _to_ts(value):
+    """datetime или ISO-строка -> unix timestamp"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _from_ts(ts):
+    """unix timestamp -> datetime (UTC)"""
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+def import_legacy_history(connection):
+    """Разово переносит publication_history.json (последняя публикация по источнику) в базу"""
+    if connection.execute("SELECT 1 FROM state WHERE key = 'legacy_imported'").fetchone():
+        return
+    if not os.path.exists(LEGACY_HISTORY_PATH):
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('legacy_imported', 'none')")
+        return
+
+    try:
+        with open(LEGACY_HISTORY_PATH, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось прочитать {LEGACY_HISTORY_PATH} для импорта: {e}")
+        return
+
+    last_publication = history.get("last_publication", {})
+    image_hashes = history.get("image_hashes", {})
+    rows = []
+    for source, published_at in history.get("last_published", {}).items():
+        try:
+            ts = _to_ts(published_at)
+        except (ValueError, TypeError, AttributeError):
+            logger.warning(f"  ⚠️ Пропускаю {source}: невалидное время {published_at!r}")
+            continue
+        is_last = last_publication.get("source") == source
+        rows.append((
+            source, ts, _from_ts(ts).isoformat(),
+            last_publication.get("name") if is_last else None,
+            int(bool(last_publication.get("telegram"))) if is_last else None,
+            int(bool(last_publication.get("twitter"))) if is_last else None,
+            image_hashes.get(source, {}).get("dhash")
+        ))
+
+    with connection:
+        connection.executemany(
+            "INSERT INTO publications (source, ts, published_at, name, telegram, twitter, dhash, imported) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+            rows
+        )
+        if history.get("twitter_retry_at"):
+            connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('twitter_retry_at', ?)", (history["twitter_retry_at"],))
+        connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('legacy_imported', ?)", (datetime.now(timezone.utc).isoformat(),))
+    logger.info(f"📥 Импортировано из {LEGACY_HISTORY_PATH}: {len(rows)} источников")
+
+
+def record_publication(source, name=None, telegram=False, twitter=False, dhash=None, published_at=None):
+    """Добавляет запись о публикации"""
+    ts = _to_ts(published_at or datetime.now(timezone.utc))
+    connection = get_history_db()
+    with connection:
+        connection.execute(
+            "INSERT INTO publications (source, ts, published_at, name, telegram, twitter, dhash) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (source, ts, _from_ts(ts).isoformat(), name, int(bool(telegram)), int(bool(twitter)), dhash)
+        )
+
+
+def get_last_published(source, start=None, end=None):
+    """
+    Время последней публикации источника (опционально - внутри [start, end))
+
+    Returns:
+        datetime (UTC) или None
+    """
+    query = "SELECT MAX(ts) FROM publications WHERE source = ?"
+    params = [source]
+    if start is not None:
+        query += " AND ts >= ?"
+        params.append(_to_ts(start))
+    if end is not None:
+        query += " AND ts < ?"
+        params.append(_to_ts(end))
+    return _from_ts(get_history_db().execute(query, params).fetchone()[0])
+
+
+def count_publications(source, start, end):
+    """Число публикаций источника в [start, end) (например, за день)"""
+    return get_history_db().execute(
+        "SELECT COUNT(*) FROM publications WHERE source = ? AND ts >= ? AND ts < ?",
+        (source, _to_ts(start), _to_ts(end))
+    ).fetchone()[0]
+
+
+def get_last_hash(source):
+    """
+    dHash последней опубликованной версии источника
+
+    Returns:
+        tuple: (dhash, datetime публикации) или (None, None)
+    """
+    row = get_history_db().execute(
+        "SELECT dhash, ts FROM publications WHERE source = ? AND dhash IS NOT NULL ORDER BY ts DESC LIMIT 1",
+        (source,)
+    ).fetchone()
+    return (row[0], _from_ts(row[1])) if row else (None, None)
+
+
+def get_state(key):
+    """Служебное значение или None"""
+    row = get_history_db().execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def set_state(key, value):
+    """Записывает служебное значение (None - удаляет)"""
+    connection = get_history_db()
+    with connection:
+        if value is None:
+            connection.execute("DELETE FROM state WHERE key = ?", (key,))
+        else:
+            connection.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
@@ -0,0 +1,192 @@
+"""
+Обработка изображений для публикации
+Version: 1.0.0
+
+- JPEG-кодирование под лимит размера (поиск quality в памяти)
+- Рендишены для всех получателей из одного декодирования
+- Перцептивный хэш (dHash) для пропуска неизмененных скриншотов
+"""
+
+import logging
+from io import BytesIO
+
+from PIL import Image
+
+from sources_config import IMAGE_SETTINGS, DEDUPE_SETTINGS
+
+logger = logging.getLogger(__name__)
+
+# Режимы субдискретизации цветности PIL
+SUBSAMPLING_MODES = {
+    "4:4:4": 0,
+    "4:2:2": 1,
+    "4:2:0": 2
+}
+
+
+def _encode(img, quality, subsampling, progressive):
+    """Кодирует изображение в JPEG в памяти"""
+    buffer = BytesIO()
+    img.save(
+        buffer,
+        'JPEG',
+        quality=quality,
+        subsampling=SUBSAMPLING_MODES[subsampling],
+        progressive=progressive,
+        optimize=True
+    )
+    return buffer.getvalue()
+
+
+def encode_jpeg_to_budget(img, max_bytes, max_quality=None, min_quality=None,
+                          subsampling=None, try_444=None, progressive=None):
+    """
+    Кодирует изображение в JPEG с максимальным quality, который влезает в max_bytes
+
+    Сначала пробует max_quality (обычно одна попытка), затем бинарный поиск
+    quality между min_quality и max_quality. Если не влезает даже min_quality -
+    изображение уменьшается и поиск повторяется.
+
+    Args:
+        img: PIL.Image (RGB)
+        max_bytes: Лимит размера результата в байтах
+        max_quality: Верхняя граница quality (по умолчанию IMAGE_SETTINGS['quality'])
+        min_quality: Нижняя граница quality (по умолчанию IMAGE_SETTINGS['jpeg_min_quality'])
+        subsampling: "4:2:0" / "4:2:2" / "4:4:4"
+        try_444: Сначала попробовать 4:4:4 (четкий текст) при max_quality
+        progressive: Progressive JPEG
+
+    Returns:
+        tuple: (bytes, dict параметров кодирования)
+    """
+    max_quality = max_quality or IMAGE_SETTINGS['quality']
+    min_quality = min_quality or IMAGE_SETTINGS.get('jpeg_min_quality', 40)
+    subsampling = subsampling or IMAGE_SETTINGS.get('jpeg_subsampling', '4:2:0')
+    try_444 = IMAGE_SETTINGS.get('jpeg_try_444', False) if try_444 is None else try_444
+    progressive = IMAGE_SETTINGS.get('jpeg_progressive', False) if progressive is None else progressive
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    attempts = 0
+    for round_number in range(4):
+        # Быстрый путь: лучшее качество сразу влезает
+        if try_444 and subsampling != '4:4:4':
+            data = _encode(img, max_quality, '4:4:4', progressive)
+            attempts += 1
+            if len(data) <= max_bytes:
+                return data, {"quality": max_quality, "subsampling": '4:4:4', "progressive": progressive,
+                              "size": img.size, "attempts": attempts}
+
+        data = _encode(img, max_quality, subsampling, progressive)
+        attempts += 1
+        if len(data) <= max_bytes:
+            return data, {"quality": max_quality, "subsampling": subsampling, "progressive": progressive,
+                          "size": img.size, "attempts": attempts}
+
+        # Бинарный поиск максимального quality в лимите
+        best = None
+        low, high = min_quality, max_quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = _encode(img, quality, subsampling, progressive)
+            attempts += 1
+            if len(candidate) <= max_bytes:
+                best = (candidate, quality)
+                low = quality + 1
+            else:
+                high = quality - 1
+
+        if best:
+            return best[0], {"quality": best[1], "subsampling": subsampling, "progressive": progressive,
+                             "size": img.size, "attempts": attempts}
+
+        if round_number == 3:
+            break
+
+        # Даже min_quality не влезает - уменьшаем изображение пропорционально перерасходу
+        ratio = (max_bytes / len(data)) ** 0.5 * 0.9
+        new_size = (max(1, int(img.size[0] * ratio)), max(1, int(img.size[1] * ratio)))
+        logger.info(f"  ↘️  JPEG не влезает в {max_bytes / 1024:.0f} KB, уменьшаю до {new_size[0]}x{new_size[1]}")
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+
+    raise ValueError(f"Не удалось закодировать JPEG в {max_bytes} байт")
+
+
+def build_renditions(img, targets=None):
+    """
+    Кодирует все рендишены из одного уже декодированного изображения
+
+    Каждая цель задает max_width/max_height (опционально), max_bytes и quality.
+    Если рендишен совпадает по размеру и quality с уже закодированным и
+    влезает в лимит - bytes переиспользуются без повторного кодирования.
+
+    Args:
+        img: PIL.Image (RGB), уже обрезанный/уменьшенный под Telegram
+        targets: Dict {имя: параметры} (по умолчанию IMAGE_SETTINGS['renditions'])
+
+    Returns:
+        dict: {имя: {"bytes", "size", "quality", "reused"}}
+    """
+    targets = targets or IMAGE_SETTINGS['renditions']
+    renditions = {}
+
+    for name, target in targets.items():
+        variant = img
+        max_width = target.get('max_width')
+        max_height = target.get('max_height')
+        if max_width and max_height and (img.size[0] > max_width or img.size[1] > max_height):
+            variant = img.copy()
+            variant.thumbnail((max_width, max_height), Image.Resampling.LANCZOS)
+
+        max_quality = target.get('quality', IMAGE_SETTINGS['quality'])
+        max_bytes = target['max_bytes']
+
+        reused = next(
+            (r for r in renditions.values()
+             if r['size'] == variant.size and r['quality'] == max_quality and len(r['bytes']) <= max_bytes),
+            None
+        )
+        if reused:
+            renditions[name] = dict(reused, reused=True)
+            continue
+
+        data, params = encode_jpeg_to_budget(variant, max_bytes, max_quality=max_quality)
+        renditions[name] = {"bytes": data, "size": params['size'], "quality": params['quality'], "reused": False}
+
+    return renditions
+
+
+def describe_renditions(renditions):
+    """Строка для лога: имя WxH размер quality"""
+    return ", ".join(
+        f"{name} {r['size'][0]}x{r['size'][1]} {len(r['bytes']) / 1024:.0f} KB q{r['quality']}{' (=)' if r['reused'] else ''}"
+        for name, r in renditions.items()
+    )
+
+
+def dhash(img, hash_size=None):
+    """
+    Difference hash: знаки градиента яркости на уменьшенной копии
+
+    Returns:
+        str: hex-строка из hash_size * hash_size бит
+    """
+    hash_size = hash_size or DEDUPE_SETTINGS['hash_size']
+    small = img.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = small.tobytes()  # Режим L: один байт на пиксель
+
+    bits = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            bits = (bits << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def hash_distance(first, second):
+    """Расстояние Хэмминга между двумя dHash (None если несравнимы)"""
+    if not first or not second or len(first) != len(second):
+        return None
+    return bin(int(first, 16) ^ int(second, 16)).count('1')
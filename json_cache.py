@@ -0,0 +1,61 @@
+"""
+JSON-кэши в CACHE_DIR: учетные данные, circuit breaker, cookie-баннеры, ответы AI
+Version: 1.0.0
+
+Запись атомарная: JSON пишется во временный файл рядом с кэшем и заменяет
+его через os.replace. Падение посреди записи или параллельный запуск
+не оставляют обрезанный файл - читатель видит прежнюю или новую версию целиком.
+"""
+
+import json
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+
+def load_json_cache(path, label):
+    """
+    Читает кэш из JSON-файла
+
+    Args:
+        path: Путь к файлу кэша
+        label: Название кэша для логов ("кэша учетных данных")
+
+    Returns:
+        dict: Содержимое или {} (нет файла, ошибка чтения)
+    """
+    try:
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except Exception as e:
+        logger.warning(f"⚠️ Ошибка загрузки {label}: {e}")
+    return {}
+
+
+def save_json_cache(path, data, label):
+    """
+    Атомарно сохраняет кэш: временный файл + os.replace
+
+    Returns:
+        bool: Сохранен ли кэш (ошибка записи не прерывает работу)
+    """
+    tmp_path = None
+    try:
+        directory = os.path.dirname(path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить {label}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+        return False
@@ -11,26 +11,52 @@ Version: 2.0.0 - Hashtags on top, max 2 short
 """
 
 import os
+import time
 import logging
 import base64
-from openai import OpenAI
+import hashlib
+from collections import OrderedDict
+
+from credentials_cache import hash_secret, get_cached_validation, store_validation
+from json_cache import load_json_cache, save_json_cache
 
 logger = logging.getLogger(__name__)
 
 # OpenAI API Key
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
-# Инициализация клиента
+OPENAI_MODEL = "gpt-4o-mini"
+
+# Кэш ответов: ключ = источник + версия промпта + модель + хэш изображения
+AI_CACHE_PATH = os.path.join(os.getenv('CACHE_DIR', '.cache'), 'ai_comments.json')
+AI_CACHE_TTL_HOURS = float(os.getenv('AI_CACHE_TTL_HOURS', '24'))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', '200'))
+_ai_cache = None
+
+# Клиент создается при первом запросе (импорт openai - сотни мс)
 client = None
-if OPENAI_API_KEY:
+_client_initialized = False
+
+
+def get_client():
+    """Возвращает OpenAI клиент, создавая его при первом вызове"""
+    global client, _client_initialized
+    if _client_initialized:
+        return client
+    _client_initialized = True
+    
+    if not OPENAI_API_KEY:
+        logger.warning("⚠️ OPENAI_API_KEY not found - AI comments disabled")
+        return None
+    
     try:
+        from openai import OpenAI
         client = OpenAI(api_key=OPENAI_API_KEY)
         logger.info("✓ OpenAI client initialized")
     except Exception as e:
         logger.error(f"✗ Failed to initialize OpenAI client: {e}")
         client = None
-else:
-    logger.warning("⚠️ OPENAI_API_KEY not found - AI comments disabled")
+    return client
 
 
 # Промпты для разных типов источников - Alpha Take + Context Tag + AI Hashtags
@@ -187,28 +213,77 @@ HASHTAGS: #Crypto #Trending
 }
 
 
-def encode_image_to_base64(image_path):
-    """Конвертирует изображение в base64 для OpenAI API"""
+def encode_image_to_base64(image):
+    """Конвертирует изображение (bytes или путь к файлу) в base64 для OpenAI API"""
     try:
-        with open(image_path, "rb") as image_file:
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return base64.b64encode(image).decode('utf-8')
+        with open(image, "rb") as image_file:
             return base64.b64encode(image_file.read()).decode('utf-8')
     except Exception as e:
         logger.error(f"Error encoding image: {e}")
         return None
 
 
-def get_ai_comment(source_key, image_path):
+def get_ai_cache_key(source_key, prompt, image_bytes):
+    """Ключ кэша: источник, sha256 промпта, модель, sha256 изображения"""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+    image_hash = hashlib.sha256(image_bytes).hexdigest()
+    return f"{source_key}:{prompt_hash}:{OPENAI_MODEL}:{image_hash}"
+
+
+def load_ai_cache():
+    """Загружает (один раз за процесс) кэш ответов в порядке использования"""
+    global _ai_cache
+    if _ai_cache is None:
+        entries = load_json_cache(AI_CACHE_PATH, "AI cache")
+        _ai_cache = OrderedDict(sorted(entries.items(), key=lambda item: item[1].get('used_at', 0)))
+    return _ai_cache
+
+
+def save_ai_cache():
+    """Сохраняет кэш ответов: удаляет просроченные, затем LRU до AI_CACHE_MAX_ENTRIES"""
+    cache = load_ai_cache()
+    now = time.time()
+    for key in [key for key, entry in cache.items() if now - entry.get('created_at', 0) > AI_CACHE_TTL_HOURS * 3600]:
+        del cache[key]
+    while len(cache) > AI_CACHE_MAX_ENTRIES:
+        cache.popitem(last=False)
+    
+    save_json_cache(AI_CACHE_PATH, cache, "AI cache")
+
+
+def get_cached_ai_comment(cache_key):
+    """Возвращает ответ из кэша (и отмечает использование) или None"""
+    cache = load_ai_cache()
+    entry = cache.get(cache_key)
+    if not entry:
+        return None
+    
+    age_hours = (time.time() - entry.get('created_at', 0)) / 3600
+    if age_hours > AI_CACHE_TTL_HOURS:
+        del cache[cache_key]
+        return None
+    
+    entry['used_at'] = time.time()
+    cache.move_to_end(cache_key)
+    logger.info(f"  ⚡ Alpha Take from cache ({age_hours:.1f}h old) - no OpenAI request")
+    return entry['result']
+
+
+def get_ai_comment(source_key, image):
     """
     Получает AI Alpha Take от OpenAI для скриншота
     
     Args:
         source_key: Ключ источника (fear_greed, btc_etf, etc)
-        image_path: Путь к изображению скриншота
+        image: JPEG скриншота (bytes) или путь к изображению
         
     Returns:
         dict: {"alpha_take": "..."}
         или None если ошибка
     """
+    client = get_client()
     if not client:
         logger.warning("OpenAI client not initialized - skipping AI comment")
         return None
@@ -220,8 +295,26 @@ def get_ai_comment(source_key, image_path):
             logger.warning(f"No prompt configured for source: {source_key}")
             return None
         
+        # Повтор/ретрай того же скриншота - ответ из кэша без токенов
+        image_bytes = image if isinstance(image, (bytes, bytearray, memoryview)) else None
+        if image_bytes is None:
+            with open(image, 'rb') as f:
+                image_bytes = f.read()
+        cache_key = get_ai_cache_key(source_key, prompt, bytes(image_bytes))
+        cached = get_cached_ai_comment(cache_key)
+        if cached:
+            save_ai_cache()
+            return cached
+        
+        # Ключ недавно отклонен (401) - не отправляем запрос
+        key_hash = hash_secret(OPENAI_API_KEY)
+        validation = get_cached_validation('openai', key_hash)
+        if validation and not validation['valid']:
+            logger.warning("⚠️ OpenAI key was rejected recently (401) - skipping AI comment")
+            return None
+        
         # Кодируем изображение в base64
-        base64_image = encode_image_to_base64(image_path)
+        base64_image = encode_image_to_base64(image_bytes)
         if not base64_image:
             return None
         
@@ -229,7 +322,7 @@ def get_ai_comment(source_key, image_path):
         
         # Вызываем OpenAI API
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=OPENAI_MODEL,
             messages=[
                 {
                     "role": "user",
@@ -251,6 +344,8 @@ def get_ai_comment(source_key, image_path):
             temperature=0.7
         )
         
+        store_validation('openai', key_hash, True)
+        
         # Парсим ответ
         content = response.choices[0].message.content.strip()
         logger.info(f"  OpenAI response: {content}")
@@ -287,15 +382,24 @@ def get_ai_comment(source_key, image_path):
         if hashtags:
             logger.info(f"  ✓ Hashtags: {hashtags}")
         
-        return {
+        result = {
             "indicator_line": indicator_line,  # NEW!
             "alpha_take": alpha_take,
             "context_tag": context_tag,
             "hashtags": hashtags
         }
         
+        now = time.time()
+        load_ai_cache()[cache_key] = {"result": result, "created_at": now, "used_at": now}
+        save_ai_cache()
+        
+        return result
+        
     except Exception as e:
         logger.error(f"Error getting Alpha Take: {e}")
+        if getattr(e, 'status_code', None) == 401:
+            store_validation('openai', hash_secret(OPENAI_API_KEY), False)
+            return None
         import traceback
         traceback.print_exc()
         return None
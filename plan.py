@@ -0,0 +1,85 @@
+"""
+Планировщик без браузера: нужен ли захват в этом запуске и какого источника
+Version: 1.0.0
+
+Проверяет расписание POST_SCHEDULE, гарантированный heatmap, cooldown по
+истории публикаций и circuit breaker домена (те же правила, что
+screenshot_parser) без Playwright. Workflow ставит Chromium и запускает
+парсер только если захват нужен.
+
+Запуск:
+    python plan.py            # JSON в stdout, логи в stderr
+
+Вывод:
+    {"due": true, "source": "fear_greed", "name": "...", "skip_reason": null,
+     "breaker_open_until": null, "planned_at": "...", "next_slot": "..."}
+
+Домен источника разомкнут - плановый пропуск: due false, skip_reason "breaker open".
+В GitHub Actions дополнительно пишет due/source/skip_reason в $GITHUB_OUTPUT.
+"""
+
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+# stdout - только машиночитаемый результат: логи в stderr до импорта парсера
+# (его basicConfig после этого ничего не меняет)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    stream=sys.stderr
+)
+
+import screenshot_parser
+
+
+def plan():
+    """
+    Выбирает источник по расписанию
+
+    Returns:
+        dict: {"due": bool, "source": str или None, "name": str или None,
+               "skip_reason": "breaker open" или None, "breaker_open_until": str или None,
+               "planned_at": str, "next_slot": str - начало следующего слота (UTC)}
+    """
+    now_utc = datetime.now(timezone.utc)
+    source_key, source_config = screenshot_parser.select_scheduled_source(now_utc)
+    
+    # Разомкнутый домен без других кандидатов слота: Chromium не нужен
+    open_until = None
+    if source_key and len(screenshot_parser.get_speculative_candidates(source_key, now_utc)) == 1:
+        open_until = screenshot_parser.get_breaker_open_until(source_key, source_config)
+    
+    return {
+        "due": bool(source_key) and not open_until,
+        "source": source_key,
+        "name": source_config['name'] if source_config else None,
+        "skip_reason": "breaker open" if open_until else None,
+        "breaker_open_until": open_until.isoformat() if open_until else None,
+        "planned_at": now_utc.isoformat(),
+        "next_slot": screenshot_parser.get_next_slot_start(now_utc).isoformat()
+    }
+
+
+def write_github_output(result):
+    """Пишет due/source/skip_reason в $GITHUB_OUTPUT (для if: в следующих шагах workflow)"""
+    output_path = os.getenv('GITHUB_OUTPUT')
+    if not output_path:
+        return
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write(f"due={'true' if result['due'] else 'false'}\n")
+        f.write(f"source={result['source'] or ''}\n")
+        f.write(f"skip_reason={result['skip_reason'] or ''}\n")
+
+
+def main():
+    result = plan()
+    write_github_output(result)
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Индекс расписания публикаций
+Version: 1.0.0
+
+POST_SCHEDULE и окна GUARANTEED_POSTS компилируются при импорте в
+отсортированные списки интервалов (минуты от полуночи в SCHEDULE_TIMEZONE)
+с проверкой пересечений. Поиск - bisect, время - zoneinfo вместо фиксированного +3 ч.
+
+- due_slots(now): слоты, открытые в момент now
+- next_slot(after): ближайший слот, начинающийся после after (для точного сна)
+"""
+
+import bisect
+import logging
+from datetime import datetime, time, timedelta, timezone
+
+from sources_config import POST_SCHEDULE, GUARANTEED_POSTS, SCHEDULE_TIMEZONE
+
+logger = logging.getLogger(__name__)
+
+
+def get_schedule_timezone(name=SCHEDULE_TIMEZONE):
+    """tzinfo расписания (без базы tzdata - фиксированное смещение MSK)"""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception as e:
+        logger.warning(f"⚠️ Часовой пояс {name} недоступен ({e}), использую UTC+3")
+        return timezone(timedelta(hours=3), 'MSK')
+
+
+SCHEDULE_TZ = get_schedule_timezone()
+
+
+def hours_to_minutes(value):
+    """16.35 -> 981 (16:21): часы дробью, как в time_range_msk"""
+    return int(round(value * 60))
+
+
+def compile_schedule(schedule, range_key='time_range_msk'):
+    """
+    Компилирует расписание в отсортированный список интервалов
+
+    Args:
+        schedule: Dict {имя: {range_key: (start_hours, end_hours), ...}}
+        range_key: Поле с интервалом в часах
+
+    Returns:
+        list: [{"name", "start", "end" (минуты от полуночи), "config"}], по start
+
+    Raises:
+        ValueError: Пустой/перевернутый интервал, выход за сутки или пересечение слотов
+    """
+    slots = []
+    for name, config in schedule.items():
+        start_hours, end_hours = config[range_key]
+        start, end = hours_to_minutes(start_hours), hours_to_minutes(end_hours)
+        if not 0 <= start < end <= 24 * 60:
+            raise ValueError(f"Слот {name}: некорректный интервал {start_hours}-{end_hours}")
+        slots.append({"name": name, "start": start, "end": end, "config": config})
+
+    slots.sort(key=lambda slot: slot['start'])
+    for previous, current in zip(slots, slots[1:]):
+        if current['start'] < previous['end']:
+            raise ValueError(
+                f"Слоты {previous['name']} и {current['name']} пересекаются: "
+                f"{format_minutes(previous['start'])}-{format_minutes(previous['end'])} и "
+                f"{format_minutes(current['start'])}-{format_minutes(current['end'])}"
+            )
+    return slots
+
+
+def format_minutes(minutes):
+    """981 -> '16:21'"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+# Компилируется один раз при импорте
+SCHEDULE_INDEX = compile_schedule(POST_SCHEDULE)
+GUARANTEED_INDEX = compile_schedule(GUARANTEED_POSTS, 'window_msk')
+_schedule_starts = [slot['start'] for slot in SCHEDULE_INDEX]
+_guaranteed_starts = [slot['start'] for slot in GUARANTEED_INDEX]
+
+
+def to_schedule_time(moment):
+    """Переводит aware datetime во время расписания"""
+    return moment.astimezone(SCHEDULE_TZ)
+
+
+def local_interval(day, start_minutes, end_minutes):
+    """Интервал дня day (дата в поясе расписания) -> (start, end) в UTC"""
+    midnight = datetime.combine(day, time(0), tzinfo=SCHEDULE_TZ)
+    start = (midnight + timedelta(minutes=start_minutes)).astimezone(timezone.utc)
+    end = (midnight + timedelta(minutes=end_minutes)).astimezone(timezone.utc)
+    return start, end
+
+
+def _occurrence(slot, day):
+    """Слот индекса в конкретный день: словарь с start/end в UTC"""
+    start, end = local_interval(day, slot['start'], slot['end'])
+    return {"name": slot['name'], "start": start, "end": end, "config": slot['config']}
+
+
+def _index_for(guaranteed):
+    return (GUARANTEED_INDEX, _guaranteed_starts) if guaranteed else (SCHEDULE_INDEX, _schedule_starts)
+
+
+def due_slots(now, guaranteed=False):
+    """
+    Слоты, открытые в момент now
+
+    Args:
+        now: aware datetime
+        guaranteed: Искать в окнах GUARANTEED_POSTS вместо POST_SCHEDULE
+
+    Returns:
+        list: [{"name", "start", "end" (UTC), "config"}] - пусто или один слот
+    """
+    index, starts = _index_for(guaranteed)
+    local = to_schedule_time(now)
+    minute = local.hour * 60 + local.minute + local.second / 60
+    position = bisect.bisect_right(starts, minute) - 1
+    if position >= 0 and minute < index[position]['end']:
+        return [_occurrence(index[position], local.date())]
+    return []
+
+
+def next_slot(after, guaranteed=False):
+    """
+    Ближайший слот, начинающийся строго после after
+
+    Returns:
+        dict: {"name", "start", "end" (UTC), "config"} или None если расписание пустое
+    """
+    index, starts = _index_for(guaranteed)
+    if not index:
+        return None
+    local = to_schedule_time(after)
+    minute = local.hour * 60 + local.minute + local.second / 60
+    position = bisect.bisect_right(starts, minute)
+    if position < len(index):
+        return _occurrence(index[position], local.date())
+    return _occurrence(index[0], local.date() + timedelta(days=1))
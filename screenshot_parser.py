@@ -14,31 +14,46 @@ Version: 2.0.0 (Guaranteed Heatmap + Hashtags on Top)
 ✅ Хэштеги вверху, max 2 коротких (NEW v2.0.0)
 """
 
+import argparse
 import asyncio
-from playwright.async_api import async_playwright
+import base64
+import re
+import shutil
 import time
 import json
 import traceback
 from datetime import datetime, timezone, timedelta
-import requests
 import os
 import sys
 import logging
-import tweepy
 from io import BytesIO
 import tempfile
 import platform
-from PIL import Image
 import html  # FIX ISSUE #26: Для HTML escaping
+from urllib.parse import urlparse
 
 # Импорты конфигурации
 from sources_config import (
     SCREENSHOT_SOURCES, 
     POST_SCHEDULE,  # ✅ НОВОЕ: Расписание постов
     IMAGE_SETTINGS, 
-    SCREENSHOT_SETTINGS
+    SCREENSHOT_SETTINGS,
+    DEFAULT_BLOCK_RESOURCES,
+    BROWSER_PROFILE_SETTINGS,
+    DEDUPE_SETTINGS,
+    GUARANTEED_POSTS,
+    RETRY_POLICIES
 )
 import random  # ✅ НОВОЕ: Для случайного выбора источников
+from telegram_client import telegram_request, close_session as close_telegram_session
+from credentials_cache import hash_secret, get_cached_validation, store_validation, invalidate as invalidate_credentials
+from schedule_index import due_slots, next_slot, to_schedule_time, local_interval, hours_to_minutes
+from circuit_breaker import get_open_until, record_failure as record_domain_failure, record_success as record_domain_success
+from json_cache import load_json_cache, save_json_cache
+from history_store import get_last_published, get_last_hash, count_publications, record_publication, get_state, set_state, close_history_db
+
+# Тяжелые зависимости (playwright, PIL, requests, tweepy, openai) импортируются
+# внутри функций: cron-запуск без публикации не должен их загружать
 
 # Пытаемся импортировать fcntl (только Unix)
 try:
@@ -80,9 +95,35 @@ except Exception as e:
 # Глобальные настройки
 MAX_RETRIES = int(os.getenv('MAX_RETRIES', '2'))
 
+# Daemon-режим: пауза перед повтором после неудачной попытки в открытом слоте
+DAEMON_RETRY_SECONDS = int(os.getenv('DAEMON_RETRY_SECONDS', '300'))
+
+# Батч-режим: сколько BrowserContext снимают одновременно
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', '3'))
+
+# Браузер
+BROWSER_LAUNCH_ARGS = [
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-blink-features=AutomationControlled'  # ✅ Скрыть автоматизацию
+]
+DEFAULT_USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+
+# Отпечатки для свежего контекста после антибот-проверки
+FINGERPRINT_USER_AGENTS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/130.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36 Edg/131.0.0.0'
+]
+
 # Telegram настройки
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+# Несколько каналов/чатов через запятую: "-100123,@channel,-100456"
+TELEGRAM_CHAT_IDS = [chat.strip() for chat in (TELEGRAM_CHAT_ID or '').split(',') if chat.strip()]
 
 # Twitter API настройки
 TWITTER_API_KEY = os.getenv('TWITTER_API_KEY')
@@ -94,10 +135,34 @@ TWITTER_BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN')
 # Включить/выключить Twitter
 TWITTER_ENABLED = os.getenv('TWITTER_ENABLED', 'true').lower() == 'true'
 
+# Дедлайн на загрузку картинки / публикацию твита (вызовы tweepy идут в отдельном потоке)
+TWITTER_TIMEOUT_SECONDS = int(os.getenv('TWITTER_TIMEOUT_SECONDS', '60'))
+
+# Клиенты Twitter создаются один раз на процесс
+_twitter_clients = None
+
 # Директории
 SCREENSHOTS_DIR = "screenshots"
 os.makedirs(SCREENSHOTS_DIR, exist_ok=True)
 
+# Сохранять скриншоты на диск: false (только память), true (JPEG в архив), debug (+ исходный PNG)
+SAVE_SCREENSHOTS = os.getenv('SAVE_SCREENSHOTS', 'false').lower()
+
+# Локальные кэши между запусками (профили браузера и т.д.)
+CACHE_DIR = os.getenv('CACHE_DIR', '.cache')
+BROWSER_PROFILES_DIR = os.path.join(CACHE_DIR, 'browser_profiles')
+
+# Блокировки постоянных профилей по домену
+_profile_locks = {}
+
+# Снятие оверлеев: сетка точек по области захвата и лимит проверяемых узлов
+OVERLAY_GRID_STEPS = 5
+OVERLAY_NODE_BUDGET = 400
+
+# Кэш обработчиков cookie-баннеров по доменам
+CONSENT_CACHE_PATH = os.path.join(CACHE_DIR, 'consent_cache.json')
+_consent_cache = None
+
 
 def get_lock_file_path():
     """Возвращает путь к lock-файлу (кросс-платформенный)"""
@@ -183,54 +248,29 @@ def release_lock(lock_file, lock_path):
         logger.warning(f"⚠️ Не удалось удалить lock-файл: {e}")
 
 
-def load_publication_history():
-    """Загружает историю публикаций из JSON файла"""
-    try:
-        if os.path.exists('publication_history.json'):
-            with open('publication_history.json', 'r', encoding='utf-8') as f:
-                history = json.load(f)
-                logger.info(f"✓ История публикаций загружена: {len(history.get('last_published', {}))} источников")
-                return history
-    except Exception as e:
-        logger.warning(f"⚠️ Ошибка загрузки истории: {e}")
-    
-    logger.info("📝 Создание новой истории публикаций")
-    return {"last_published": {}}
-
-
-def save_publication_history(history):
-    """Сохраняет историю публикаций в JSON файл"""
-    try:
-        with open('publication_history.json', 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-        logger.info("✓ История публикаций обновлена")
-        return True
-    except Exception as e:
-        logger.error(f"✗ Ошибка сохранения истории: {e}")
-        return False
-
-
-def validate_telegram_credentials():
+async def validate_telegram_credentials():
     """Проверяет что Telegram токены валидные"""
-    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_ID:
+    if not TELEGRAM_BOT_TOKEN or not TELEGRAM_CHAT_IDS:
         logger.warning("⚠️ Telegram credentials не установлены")
         return False
     
+    # Токен уже проверен - без запроса getMe (сброс при 401 на отправке)
+    token_hash = hash_secret(TELEGRAM_BOT_TOKEN)
+    cached = get_cached_validation('telegram', token_hash)
+    if cached and cached['valid']:
+        logger.info(f"✓ Telegram бот: @{cached['info'].get('username', 'unknown')} (проверен ранее)")
+        return True
+    
     try:
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/getMe"
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code != 200:
-            logger.error(f"✗ Telegram токен невалидный: {response.status_code}")
-            return False
+        bot_info = await telegram_request('getMe', token=TELEGRAM_BOT_TOKEN, timeout=5)
         
-        bot_info = response.json()
         if not bot_info.get('ok'):
-            logger.error("✗ Telegram токен невалидный")
+            logger.error(f"✗ Telegram токен невалидный: {bot_info.get('error_code', '')} {bot_info.get('description', '')}")
             return False
         
         bot_username = bot_info.get('result', {}).get('username', 'unknown')
         logger.info(f"✓ Telegram бот: @{bot_username}")
+        store_validation('telegram', token_hash, True, {"username": bot_username})
         return True
         
     except Exception as e:
@@ -279,19 +319,101 @@ def cleanup_old_screenshots(max_age_hours=24):
         logger.warning(f"⚠️ Ошибка cleanup старых файлов: {e}")
 
 
-def optimize_image_for_telegram(image_path, skip_width_padding=False, crop=None):
-    """Оптимизирует изображение для Telegram
+def load_image(image):
+    """Открывает изображение из bytes или пути к файлу"""
+    from PIL import Image
+    
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(BytesIO(image))
+    return Image.open(image)
+
+
+def read_image_bytes(image):
+    """Возвращает bytes изображения (bytes или путь к файлу)"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    with open(image, 'rb') as f:
+        return f.read()
+
+
+def get_image_size(image):
+    """Размер изображения в байтах (bytes или путь к файлу)"""
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return len(image)
+    return os.path.getsize(image)
+
+
+def get_rendition(result, name):
+    """JPEG рендишена для получателя; без него (рендишен не настроен) - telegram"""
+    renditions = result['renditions']
+    return (renditions.get(name) or renditions['telegram'])['bytes']
+
+
+def archive_screenshot(source_key, image_bytes, raw_bytes=None, thumbnail_bytes=None):
+    """
+    Сохраняет скриншот на диск только если включен SAVE_SCREENSHOTS
+    
+    Args:
+        image_bytes: Оптимизированный JPEG
+        raw_bytes: Исходный PNG (сохраняется только в режиме debug)
+        thumbnail_bytes: Превью для архива
+    
+    Returns:
+        str: Путь к JPEG или None
+    """
+    if SAVE_SCREENSHOTS == 'false':
+        return None
+    
+    try:
+        timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+        base_name = os.path.join(SCREENSHOTS_DIR, f"{source_key}_{timestamp}")
+        
+        if SAVE_SCREENSHOTS == 'debug' and raw_bytes:
+            with open(f"{base_name}.png", 'wb') as f:
+                f.write(raw_bytes)
+        
+        path = f"{base_name}_optimized.jpg"
+        with open(path, 'wb') as f:
+            f.write(image_bytes)
+        if thumbnail_bytes:
+            with open(f"{base_name}_thumb.jpg", 'wb') as f:
+                f.write(thumbnail_bytes)
+        logger.info(f"  💾 Скриншот сохранен в архив: {path}")
+        return path
+    except Exception as e:
+        logger.warning(f"  ⚠️ Не удалось сохранить скриншот: {e}")
+        return None
+
+
+def optimize_image_for_telegram(image, skip_width_padding=False, crop=None):
+    """Оптимизирует изображение для Telegram (только telegram-рендишен)"""
+    renditions, _ = render_image(image, skip_width_padding=skip_width_padding, crop=crop)
+    return renditions['telegram']['bytes'] if renditions else None
+
+
+def render_image(image, skip_width_padding=False, crop=None):
+    """Декодирует скриншот один раз и готовит рендишены для всех получателей
+    
+    Crop/resize/padding применяются один раз, затем из того же изображения
+    кодируются telegram, twitter, ai и thumbnail (IMAGE_SETTINGS['renditions']).
     
     Args:
-        image_path: Путь к изображению
+        image: Скриншот (bytes) или путь к изображению
         skip_width_padding: Пропустить добавление padding по ширине
         crop: Dict с параметрами обрезки {"top": N, "right": N, "bottom": N, "left": N} в пикселях
+    
+    Returns:
+        tuple: (renditions, dhash) - renditions {имя: {"bytes", "size", "quality", "reused"}};
+               при ошибке обработки - (None, None)
     """
     try:
-        logger.info(f"🖼️  Оптимизация изображения: {image_path}")
+        from PIL import Image
+        from image_pipeline import build_renditions, describe_renditions, dhash
+        
+        logger.info(f"🖼️  Оптимизация изображения{': ' + image if isinstance(image, str) else ''}")
         
-        img = Image.open(image_path)
-        original_size = os.path.getsize(image_path)
+        img = load_image(image)
+        original_size = get_image_size(image)
         
         logger.info(f"  Исходный размер: {img.size[0]}x{img.size[1]} ({original_size / 1024:.1f} KB)")
         
@@ -324,7 +446,7 @@ def optimize_image_for_telegram(image_path, skip_width_padding=False, crop=None)
         # CRITICAL: Валидация размеров изображения
         if img.size[0] == 0 or img.size[1] == 0:
             logger.error(f"  ✗ ОШИБКА: Изображение имеет нулевые размеры: {img.size[0]}x{img.size[1]}")
-            return None
+            return None, None
         
         # Изменяем размер если больше лимита
         max_width = IMAGE_SETTINGS['telegram_max_width']
@@ -366,117 +488,143 @@ def optimize_image_for_telegram(image_path, skip_width_padding=False, crop=None)
             img = new_img
             logger.info(f"  ✓ Добавлен padding: {img.size[0]}x{img.size[1]} (было {original_width}px, padding {paste_x}px с каждой стороны)")
         
-        # Сохраняем оптимизированное изображение
-        # FIX BUG #1: Правильная обработка любого расширения
-        base_name = os.path.splitext(image_path)[0]
-        optimized_path = f"{base_name}_optimized.jpg"
-        img.save(optimized_path, 'JPEG', quality=IMAGE_SETTINGS['quality'], optimize=True)
+        # Все рендишены из одного изображения: лучшее quality в лимите каждого получателя
+        renditions = build_renditions(img)
         
-        optimized_size = os.path.getsize(optimized_path)
+        optimized_size = len(renditions['telegram']['bytes'])
         logger.info(f"  ✓ Оптимизировано: {optimized_size / 1024:.1f} KB (экономия: {(1 - optimized_size/original_size)*100:.1f}%)")
+        logger.info(f"  🎞️  Рендишены: {describe_renditions(renditions)}")
         
-        return optimized_path
+        # Хэш с того же изображения - для пропуска неизмененных публикаций
+        return renditions, dhash(img)
         
     except Exception as e:
+        # Исходник не подменяет рендишен: он не проверен на лимиты и без hash,
+        # а захват с (None, None) повторяется по политике image
         logger.error(f"✗ Ошибка оптимизации изображения: {e}")
-        # FIX BUG #4: Проверяем что исходник существует
-        if os.path.exists(image_path):
-            logger.info(f"  ✓ Возвращаю исходный файл: {image_path}")
-            return image_path
-        else:
-            logger.error(f"  ✗ Исходный файл не существует: {image_path}")
-            return None
+        return None, None
 
 
-def send_telegram_photo(photo_path, caption, parse_mode='HTML'):
-    """Отправляет фото в Telegram"""
-    temp_compressed_file = None  # Track temporary file for cleanup
+async def send_telegram_photo(photo, caption, parse_mode='HTML', chat_ids=None):
+    """Отправляет фото в Telegram (keep-alive сессия, повторы на 429/5xx)
     
+    JPEG загружается один раз - в первый чат; остальным чатам параллельно
+    отправляется file_id из ответа, без повторной загрузки.
+    
+    Args:
+        photo: JPEG (bytes) или путь к файлу
+        chat_ids: Список чатов (по умолчанию TELEGRAM_CHAT_IDS)
+    
+    Returns:
+        bool: True если фото доставлено хотя бы в один чат
+    """
     try:
+        from image_pipeline import encode_jpeg_to_budget
+        
         # FIX BUG #2: Проверка размера файла (Telegram limit: 10 MB)
-        MAX_TELEGRAM_PHOTO_SIZE = 10 * 1024 * 1024  # 10 MB
-        file_size = os.path.getsize(photo_path)
+        MAX_TELEGRAM_PHOTO_SIZE = IMAGE_SETTINGS['renditions']['telegram']['max_bytes']
+        photo_bytes = read_image_bytes(photo)
+        file_size = len(photo_bytes)
         
+        # Рендишены из render_image уже в лимите; сюда попадают только внешние файлы
         if file_size > MAX_TELEGRAM_PHOTO_SIZE:
-            logger.warning(f"⚠️ Файл слишком большой: {file_size/1024/1024:.1f} MB (лимит 10 MB)")
-            logger.info("  Применяю дополнительное сжатие...")
+            logger.warning(f"⚠️ Файл слишком большой: {file_size/1024/1024:.1f} MB (лимит {MAX_TELEGRAM_PHOTO_SIZE/1024/1024:.0f} MB)")
             
             try:
-                img = Image.open(photo_path)
-                # FIX BUG #21: Создаем ВРЕМЕННЫЙ файл вместо перезаписи
-                base_name = os.path.splitext(photo_path)[0]
-                temp_compressed = f"{base_name}_telegram_compressed.jpg"
-                
-                # Агрессивное сжатие
-                img.save(temp_compressed, 'JPEG', quality=60, optimize=True)
-                new_size = os.path.getsize(temp_compressed)
-                logger.info(f"  ✓ Сжато до {new_size/1024/1024:.1f} MB")
-                
-                if new_size > MAX_TELEGRAM_PHOTO_SIZE:
-                    logger.error(f"  ✗ Даже после сжатия файл слишком большой!")
-                    os.remove(temp_compressed)  # Cleanup
-                    return False
-                
-                # FIX BUG #27: Track temp file для cleanup в finally
-                temp_compressed_file = temp_compressed
-                photo_path = temp_compressed
+                photo_bytes, params = encode_jpeg_to_budget(load_image(photo_bytes), MAX_TELEGRAM_PHOTO_SIZE)
+                logger.info(f"  ✓ Сжато до {len(photo_bytes)/1024/1024:.1f} MB (quality {params['quality']})")
             except Exception as e:
                 logger.error(f"  ✗ Ошибка сжатия: {e}")
                 return False
         
-        url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendPhoto"
-        
         logger.info(f"📤 Отправка фото в Telegram...")
-        logger.info(f"  Файл: {photo_path}")
+        logger.info(f"  Размер: {len(photo_bytes) / 1024:.1f} KB")
         logger.info(f"  Подпись: {len(caption)} символов")
         
-        with open(photo_path, 'rb') as photo:
-            files = {'photo': photo}
-            data = {
-                'chat_id': TELEGRAM_CHAT_ID,
-                'caption': caption,
-                'parse_mode': parse_mode
-            }
+        chat_ids = list(chat_ids or TELEGRAM_CHAT_IDS)
+        if len(chat_ids) > 1:
+            logger.info(f"  Чатов: {len(chat_ids)}")
+        
+        # Загружаем JPEG, пока не получим file_id (если первый чат недоступен - следующий)
+        file_id = None
+        delivered = []
+        failed = []
+        while chat_ids and not file_id:
+            chat_id = chat_ids.pop(0)
+            data = {'chat_id': chat_id, 'caption': caption, 'parse_mode': parse_mode}
+            files = {'photo': ('screenshot.jpg', photo_bytes, 'image/jpeg')}
+            response = await telegram_request('sendPhoto', data=data, files=files, token=TELEGRAM_BOT_TOKEN)
             
-            response = requests.post(url, files=files, data=data, timeout=30)
+            if response.get('ok'):
+                delivered.append(chat_id)
+                # Последний элемент photo - самый большой размер
+                file_id = response.get('result', {}).get('photo', [{}])[-1].get('file_id')
+            else:
+                failed.append(chat_id)
+                logger.error(f"✗ Ошибка отправки в {chat_id}: {response.get('error_code', '')} - {response.get('description', '')}")
+                if response.get('error_code') == 401:
+                    # Токен отозван: следующий запуск проверит его через getMe
+                    invalidate_credentials('telegram')
+                    break
         
-        if response.status_code == 200:
-            logger.info("✓ Фото отправлено в Telegram")
-            return True
-        else:
-            logger.error(f"✗ Ошибка отправки: {response.status_code} - {response.text}")
+        # Остальные чаты - параллельно по file_id
+        if chat_ids and file_id:
+            responses = await asyncio.gather(*[
+                telegram_request(
+                    'sendPhoto',
+                    data={'chat_id': chat_id, 'photo': file_id, 'caption': caption, 'parse_mode': parse_mode},
+                    token=TELEGRAM_BOT_TOKEN
+                )
+                for chat_id in chat_ids
+            ], return_exceptions=True)
+            for chat_id, response in zip(chat_ids, responses):
+                if isinstance(response, Exception):
+                    # Ошибка одного чата не отменяет доставку в остальные
+                    failed.append(chat_id)
+                    logger.error(f"✗ Ошибка отправки в {chat_id}: {response}")
+                elif response.get('ok'):
+                    delivered.append(chat_id)
+                else:
+                    failed.append(chat_id)
+                    logger.error(f"✗ Ошибка отправки в {chat_id}: {response.get('error_code', '')} - {response.get('description', '')}")
+        
+        if not delivered:
             return False
+        
+        logger.info(f"✓ Фото отправлено в Telegram{f' ({len(delivered)}/{len(delivered) + len(failed)} чатов, загрузка 1 раз)' if len(delivered) + len(failed) > 1 else ''}")
+        return True
             
     except Exception as e:
         logger.error(f"✗ Ошибка при отправке фото в Telegram: {e}")
         traceback.print_exc()
         return False
-        
-    finally:
-        # FIX BUG #27: Cleanup ВСЕГДА выполняется (даже при exception)
-        if temp_compressed_file and os.path.exists(temp_compressed_file):
-            try:
-                os.remove(temp_compressed_file)
-                logger.info(f"  🗑️  Удален временный файл: {temp_compressed_file}")
-            except Exception as cleanup_error:
-                logger.warning(f"  ⚠️ Не удалось удалить временный файл: {cleanup_error}")
 
 
 def init_twitter_client():
-    """Инициализирует Twitter API клиент"""
+    """Инициализирует Twitter API клиенты (один раз на процесс, дальше - из кэша)
+    
+    wait_on_rate_limit выключен: при лимите tweepy не спит минутами,
+    а бросает TooManyRequests - send_to_twitter откладывает публикацию.
+    """
+    global _twitter_clients
+    if _twitter_clients:
+        return _twitter_clients
+    
     try:
         if not all([TWITTER_API_KEY, TWITTER_API_SECRET, 
                     TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_TOKEN_SECRET]):
             logger.warning("⚠️ Twitter API ключи не установлены")
             return None
         
+        import tweepy
+        
         client = tweepy.Client(
             bearer_token=TWITTER_BEARER_TOKEN,
             consumer_key=TWITTER_API_KEY,
             consumer_secret=TWITTER_API_SECRET,
             access_token=TWITTER_ACCESS_TOKEN,
             access_token_secret=TWITTER_ACCESS_TOKEN_SECRET,
-            wait_on_rate_limit=True
+            wait_on_rate_limit=False
         )
         
         auth = tweepy.OAuth1UserHandler(
@@ -485,29 +633,63 @@ def init_twitter_client():
             TWITTER_ACCESS_TOKEN,
             TWITTER_ACCESS_TOKEN_SECRET
         )
-        api = tweepy.API(auth)
+        api = tweepy.API(auth, timeout=TWITTER_TIMEOUT_SECONDS)
         
+        _twitter_clients = {"client": client, "api": api}
         logger.info("✓ Twitter API клиент инициализирован")
-        return {"client": client, "api": api}
+        return _twitter_clients
         
     except Exception as e:
         logger.error(f"✗ Ошибка инициализации Twitter API: {e}")
         return None
 
 
-def send_to_twitter(title, hashtags, image_path):
-    """Отправляет твит с картинкой"""
+def get_twitter_retry_at(error):
+    """Время снятия лимита из x-rate-limit-reset (или через 15 минут - окно лимитов Twitter)"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return datetime.fromtimestamp(int(headers['x-rate-limit-reset']), timezone.utc)
+    except (KeyError, ValueError, TypeError):
+        return datetime.now(timezone.utc) + timedelta(minutes=15)
+
+
+async def run_twitter_call(func, *args, **kwargs):
+    """Вызывает синхронный tweepy вне event loop с ограничением по времени"""
+    return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), TWITTER_TIMEOUT_SECONDS)
+
+
+async def send_to_twitter(title, hashtags, image):
+    """Отправляет твит с картинкой
+    
+    Загрузка и публикация идут в отдельном потоке с дедлайном TWITTER_TIMEOUT_SECONDS.
+    
+    Args:
+        image: JPEG (bytes) или путь к файлу
+    
+    Returns:
+        dict: {"ok": bool, "retry_at": ISO-время снятия rate limit или None}
+    """
     try:
         if not TWITTER_ENABLED:
             logger.info("ℹ️  Twitter отключен")
-            return False
+            return {"ok": False, "retry_at": None}
         
         logger.info("\n🐦 ОТПРАВКА В TWITTER")
         
+        import tweepy
+        from image_pipeline import encode_jpeg_to_budget
+        
+        # Ключи недавно получили 401 - не тратим загрузку картинки
+        keys_hash = hash_secret(TWITTER_API_KEY, TWITTER_API_SECRET, TWITTER_ACCESS_TOKEN, TWITTER_ACCESS_TOKEN_SECRET)
+        cached = get_cached_validation('twitter', keys_hash)
+        if cached and not cached['valid']:
+            logger.warning("⚠️ Twitter ключи недавно отклонены (401), пропускаю")
+            return {"ok": False, "retry_at": None}
+        
         twitter = init_twitter_client()
         if not twitter:
             logger.error("✗ Не удалось инициализировать Twitter клиент")
-            return False
+            return {"ok": False, "retry_at": None}
         
         client = twitter["client"]
         api = twitter["api"]
@@ -523,131 +705,216 @@ def send_to_twitter(title, hashtags, image_path):
         
         # Загружаем картинку
         media_id = None
-        temp_twitter_file = None  # Track temporary file for cleanup
         
         try:
-            logger.info(f"🖼️  Загрузка картинки: {image_path}")
+            image_bytes = read_image_bytes(image)
+            logger.info(f"🖼️  Загрузка картинки: {len(image_bytes) / 1024:.1f} KB")
             
             # FIX BUG #7: Проверка размера файла (Twitter limit: 5 MB)
-            MAX_TWITTER_IMAGE_SIZE = 5 * 1024 * 1024  # 5 MB
-            file_size = os.path.getsize(image_path)
+            MAX_TWITTER_IMAGE_SIZE = IMAGE_SETTINGS['renditions']['twitter']['max_bytes']
+            file_size = len(image_bytes)
             
             if file_size > MAX_TWITTER_IMAGE_SIZE:
-                logger.warning(f"⚠️ Файл слишком большой для Twitter: {file_size/1024/1024:.1f} MB (лимит 5 MB)")
-                logger.info("  Применяю дополнительное сжатие для Twitter...")
-                
-                img = Image.open(image_path)
-                # FIX BUG #24: Правильный путь через splitext
-                base_name = os.path.splitext(image_path)[0]
-                temp_path = f"{base_name}_twitter.jpg"
-                img.save(temp_path, 'JPEG', quality=50, optimize=True)
+                logger.warning(f"⚠️ Файл слишком большой для Twitter: {file_size/1024/1024:.1f} MB (лимит {MAX_TWITTER_IMAGE_SIZE/1024/1024:.0f} MB)")
                 
-                # FIX BUG #28: Track temp file для cleanup в finally
-                temp_twitter_file = temp_path
-                image_path = temp_path
-                logger.info(f"  ✓ Сжато до {os.path.getsize(image_path)/1024/1024:.1f} MB")
+                # Лучшее quality в лимите Twitter вместо фиксированного quality=50
+                image_bytes, params = encode_jpeg_to_budget(load_image(image_bytes), MAX_TWITTER_IMAGE_SIZE)
+                logger.info(f"  ✓ Сжато до {len(image_bytes)/1024/1024:.1f} MB (quality {params['quality']})")
             
-            media = api.media_upload(filename=image_path)
+            media = await run_twitter_call(api.media_upload, filename='screenshot.jpg', file=BytesIO(image_bytes))
             media_id = media.media_id
             logger.info(f"✓ Картинка загружена, media_id: {media_id}")
             
+        except tweepy.TooManyRequests as e:
+            retry_at = get_twitter_retry_at(e)
+            logger.warning(f"⏸️  Twitter rate limit на загрузке картинки, повтор после {retry_at.strftime('%H:%M')} UTC")
+            return {"ok": False, "retry_at": retry_at.isoformat()}
+        except tweepy.Unauthorized as e:
+            logger.error(f"✗ Twitter ключи невалидны: {e}")
+            store_validation('twitter', keys_hash, False)
+            return {"ok": False, "retry_at": None}
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Загрузка картинки не уложилась в {TWITTER_TIMEOUT_SECONDS} сек")
         except Exception as e:
             logger.warning(f"⚠️ Ошибка загрузки картинки: {e}")
-            
-        finally:
-            # FIX BUG #28: Cleanup ВСЕГДА выполняется (даже при exception)
-            if temp_twitter_file and os.path.exists(temp_twitter_file):
-                try:
-                    os.remove(temp_twitter_file)
-                    logger.info(f"  🗑️  Удален временный файл Twitter: {temp_twitter_file}")
-                except Exception as cleanup_error:
-                    logger.warning(f"  ⚠️ Не удалось удалить временный файл: {cleanup_error}")
         
         # Публикуем твит
         try:
             if media_id:
-                response = client.create_tweet(text=tweet_text, media_ids=[media_id])
+                response = await run_twitter_call(client.create_tweet, text=tweet_text, media_ids=[media_id])
             else:
-                response = client.create_tweet(text=tweet_text)
+                response = await run_twitter_call(client.create_tweet, text=tweet_text)
             
             if response and hasattr(response, 'data'):
                 tweet_id = response.data.get('id') if hasattr(response.data, 'get') else response.data.id
                 logger.info(f"✓ Твит опубликован, ID: {tweet_id}")
-                return True
+                store_validation('twitter', keys_hash, True)
+                return {"ok": True, "retry_at": None}
             else:
                 logger.error("✗ Получен пустой ответ от Twitter API")
-                return False
-                
+                return {"ok": False, "retry_at": None}
+        
+        except tweepy.TooManyRequests as e:
+            retry_at = get_twitter_retry_at(e)
+            logger.warning(f"⏸️  Twitter rate limit, твит отложен до {retry_at.strftime('%H:%M')} UTC")
+            return {"ok": False, "retry_at": retry_at.isoformat()}
+        except tweepy.Unauthorized as e:
+            logger.error(f"✗ Twitter ключи невалидны: {e}")
+            store_validation('twitter', keys_hash, False)
+            return {"ok": False, "retry_at": None}
+        except asyncio.TimeoutError:
+            # Поток продолжает работу - твит может все же выйти
+            logger.error(f"✗ Публикация твита не уложилась в {TWITTER_TIMEOUT_SECONDS} сек (результат неизвестен)")
+            return {"ok": False, "retry_at": None}
         except Exception as e:
             logger.error(f"✗ Ошибка публикации твита: {e}")
-            return False
-    
+            return {"ok": False, "retry_at": None}
+            
     except Exception as e:
         logger.error(f"✗ Критическая ошибка отправки в Twitter: {e}")
         traceback.print_exc()
-        return False
+        return {"ok": False, "retry_at": None}
+
 
+# Кандидаты кнопок согласия: id (selector-строка для логов/кэша), css, text (подстрока) или exact;
+# accept - кнопка принимает cookies (согласие запоминается в профиле домена)
+CONSENT_CANDIDATES = [
+    # ПРИОРИТЕТ: Специфичные кнопки CoinMarketCap
+    {"id": 'button:has-text("Accept Cookies and Continue")', "css": "button", "text": "accept cookies and continue", "accept": True},
+    {"id": 'button:has-text("Accept All Cookies")', "css": "button", "text": "accept all cookies", "accept": True},
+    # Fallback: Общие селекторы
+    {"id": 'button:has-text("Accept")', "css": "button", "text": "accept", "accept": True},
+    {"id": 'button:has-text("Accept All")', "css": "button", "text": "accept all", "accept": True},
+    {"id": 'button:has-text("Agree")', "css": "button", "text": "agree", "accept": True},
+    {"id": 'button:text-is("OK")', "css": "button", "exact": "ok"},
+    {"id": 'text="Accept"', "css": "a, [role='button'], span, div", "exact": "accept", "accept": True},
+    {"id": '[aria-label="Close"]', "css": "[aria-label='Close']"},
+    {"id": 'button[class*="close"]', "css": "button[class*='close']"},
+    {"id": 'button[class*="dismiss"]', "css": "button[class*='dismiss']"},
+    {"id": 'button:has-text("×")', "css": "button", "text": "×"},
+]
 
-async def accept_cookies(page):
-    """Принимает cookies если баннер появился - СПЕЦИАЛЬНО ДЛЯ COINMARKETCAP"""
+# Закрытие баннера крестиком или "OK" не означает согласия: после него баннер
+# может вернуться, и проверка в профиле с согласием не должна пропускаться
+CONSENT_ACCEPT_IDS = {candidate['id'] for candidate in CONSENT_CANDIDATES if candidate.get('accept')}
+
+# JS: проверяет всех кандидатов за один вызов и кликает первого видимого
+CONSENT_PROBE_JS = """(args) => {
+    const visible = (el) => el.getClientRects().length > 0;
+    const ordered = args.preferred
+        ? args.candidates.filter(c => c.id === args.preferred).concat(args.candidates.filter(c => c.id !== args.preferred))
+        : args.candidates;
+    for (const c of ordered) {
+        let nodes;
+        try {
+            nodes = document.querySelectorAll(c.css);
+        } catch (e) {
+            continue;
+        }
+        for (const el of nodes) {
+            const text = (el.textContent || '').trim().toLowerCase();
+            if (c.text && !text.includes(c.text)) continue;
+            if (c.exact && text !== c.exact) continue;
+            if (!visible(el)) continue;
+            el.setAttribute('data-consent-clicked', '1');
+            el.click();
+            return c.id;
+        }
+    }
+    return null;
+}"""
+
+# CSS fallback: скрывает cookie-баннеры если кнопку не нашли
+CONSENT_HIDE_CSS = """
+    [class*="cookie"],
+    [class*="consent"],
+    [id*="cookie"],
+    [id*="consent"],
+    div[style*="position: fixed"][style*="bottom"],
+    div[class*="fixed"][class*="bottom"],
+    [class*="cookie-banner"],
+    [role="dialog"],
+    [class*="modal"] {
+        display: none !important;
+        visibility: hidden !important;
+    }
+"""
+
+# Домены без баннера: после стольких промахов подряд не ищем кнопку
+CONSENT_SKIP_AFTER_MISSES = 3
+# ...но раз в столько дней проверяем снова
+CONSENT_REPROBE_DAYS = 7
+
+
+def load_consent_cache():
+    """Загружает (один раз за процесс) кэш обработчиков согласия по доменам"""
+    global _consent_cache
+    if _consent_cache is None:
+        _consent_cache = load_json_cache(CONSENT_CACHE_PATH, "кэша cookie-баннеров")
+    return _consent_cache
+
+
+def save_consent_cache():
+    """Сохраняет кэш обработчиков согласия"""
+    save_json_cache(CONSENT_CACHE_PATH, load_consent_cache(), "кэш cookie-баннеров")
+
+
+async def accept_cookies(page, domain=None):
+    """
+    Принимает cookies если баннер появился - СПЕЦИАЛЬНО ДЛЯ COINMARKETCAP
+    
+    Все кандидаты проверяются одним page.evaluate. Сработавший селектор
+    запоминается по домену и пробуется первым; домены, где баннера ни разу
+    не было, после CONSENT_SKIP_AFTER_MISSES промахов не проверяются
+    (раз в CONSENT_REPROBE_DAYS дней - снова).
+    
+    Returns:
+        bool: Баннер принят кнопкой согласия (CONSENT_ACCEPT_IDS), а не закрыт
+    """
     try:
-        # ПРИОРИТЕТ: Специфичный селектор CoinMarketCap (из твоего кода!)
-        cmc_selectors = [
-            'button:has-text("Accept Cookies and Continue")',
-            'button:has-text("Accept All Cookies")',
-        ]
+        domain = domain or get_source_domain(page.url)
+        cache = load_consent_cache()
+        entry = cache.setdefault(domain, {"selector": None, "hits": 0, "misses": 0})
         
-        for selector in cmc_selectors:
+        skip_probe = False
+        if not entry.get('selector') and entry.get('misses', 0) >= CONSENT_SKIP_AFTER_MISSES:
             try:
-                button = await page.query_selector(selector)
-                if button:
-                    await button.click()
-                    logger.info("✓ CoinMarketCap cookie-баннер принят")
-                    await asyncio.sleep(2)  # Важная задержка!
-                    return True
-            except:
-                continue
+                last_probe = datetime.fromisoformat(entry.get('last_probe'))
+                skip_probe = datetime.now(timezone.utc) - last_probe < timedelta(days=CONSENT_REPROBE_DAYS)
+            except (TypeError, ValueError):
+                skip_probe = False
+        
+        clicked = None
+        if skip_probe:
+            logger.info(f"  ℹ️  {domain}: баннер согласия не встречался {entry['misses']} раз, поиск пропущен")
+        else:
+            clicked = await page.evaluate(CONSENT_PROBE_JS, {
+                "candidates": CONSENT_CANDIDATES,
+                "preferred": entry.get('selector')
+            })
+            entry['last_probe'] = datetime.now(timezone.utc).isoformat()
+            
+            if clicked:
+                entry['selector'] = clicked
+                entry['hits'] = entry.get('hits', 0) + 1
+                entry['misses'] = 0
+                logger.info(f"✓ Cookie-баннер принят: {clicked}")
+                # Ждем исчезновения кнопки вместо фиксированной паузы (не дольше 2 сек)
+                try:
+                    await page.wait_for_selector('[data-consent-clicked]', state='hidden', timeout=2000)
+                except Exception:
+                    pass
+            else:
+                entry['misses'] = entry.get('misses', 0) + 1
+            
+            save_consent_cache()
         
-        # Fallback: Общие селекторы
-        cookie_buttons = [
-            'button:has-text("Accept")',
-            'button:has-text("Accept All")',
-            'button:has-text("Agree")',
-            'button:has-text("OK")',
-            'text="Accept"',
-            '[aria-label="Close"]',
-            'button[class*="close"]',
-            'button[class*="dismiss"]',
-            'button:has-text("×")',
-        ]
-
-        for selector in cookie_buttons:
-            try:
-                button = await page.query_selector(selector)
-                if button:
-                    await button.click()
-                    logger.info("✓ Cookie-баннер принят")
-                    await asyncio.sleep(2)
-                    return True
-            except:
-                continue
+        if clicked:
+            return clicked in CONSENT_ACCEPT_IDS
 
         # Скрываем через CSS если ничего не сработало
         try:
-            await page.add_style_tag(content="""
-                [class*="cookie"],
-                [class*="consent"],
-                [id*="cookie"],
-                [id*="consent"],
-                div[style*="position: fixed"][style*="bottom"],
-                div[class*="fixed"][class*="bottom"],
-                [class*="cookie-banner"],
-                [role="dialog"],
-                [class*="modal"] {
-                    display: none !important;
-                    visibility: hidden !important;
-                }
-            """)
+            await page.add_style_tag(content=CONSENT_HIDE_CSS)
             logger.info("✓ Cookie-баннеры скрыты через CSS")
         except:
             pass
@@ -658,421 +925,1779 @@ async def accept_cookies(page):
         return False
 
 
-async def take_screenshot(page, source_config, source_key):
-    """Делает скриншот согласно конфигурации источника"""
-    screenshot_path = None  # CRITICAL: Initialize before try
-    optimized_path = None   # CRITICAL: Initialize before try
-    success = False         # Track if operation succeeded
-    
-    try:
-        url = source_config['url']
-        logger.info(f"\n📸 СКРИНШОТ: {source_config['name']}")
-        logger.info(f"  URL: {url}")
-        
-        # Загружаем страницу
-        await page.goto(url, wait_until='domcontentloaded', timeout=SCREENSHOT_SETTINGS['wait_timeout'])
-        logger.info("✓ Страница загружена")
-        
-        # Cookies и ожидание загрузки
-        logger.info("🍪 Обработка cookies...")
-        await accept_cookies(page)
-        
-        # Ожидание загрузки контента
-        base_wait = 5
-        extra_wait = source_config.get('extra_wait', 0)
-        total_wait = base_wait + extra_wait
-        logger.info(f"⏳ Ожидание загрузки контента ({total_wait} секунд{' (+ ' + str(extra_wait) + ' extra)' if extra_wait > 0 else ''})...")
-        await asyncio.sleep(total_wait)
-        
-        # Ждем конкретный элемент если указан
-        wait_for = source_config.get('wait_for')
-        if wait_for:
-            try:
-                await page.wait_for_selector(wait_for, timeout=15000)
-                logger.info(f"✓ Элемент найден: {wait_for}")
-            except Exception as e:
-                logger.warning(f"⚠️ Элемент не найден за 15 сек: {wait_for}")
-        
-        # Специальная обработка для heatmap (coin360.com)
-        if source_key == "heatmap":
-            try:
-                await asyncio.sleep(3)  # Дополнительная задержка для рендеринга canvas
-                logger.info("✓ Heatmap: дополнительная задержка 3 сек для загрузки canvas")
-            except Exception as e:
-                logger.warning(f"⚠️ Не удалось обработать heatmap: {e}")
-        
-        # Делаем скриншот
-        timestamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
-        screenshot_path = os.path.join(SCREENSHOTS_DIR, f"{source_key}_{timestamp}.png")
-        
-        # Закрываем модальное окно если требуется
-        close_modal = source_config.get('close_modal', False)
-        if close_modal:
-            try:
-                # Метод 1: Нажать Escape
-                await page.keyboard.press('Escape')
-                await asyncio.sleep(0.5)
-                logger.info("  ✓ Нажат Escape для закрытия модалки")
-                
-                # Метод 2: Клик по кнопкам закрытия
-                closed = await page.evaluate("""() => {
-                    // Попытка закрыть модальное окно разными способами
-                    const closeSelectors = [
-                        'button:has-text("Maybe Later")',  // Специально для COIN360
-                        'button:has-text("Later")',
-                        '[aria-label="Close"]',
-                        '[data-dismiss="modal"]',
-                        '.close',
-                        '.modal-close',
-                        'button[class*="close"]',
-                        '[class*="closeButton"]',
-                        'button[type="button"]',  // Любые кнопки
-                        'svg[class*="close"]',    // SVG иконки закрытия
-                        '[role="button"][aria-label*="close" i]'
-                    ];
-                    
-                    for (const sel of closeSelectors) {
-                        const btns = document.querySelectorAll(sel);
-                        for (const btn of btns) {
-                            // Проверяем что это похоже на кнопку закрытия
-                            const text = btn.textContent?.toLowerCase() || '';
-                            if (text.includes('close') || text.includes('later') || text.includes('×') || text.includes('✕') || !text) {
-                                btn.click();
-                                return true;
-                            }
-                        }
-                    }
-                    return false;
-                }""")
-                await asyncio.sleep(0.5)
-                
-                # Метод 3: Клик по backdrop (темный фон)
-                await page.evaluate("""() => {
-                    const backdrops = document.querySelectorAll('[class*="backdrop"], [class*="overlay"], [class*="modal-backdrop"]');
-                    backdrops.forEach(el => el.click());
-                }""")
-                await asyncio.sleep(0.5)
-                
-                # Метод 4: Принудительное скрытие всех модальных элементов
-                await page.evaluate("""() => {
-                    // Ищем все элементы с position: fixed и высоким z-index
-                    const allElements = document.querySelectorAll('*');
-                    allElements.forEach(el => {
-                        const style = window.getComputedStyle(el);
-                        const zIndex = parseInt(style.zIndex);
-                        const position = style.position;
-                        
-                        // Если fixed/absolute с высоким z-index - скрываем
-                        if ((position === 'fixed' || position === 'absolute') && zIndex > 1000) {
-                            el.style.display = 'none';
-                        }
-                    });
-                    
-                    // Также скрываем все явные модалки
-                    const modals = document.querySelectorAll('[class*="modal"], [class*="Modal"], [class*="dialog"], [class*="Dialog"], [class*="popup"], [class*="Popup"]');
-                    modals.forEach(el => {
-                        el.style.display = 'none';
-                        el.style.visibility = 'hidden';
-                        el.style.opacity = '0';
-                    });
-                }""")
-                await asyncio.sleep(1)
-                
-                logger.info("  ✓ Модальное окно закрыто (4 метода)")
-            except Exception as e:
-                logger.warning(f"  ⚠️ Не удалось закрыть модальное окно: {e}")
-        
-        # Скрываем ненужные элементы если указано
-        hide_elements = source_config.get('hide_elements')
-        if hide_elements:
-            try:
-                await page.evaluate("""(selector) => {
-                    const elements = document.querySelectorAll(selector);
-                    elements.forEach(el => {
-                        el.style.display = 'none';
-                        el.style.visibility = 'hidden';
-                    });
-                }""", hide_elements)
-                await asyncio.sleep(0.5)
-                logger.info(f"  ✓ Скрыты элементы: {hide_elements}")
-            except Exception as e:
-                logger.warning(f"  ⚠️ Не удалось скрыть элементы: {e}")
-        
-        selector = source_config.get('selector')
-        element_padding = source_config.get('element_padding', 0)  # Может быть int или dict
-        scale = source_config.get('scale', 1.0)  # Масштаб элемента (CSS zoom)
-        
-        # Нормализуем element_padding в dict
-        if isinstance(element_padding, (int, float)):
-            padding_dict = {'top': element_padding, 'right': element_padding, 'bottom': element_padding, 'left': element_padding}
-        elif isinstance(element_padding, dict):
-            padding_dict = {
-                'top': element_padding.get('top', 0),
-                'right': element_padding.get('right', 0),
-                'bottom': element_padding.get('bottom', 0),
-                'left': element_padding.get('left', 0)
+# JS: ждет паузу в DOM-мутациях внутри target (или до таймаута)
+DOM_QUIET_JS = """(target, args) => new Promise(resolve => {
+    const root = target || document.body;
+    const started = performance.now();
+    let mutations = 0;
+    let quietTimer = null;
+    let hardTimer = null;
+    const observer = new MutationObserver(records => {
+        mutations += records.length;
+        clearTimeout(quietTimer);
+        quietTimer = setTimeout(() => done(true), args.quietMs);
+    });
+    const done = (stable) => {
+        observer.disconnect();
+        clearTimeout(quietTimer);
+        clearTimeout(hardTimer);
+        resolve({stable, mutations, elapsed: performance.now() - started});
+    };
+    observer.observe(root, {subtree: true, childList: true, attributes: true, characterData: true});
+    quietTimer = setTimeout(() => done(true), args.quietMs);
+    hardTimer = setTimeout(() => done(false), args.timeoutMs);
+})"""
+
+# JS: ждет пока пиксели canvas перестанут меняться (сравнение уменьшенной копии)
+CANVAS_STABLE_JS = """(canvas, args) => new Promise(resolve => {
+    const started = performance.now();
+    const probe = document.createElement('canvas');
+    probe.width = 64;
+    probe.height = 36;
+    const ctx = probe.getContext('2d', {willReadFrequently: true});
+    const sample = () => {
+        if (!canvas.width || !canvas.height) return null;
+        ctx.clearRect(0, 0, probe.width, probe.height);
+        ctx.drawImage(canvas, 0, 0, probe.width, probe.height);
+        const data = ctx.getImageData(0, 0, probe.width, probe.height).data;
+        let hash = 0, filled = 0;
+        for (let i = 0; i < data.length; i += 4) {
+            hash = (hash * 31 + data[i] + data[i + 1] * 7 + data[i + 2] * 13) | 0;
+            if (data[i + 3]) filled++;
+        }
+        return filled ? hash : null;
+    };
+    let last = null;
+    let stableSince = null;
+    const tick = () => {
+        let current;
+        try {
+            current = sample();
+        } catch (e) {
+            // tainted canvas - пиксели недоступны
+            resolve({stable: false, error: String(e), elapsed: performance.now() - started});
+            return;
+        }
+        const now = performance.now();
+        if (current !== null && current === last) {
+            if (stableSince === null) stableSince = now;
+            if (now - stableSince >= args.quietMs) {
+                resolve({stable: true, elapsed: now - started});
+                return;
             }
-        else:
-            padding_dict = {'top': 0, 'right': 0, 'bottom': 0, 'left': 0}
-        
-        if selector:
-            # Скриншот конкретного элемента
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    # Применяем масштабирование если нужно
-                    if scale != 1.0:
-                        try:
-                            await page.evaluate("""(args) => {
-                                const el = document.querySelector(args.selector);
-                                if (el) {
-                                    el.style.transform = 'scale(' + args.scale + ')';
-                                    el.style.transformOrigin = 'top left';
-                                }
-                            }""", {"selector": selector, "scale": scale})
-                            await asyncio.sleep(0.5)  # Даем время на применение стилей
-                            logger.info(f"  ✓ Применен масштаб {scale}x")
-                        except Exception as e:
-                            logger.warning(f"  ⚠️ Не удалось применить масштаб: {e}")
-                    
-                    has_padding = any(v > 0 for v in padding_dict.values())
-                    
-                    if has_padding:
-                        # Получаем bounding box элемента
-                        box = await element.bounding_box()
-                        if box:
-                            # Учитываем масштаб при расчете размеров
-                            scaled_width = box['width'] * scale
-                            scaled_height = box['height'] * scale
-                            
-                            # Добавляем padding с учетом разных сторон
-                            clip = {
-                                'x': max(0, box['x'] - padding_dict['left']),
-                                'y': max(0, box['y'] - padding_dict['top']),
-                                'width': min(page.viewport_size['width'], scaled_width + padding_dict['left'] + padding_dict['right']),
-                                'height': min(page.viewport_size['height'], scaled_height + padding_dict['top'] + padding_dict['bottom'])
-                            }
-                            await page.screenshot(path=screenshot_path, clip=clip)
-                            logger.info(f"✓ Скриншот с padding (T:{padding_dict['top']} R:{padding_dict['right']} B:{padding_dict['bottom']} L:{padding_dict['left']}) и scale {scale}x")
-                        else:
-                            # Fallback: обычный скриншот элемента
-                            await element.screenshot(path=screenshot_path)
-                            logger.info(f"✓ Скриншот элемента сохранен: {screenshot_path}")
-                    else:
-                        # Обычный скриншот элемента без padding
-                        await element.screenshot(path=screenshot_path)
-                        logger.info(f"✓ Скриншот элемента сохранен: {screenshot_path}")
-                else:
-                    logger.warning("⚠️ Элемент не найден, делаю скриншот всей страницы")
-                    await page.screenshot(path=screenshot_path, full_page=False)
-            except Exception as e:
-                logger.warning(f"⚠️ Ошибка скриншота элемента: {e}, делаю скриншот страницы")
-                await page.screenshot(path=screenshot_path, full_page=False)
-        else:
-            # Скриншот всей видимой области
-            await page.screenshot(path=screenshot_path, full_page=SCREENSHOT_SETTINGS['full_page'])
-            logger.info(f"✓ Скриншот страницы сохранен: {screenshot_path}")
-        
-        # Оптимизируем для Telegram
-        skip_width_padding = source_config.get('skip_width_padding', False)
-        crop = source_config.get('crop', None)  # ✅ НОВОЕ: Получаем параметры обрезки
-        optimized_path = optimize_image_for_telegram(screenshot_path, skip_width_padding=skip_width_padding, crop=crop)
-        
-        # FIX BUG #22: Проверяем что оптимизация успешна
-        if not optimized_path:
-            logger.error("✗ Не удалось оптимизировать изображение!")
-            return None
-        
-        # Удаляем оригинальный PNG только если оптимизация создала новый файл
-        # (если optimize вернул fallback, то optimized_path == screenshot_path)
-        if optimized_path != screenshot_path and os.path.exists(screenshot_path):
-            try:
-                os.remove(screenshot_path)
-                logger.info(f"  🗑️  Удален оригинальный PNG: {os.path.basename(screenshot_path)}")
-            except Exception as e:
-                logger.warning(f"  ⚠️ Не удалось удалить оригинал: {e}")
-        
-        success = True  # Mark as successful before return
-        return {
-            'source_key': source_key,
-            'screenshot_path': optimized_path,
-            'timestamp': datetime.now(timezone.utc).isoformat(),
-            'source_name': source_config['name']
+        } else {
+            stableSince = null;
         }
-        
-    except Exception as e:
-        logger.error(f"✗ Ошибка создания скриншота: {e}")
-        traceback.print_exc()
-        return None
-    
-    finally:
-        # CRITICAL: Cleanup ONLY on failure (when success=False)
-        if not success:
-            if screenshot_path and os.path.exists(screenshot_path):
-                try:
-                    os.remove(screenshot_path)
-                    logger.info(f"🗑️  Cleanup при ошибке: удален screenshot")
-                except Exception as cleanup_error:
-                    logger.warning(f"⚠️ Cleanup warning: {cleanup_error}")
-            
-            if optimized_path and os.path.exists(optimized_path):
-                try:
-                    os.remove(optimized_path)
-                    logger.info(f"🗑️  Cleanup при ошибке: удален optimized")
-                except Exception as cleanup_error:
-                    logger.warning(f"⚠️ Cleanup warning: {cleanup_error}")
+        last = current;
+        if (now - started >= args.timeoutMs) {
+            resolve({stable: false, elapsed: now - started});
+            return;
+        }
+        setTimeout(tick, args.intervalMs);
+    };
+    tick();
+})"""
+
+# JS: дожидается отрисовки следующего кадра (стили применены)
+NEXT_FRAME_JS = """() => new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(() => resolve(true))))"""
+
+
+async def wait_for_next_frame(page, timeout=1.0):
+    """Ждет два кадра отрисовки вместо фиксированного sleep после evaluate"""
+    try:
+        await asyncio.wait_for(page.evaluate(NEXT_FRAME_JS), timeout=timeout)
+    except Exception:
+        # Фон/headless может не выдавать rAF - не дольше timeout
+        pass
 
 
-def get_source_by_schedule():
+async def wait_for_page_ready(page, source_config, source_key):
     """
-    Определяет источник для публикации по расписанию MSK
+    Ждет готовности страницы по сигналам вместо фиксированной паузы
     
-    v2.0.0: Гарантированная публикация heatmap 2 раза в день
+    Сигналы (по порядку):
+    1. Элемент wait_for появился в DOM
+    2. Сеть затихла (networkidle, не дольше network_idle_timeout)
+    3. Canvas-цель: пиксели не меняются ready_quiet_ms
+       Иначе: нет DOM-мутаций в selector ready_quiet_ms
+    
+    Прежняя пауза wait_after_load + extra_wait остается верхней границей.
     
     Returns:
-        str: Ключ источника или None если не время публикации
+        dict: {"ready": bool, "elapsed": сек, "limit": сек, "signals": [...]}
     """
-    # MSK = UTC+3
-    now_utc = datetime.now(timezone.utc)
-    now_msk = now_utc + timedelta(hours=3)
+    started = time.monotonic()
+    base_wait = SCREENSHOT_SETTINGS.get('wait_after_load', 5)
+    extra_wait = source_config.get('extra_wait', 0)
+    total_wait = base_wait + extra_wait
+    deadline = started + total_wait
+    signals = []
     
-    hour_msk = now_msk.hour
-    minute_msk = now_msk.minute
-    current_time_msk = hour_msk + minute_msk / 60.0  # Время в виде float (например, 16.5 = 16:30)
+    def remaining_ms():
+        return max(0, int((deadline - time.monotonic()) * 1000))
     
-    logger.info(f"\n⏰ Текущее время MSK: {hour_msk:02d}:{minute_msk:02d}")
-    logger.info(f"⏰ Текущее время UTC: {now_utc.hour:02d}:{now_utc.minute:02d}")
+    # Источник может отключить детектор и вернуться к фиксированной паузе
+    detection = source_config.get('ready_detection', SCREENSHOT_SETTINGS.get('ready_detection', True))
+    if not detection:
+        logger.info(f"⏳ Ожидание загрузки контента ({total_wait} секунд{' (+ ' + str(extra_wait) + ' extra)' if extra_wait > 0 else ''})...")
+        await asyncio.sleep(total_wait)
     
-    # ════════════════════════════════════════════════════════════════════
-    # ГАРАНТИРОВАННАЯ ПУБЛИКАЦИЯ HEATMAP
-    # ════════════════════════════════════════════════════════════════════
-    # GitHub Actions cron может запускаться с задержкой до 30+ минут
-    # Поэтому расширяем окна и проверяем историю публикаций
+    # Ждем конкретный элемент если указан
+    wait_for = source_config.get('wait_for')
+    if wait_for:
+        try:
+            await page.wait_for_selector(wait_for, timeout=15000)
+            logger.info(f"✓ Элемент найден: {wait_for}")
+            signals.append('element')
+        except Exception as e:
+            logger.warning(f"⚠️ Элемент не найден за 15 сек: {wait_for}")
     
-    history = load_publication_history()
-    heatmap_last_published = history.get("last_published", {}).get("heatmap_blockchain")
+    if not detection:
+        return {"ready": bool(signals), "elapsed": time.monotonic() - started, "limit": total_wait, "signals": signals}
     
-    # Парсим дату последней публикации heatmap
-    heatmap_published_today_morning = False
-    heatmap_published_today_evening = False
+    quiet_ms = source_config.get('ready_quiet_ms', SCREENSHOT_SETTINGS.get('ready_quiet_ms', 800))
+    network_idle_ms = SCREENSHOT_SETTINGS.get('network_idle_timeout', 3000)
     
-    if heatmap_last_published:
+    # Элемент появился позже лимита - оставляем окно на проверку стабильности
+    deadline = max(deadline, time.monotonic() + 2 * quiet_ms / 1000)
+    
+    # Сеть: страницы с websocket/поллингом могут не затихнуть - не ждем дольше лимита
+    if remaining_ms() > 0:
         try:
-            last_pub_dt = datetime.fromisoformat(heatmap_last_published.replace('Z', '+00:00'))
-            last_pub_msk = last_pub_dt + timedelta(hours=3)
-            
-            # Проверяем: та же дата?
-            if last_pub_msk.date() == now_msk.date():
-                # Утренняя публикация: 06:00-09:00 MSK
-                if 6 <= last_pub_msk.hour < 9:
-                    heatmap_published_today_morning = True
-                    logger.info(f"  ✓ Heatmap уже был утром: {last_pub_msk.strftime('%H:%M')} MSK")
-                # Вечерняя публикация: 18:00-21:00 MSK
-                elif 18 <= last_pub_msk.hour < 21:
-                    heatmap_published_today_evening = True
-                    logger.info(f"  ✓ Heatmap уже был вечером: {last_pub_msk.strftime('%H:%M')} MSK")
-        except Exception as e:
-            logger.warning(f"  ⚠️ Ошибка парсинга даты heatmap: {e}")
-    
-    # Расширенные окна для heatmap (с учётом задержек cron)
-    # Утро: 06:30-09:30 MSK (03:30-06:30 UTC)
-    HEATMAP_MORNING_START = 6.5   # 06:30 MSK
-    HEATMAP_MORNING_END = 9.5     # 09:30 MSK
-    
-    # Вечер: 18:30-21:30 MSK (15:30-18:30 UTC)
-    HEATMAP_EVENING_START = 18.5  # 18:30 MSK
-    HEATMAP_EVENING_END = 21.5    # 21:30 MSK
-    
-    # Проверяем: нужна ли принудительная публикация heatmap?
-    if HEATMAP_MORNING_START <= current_time_msk < HEATMAP_MORNING_END:
-        if not heatmap_published_today_morning:
-            logger.info(f"🗺️ ПРИНУДИТЕЛЬНАЯ ПУБЛИКАЦИЯ: утренний heatmap ещё не был!")
-            return "heatmap_blockchain"
-        else:
-            logger.info(f"  ℹ️ Утренний heatmap уже опубликован, пропускаем")
+            await page.wait_for_load_state('networkidle', timeout=min(network_idle_ms, remaining_ms()) or 1)
+            signals.append('network')
+        except Exception:
+            pass
     
-    if HEATMAP_EVENING_START <= current_time_msk < HEATMAP_EVENING_END:
-        if not heatmap_published_today_evening:
-            logger.info(f"🗺️ ПРИНУДИТЕЛЬНАЯ ПУБЛИКАЦИЯ: вечерний heatmap ещё не был!")
-            return "heatmap_blockchain"
-        else:
-            logger.info(f"  ℹ️ Вечерний heatmap уже опубликован, пропускаем")
+    # Визуальная стабильность цели
+    target = None
+    selector = source_config.get('selector')
+    if selector:
+        try:
+            target = await page.query_selector(selector)
+        except Exception:
+            target = None
     
-    # ════════════════════════════════════════════════════════════════════
-    # СТАНДАРТНОЕ РАСПИСАНИЕ
-    # ════════════════════════════════════════════════════════════════════
+    ready = False
+    if remaining_ms() > 0:
+        try:
+            is_canvas = bool(target) and await target.evaluate("el => el.tagName === 'CANVAS'")
+            if is_canvas:
+                check = await target.evaluate(CANVAS_STABLE_JS, {"quietMs": quiet_ms, "timeoutMs": remaining_ms(), "intervalMs": 200})
+                if check.get('stable'):
+                    signals.append('canvas')
+                    ready = True
+                elif check.get('error'):
+                    logger.info(f"  ℹ️  Canvas недоступен для чтения ({check['error']}), проверяю DOM")
+            if not ready and remaining_ms() > 0:
+                if target:
+                    check = await target.evaluate(DOM_QUIET_JS, {"quietMs": quiet_ms, "timeoutMs": remaining_ms()})
+                else:
+                    check = await page.evaluate(f"(args) => ({DOM_QUIET_JS})(null, args)", {"quietMs": quiet_ms, "timeoutMs": remaining_ms()})
+                if check.get('stable'):
+                    signals.append('dom')
+                    ready = True
+        except Exception as e:
+            logger.warning(f"⚠️ Детектор готовности: {e}")
     
-    # Проходим по всем слотам расписания
-    for slot_name, slot_config in POST_SCHEDULE.items():
-        time_range = slot_config['time_range_msk']
-        start_time, end_time = time_range
-        
-        # Проверяем попадание в временной диапазон
-        if start_time <= current_time_msk < end_time:
-            logger.info(f"📅 Слот расписания: {slot_name}")
-            logger.info(f"⏰ Время слота: {int(start_time):02d}:{int((start_time % 1) * 60):02d} - {int(end_time):02d}:{int((end_time % 1) * 60):02d} MSK")
-            
-            sources = slot_config['sources']
-            selection_type = slot_config['selection']
-            
-            # Если это heatmap слот и он уже опубликован - пропускаем
-            if "heatmap" in slot_name:
-                if "morning" in slot_name and heatmap_published_today_morning:
-                    logger.info(f"  ⏭️ Heatmap уже опубликован утром, ищем другой слот")
-                    continue
-                if "evening" in slot_name and heatmap_published_today_evening:
-                    logger.info(f"  ⏭️ Heatmap уже опубликован вечером, ищем другой слот")
-                    continue
-            
-            # Случайный выбор из списка
-            if selection_type == 'random':
-                source_key = random.choice(sources)
-                logger.info(f"🎲 Случайный выбор из {len(sources)} источников: {source_key}")
-                return source_key
-            
-            # Фиксированный источник
-            elif selection_type == 'fixed':
-                source_key = sources[0]
-                logger.info(f"📌 Фиксированный источник: {source_key}")
-                return source_key
-            
-            # Условная логика (ETF Anomaly)
-            elif selection_type == 'conditional':
-                logger.info(f"⚠️ Условный слот: {slot_name}")
-                logger.info(f"ℹ️ Пока пропускаем - аномалии проверяются вручную")
-                return None
+    elapsed = time.monotonic() - started
+    if ready:
+        logger.info(f"⏳ Страница готова за {elapsed:.1f} сек (лимит {total_wait} сек, сигналы: {', '.join(signals)})")
+    else:
+        # Верхняя граница: дожидаем остаток прежней паузы
+        rest = deadline - time.monotonic()
+        if rest > 0:
+            await asyncio.sleep(rest)
+        elapsed = time.monotonic() - started
+        logger.info(f"⏳ Сигналы готовности не сошлись, ждали лимит: {elapsed:.1f} сек")
     
-    logger.info(f"⏰ Не время для публикации (текущее время MSK: {hour_msk:02d}:{minute_msk:02d})")
-    return None
+    return {"ready": ready, "elapsed": elapsed, "limit": total_wait, "signals": signals}
 
 
-async def setup_stealth_mode(page):
-    """Cloudflare bypass: stealth mode + human behavior"""
-    await page.add_init_script("""
-        Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-        Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
-        Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
-        window.chrome = {runtime: {}};
-    """)
-    
-    await page.set_extra_http_headers({
-        'Accept-Language': 'en-US,en;q=0.9',
-        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-        'Accept-Encoding': 'gzip, deflate, br',
-        'DNT': '1',
-        'Connection': 'keep-alive',
+# JS: снимает оверлеи/модалки над областью захвата без полного обхода DOM
+# getComputedStyle вызывается только для элементов под точками сетки
+# (elementsFromPoint) и их предков, не больше nodeBudget узлов.
+REMOVE_OVERLAYS_JS = """(args) => {
+    const started = performance.now();
+    const target = args.target || null;
+    const vw = window.innerWidth, vh = window.innerHeight;
+    let region = {x: 0, y: 0, width: vw, height: vh};
+    if (target) {
+        const r = target.getBoundingClientRect();
+        const x = Math.max(0, r.left), y = Math.max(0, r.top);
+        const w = Math.min(vw, r.right) - x, h = Math.min(vh, r.bottom) - y;
+        if (w > 0 && h > 0) region = {x, y, width: w, height: h};
+    }
+
+    const hide = (el) => {
+        el.style.setProperty('display', 'none', 'important');
+        el.style.setProperty('visibility', 'hidden', 'important');
+    };
+    const protectedEl = (el) => target && (el === target || el.contains(target) || target.contains(el));
+
+    // 1. Кнопки закрытия (Maybe Later / Close / ×) - только среди видимых
+    let clicked = 0;
+    const closeTexts = ['maybe later', 'later', 'close', '×', '✕', 'no thanks'];
+    const buttons = document.querySelectorAll(
+        'button, [role="button"], [aria-label*="close" i], [data-dismiss="modal"], .close, .modal-close, [class*="closeButton"]'
+    );
+    for (const btn of buttons) {
+        if (clicked >= 3) break;
+        if (!btn.getClientRects().length || protectedEl(btn)) continue;
+        const text = (btn.textContent || '').trim().toLowerCase();
+        const label = (btn.getAttribute('aria-label') || '').toLowerCase();
+        if (closeTexts.some(t => text === t || text.startsWith(t)) || label.includes('close')) {
+            btn.click();
+            clicked++;
+        }
+    }
+
+    // 2. Оверлеи над областью захвата: сетка точек + elementsFromPoint
+    const visited = new Set();
+    const overlays = new Set();
+    let budgetExceeded = false;
+    const steps = args.gridSteps;
+    for (let i = 0; i < steps && !budgetExceeded; i++) {
+        for (let j = 0; j < steps && !budgetExceeded; j++) {
+            const px = region.x + region.width * (i + 0.5) / steps;
+            const py = region.y + region.height * (j + 0.5) / steps;
+            for (const top of document.elementsFromPoint(px, py)) {
+                if (protectedEl(top)) break;  // дошли до цели - все выше уже проверено
+                for (let el = top; el && el !== document.body && el !== document.documentElement; el = el.parentElement) {
+                    if (visited.has(el)) break;  // цепочка предков уже проверена
+                    if (visited.size >= args.nodeBudget) { budgetExceeded = true; break; }
+                    visited.add(el);
+                    if (protectedEl(el)) break;
+                    const style = getComputedStyle(el);
+                    const z = parseInt(style.zIndex) || 0;
+                    if (style.position === 'fixed' || style.position === 'sticky' || (style.position === 'absolute' && z > 1000)) {
+                        overlays.add(el);
+                        break;
+                    }
+                }
+                if (budgetExceeded) break;
+            }
+        }
+    }
+    overlays.forEach(hide);
+
+    // 3. Явные модалки/backdrop по классам (селектор, без вычисления стилей)
+    let modals = 0;
+    document.querySelectorAll(
+        '[class*="modal"], [class*="Modal"], [class*="dialog"], [class*="Dialog"], [class*="popup"], [class*="Popup"], [class*="backdrop"], [class*="overlay"]'
+    ).forEach(el => {
+        if (protectedEl(el)) return;
+        hide(el);
+        modals++;
+    });
+
+    return {
+        clicked,
+        overlays: overlays.size,
+        modals,
+        visited: visited.size,
+        budgetExceeded,
+        ms: performance.now() - started
+    };
+}"""
+
+
+async def remove_overlays(page, source_config):
+    """
+    Закрывает модальные окна и оверлеи над областью захвата
+    
+    Escape + один page.evaluate: кнопки закрытия, fixed/sticky элементы
+    под сеткой точек области захвата (с бюджетом узлов) и явные модалки.
+    
+    Returns:
+        dict: Статистика (clicked, overlays, modals, visited, ms) или None
+    """
+    try:
+        # Метод 1: Нажать Escape
+        await page.keyboard.press('Escape')
+        
+        target = None
+        selector = source_config.get('selector')
+        if selector:
+            try:
+                target = await page.query_selector(selector)
+            except Exception:
+                target = None
+        
+        stats = await page.evaluate(REMOVE_OVERLAYS_JS, {
+            "target": target,
+            "gridSteps": OVERLAY_GRID_STEPS,
+            "nodeBudget": OVERLAY_NODE_BUDGET
+        })
+        await wait_for_next_frame(page)
+        
+        logger.info(
+            f"  ✓ Оверлеи: закрыто кнопок {stats['clicked']}, скрыто fixed {stats['overlays']}, модалок {stats['modals']} "
+            f"({stats['ms']:.0f} мс, узлов {stats['visited']}{', бюджет исчерпан' if stats['budgetExceeded'] else ''})"
+        )
+        return stats
+    except Exception as e:
+        logger.warning(f"  ⚠️ Не удалось закрыть модальное окно: {e}")
+        return None
+
+
+def normalize_insets(value):
+    """Нормализует padding/crop (int или dict) в dict top/right/bottom/left"""
+    if isinstance(value, (int, float)):
+        return {'top': value, 'right': value, 'bottom': value, 'left': value}
+    if isinstance(value, dict):
+        return {
+            'top': value.get('top', 0),
+            'right': value.get('right', 0),
+            'bottom': value.get('bottom', 0),
+            'left': value.get('left', 0)
+        }
+    return {'top': 0, 'right': 0, 'bottom': 0, 'left': 0}
+
+
+def clamp_clip_to_viewport(clip, viewport):
+    """Ограничивает область захвата видимой областью (viewport)"""
+    x = max(0, min(clip['x'], viewport['width'] - 1))
+    y = max(0, min(clip['y'], viewport['height'] - 1))
+    return {
+        'x': x,
+        'y': y,
+        'width': min(clip['width'], viewport['width'] - x),
+        'height': min(clip['height'], viewport['height'] - y)
+    }
+
+
+def apply_crop_to_clip(clip, crop):
+    """
+    Переносит crop (пиксели итогового изображения при scale 1) в clip захвата
+    
+    Returns:
+        dict: Новый clip или None если после обрезки ничего не осталось
+    """
+    crop = normalize_insets(crop)
+    clip = {
+        'x': clip['x'] + crop['left'],
+        'y': clip['y'] + crop['top'],
+        'width': clip['width'] - crop['left'] - crop['right'],
+        'height': clip['height'] - crop['top'] - crop['bottom']
+    }
+    if clip['width'] <= 0 or clip['height'] <= 0:
+        return None
+    return clip
+
+
+def get_output_scale(width, height):
+    """Масштаб растеризации, чтобы clip сразу влез в лимиты Telegram"""
+    max_width = IMAGE_SETTINGS['telegram_max_width']
+    max_height = IMAGE_SETTINGS['telegram_max_height']
+    return min(1.0, max_width / width, max_height / height)
+
+
+async def capture_clip(page, clip, scale=1.0, beyond_viewport=False):
+    """
+    Снимает только область clip; при scale < 1 браузер сразу растеризует уменьшенную копию
+    
+    Playwright не передает scale в Page.captureScreenshot, поэтому при
+    уменьшении (или захвате за пределами viewport) используется CDP напрямую
+    (Chromium). При ошибке CDP - обычный page.screenshot(clip), уменьшение
+    останется на PIL.
+    
+    Returns:
+        bytes: PNG
+    """
+    if scale < 1.0 or beyond_viewport:
+        cdp = None
+        try:
+            cdp = await page.context.new_cdp_session(page)
+            # CDP clip - координаты документа, bounding_box - координаты viewport
+            scroll = await page.evaluate("() => ({x: window.scrollX, y: window.scrollY})")
+            data = await cdp.send('Page.captureScreenshot', {
+                'format': 'png',
+                'clip': {
+                    'x': clip['x'] + scroll['x'],
+                    'y': clip['y'] + scroll['y'],
+                    'width': clip['width'],
+                    'height': clip['height'],
+                    'scale': scale
+                },
+                'captureBeyondViewport': beyond_viewport
+            })
+            return base64.b64decode(data['data'])
+        except Exception as e:
+            logger.warning(f"  ⚠️ CDP-захват с масштабом не удался: {e}, снимаю без масштаба")
+        finally:
+            if cdp:
+                try:
+                    await cdp.detach()
+                except Exception:
+                    pass
+    
+    return await page.screenshot(clip=clip)
+
+
+class CaptureFailure(Exception):
+    """Ошибка захвата с известным классом отказа (ключ RETRY_POLICIES)"""
+    
+    def __init__(self, failure, message):
+        super().__init__(message)
+        self.failure = failure
+
+
+def classify_failure(error):
+    """
+    Класс отказа захвата для выбора политики повтора
+    
+    Returns:
+        str: navigation, antibot, selector, image или unknown
+    """
+    if isinstance(error, CaptureFailure):
+        return error.failure
+    message = str(error)
+    # Ошибки Playwright: "Page.goto: Timeout 30000ms exceeded", "net::ERR_CONNECTION_RESET"
+    if 'goto' in message or 'net::ERR_' in message:
+        return 'navigation'
+    return 'unknown'
+
+
+# JS: признаки страницы антибот-проверки (Cloudflare, captcha)
+ANTIBOT_PROBE_JS = """() => {
+    const title = document.title || '';
+    const markers = [/just a moment/i, /attention required/i, /checking your browser/i, /access denied/i, /captcha/i];
+    const marker = markers.find(re => re.test(title));
+    if (marker) return 'title: ' + title;
+    const challenge = document.querySelector(
+        '#challenge-form, #cf-challenge-running, iframe[src*="challenges.cloudflare.com"], iframe[src*="captcha"]'
+    );
+    return challenge ? 'challenge: ' + (challenge.id || challenge.tagName.toLowerCase()) : null;
+}"""
+
+# HTTP-статусы, которыми антибот отвечает вместо страницы
+ANTIBOT_STATUSES = {403, 429, 503}
+
+
+async def detect_antibot(page, response):
+    """
+    Проверяет, что вместо контента пришла антибот-проверка
+    
+    Returns:
+        str: Признак проверки или None
+    """
+    try:
+        marker = await page.evaluate(ANTIBOT_PROBE_JS)
+    except Exception:
+        marker = None
+    if marker:
+        return marker
+    if response is not None and response.status in ANTIBOT_STATUSES:
+        return f"HTTP {response.status}"
+    return None
+
+
+# Этапы захвата по порядку: повтор продолжает с упавшего этапа (get_resume_state),
+# а не с page.goto - загрузка и ожидания не оплачиваются повторно
+CAPTURE_STAGES = ['navigate', 'consent', 'ready', 'cleanup', 'capture', 'process']
+
+
+def new_capture_state():
+    """Состояние захвата: пройденные этапы и их результаты"""
+    return {
+        "done": [],
+        "stage": None,
+        "consent_accepted": False,
+        "timings": {},
+        "screenshot_bytes": None,
+        "crop_in_clip": False,
+        "result": None
+    }
+
+
+async def stage_navigate(page, source_config, source_key, profile, state):
+    """
+    Этап navigate: загрузка страницы и проверка на антибот
+    
+    Raises:
+        CaptureFailure: Страница антибот-проверки вместо контента
+        Exception: Ошибка навигации (таймаут page.goto и т.п.)
+    """
+    url = source_config['url']
+    logger.info(f"\n📸 СКРИНШОТ: {source_config['name']}")
+    logger.info(f"  URL: {url}")
+    
+    # Загружаем страницу
+    response = await page.goto(url, wait_until='domcontentloaded', timeout=SCREENSHOT_SETTINGS['wait_timeout'])
+    logger.info("✓ Страница загружена")
+    
+    # Страница-заглушка антибота: ждать готовности и снимать нечего
+    challenge = await detect_antibot(page, response)
+    if challenge:
+        raise CaptureFailure('antibot', f"Антибот-проверка: {challenge}")
+
+
+async def stage_consent(page, source_config, source_key, profile, state):
+    """
+    Этап consent: cookie-баннер
+    
+    Согласие в профиле не отменяет проверку: cookie могли истечь или сайт
+    сменил баннер. Без баннера проверка - один evaluate (а после
+    CONSENT_SKIP_AFTER_MISSES промахов только CSS-скрытие).
+    """
+    consent_started = time.monotonic()
+    if profile and profile['meta'].get('consent_accepted'):
+        logger.info(f"🍪 Согласие сохранено в профиле {profile['domain']}, проверяю только появление баннера")
+    else:
+        logger.info("🍪 Обработка cookies...")
+    state['consent_accepted'] = await accept_cookies(page, get_source_domain(source_config['url']))
+    state['timings']['consent'] = time.monotonic() - consent_started
+    logger.info(f"⏱️  Cookies: {state['timings']['consent']:.2f} сек")
+
+
+async def stage_ready(page, source_config, source_key, profile, state):
+    """Этап ready: сигналы готовности, прежние паузы - верхняя граница"""
+    ready = await wait_for_page_ready(page, source_config, source_key)
+    state['timings']['ready'] = ready['elapsed']
+
+
+async def stage_cleanup(page, source_config, source_key, profile, state):
+    """Этап cleanup: оверлеи и скрытие лишних элементов"""
+    # Закрываем модальное окно если требуется
+    if source_config.get('close_modal', False):
+        await remove_overlays(page, source_config)
+    
+    # Скрываем ненужные элементы если указано
+    hide_elements = source_config.get('hide_elements')
+    if hide_elements:
+        try:
+            await page.evaluate("""(selector) => {
+                const elements = document.querySelectorAll(selector);
+                elements.forEach(el => {
+                    el.style.display = 'none';
+                    el.style.visibility = 'hidden';
+                });
+            }""", hide_elements)
+            await wait_for_next_frame(page)
+            logger.info(f"  ✓ Скрыты элементы: {hide_elements}")
+        except Exception as e:
+            logger.warning(f"  ⚠️ Не удалось скрыть элементы: {e}")
+
+
+async def stage_capture(page, source_config, source_key, profile, state):
+    """
+    Этап capture: область элемента (+ padding/crop) или viewport -> PNG bytes
+    
+    Raises:
+        CaptureFailure: Элемент selector не найден
+    """
+    selector = source_config.get('selector')
+    element_padding = source_config.get('element_padding', 0)  # Может быть int или dict
+    scale = source_config.get('scale', 1.0)  # Масштаб элемента (CSS zoom)
+    
+    # Нормализуем element_padding в dict
+    padding_dict = normalize_insets(element_padding)
+    crop = source_config.get('crop', None)  # ✅ НОВОЕ: Получаем параметры обрезки
+    viewport = page.viewport_size
+    
+    # Область захвата (CSS px, координаты viewport): элемент + padding или весь viewport
+    region = None
+    beyond_viewport = False
+    if selector:
+        # Скриншот конкретного элемента
+        try:
+            element = await page.query_selector(selector)
+            if element:
+                # Применяем масштабирование если нужно
+                if scale != 1.0:
+                    try:
+                        await page.evaluate("""(args) => {
+                            const el = document.querySelector(args.selector);
+                            if (el) {
+                                el.style.transform = 'scale(' + args.scale + ')';
+                                el.style.transformOrigin = 'top left';
+                            }
+                        }""", {"selector": selector, "scale": scale})
+                        await wait_for_next_frame(page)  # Даем время на применение стилей
+                        logger.info(f"  ✓ Применен масштаб {scale}x")
+                    except Exception as e:
+                        logger.warning(f"  ⚠️ Не удалось применить масштаб: {e}")
+                
+                # Получаем bounding box элемента (в видимой области)
+                box = await element.bounding_box()
+                if box and (box['y'] < 0 or box['y'] >= viewport['height']):
+                    await element.scroll_into_view_if_needed()
+                    box = await element.bounding_box()
+                
+                has_padding = any(v > 0 for v in padding_dict.values())
+                
+                if box and has_padding:
+                    # Учитываем масштаб при расчете размеров
+                    scaled_width = box['width'] * scale
+                    scaled_height = box['height'] * scale
+                    
+                    # Добавляем padding с учетом разных сторон
+                    region = {
+                        'x': max(0, box['x'] - padding_dict['left']),
+                        'y': max(0, box['y'] - padding_dict['top']),
+                        'width': scaled_width + padding_dict['left'] + padding_dict['right'],
+                        'height': scaled_height + padding_dict['top'] + padding_dict['bottom']
+                    }
+                    logger.info(f"✓ Область элемента с padding (T:{padding_dict['top']} R:{padding_dict['right']} B:{padding_dict['bottom']} L:{padding_dict['left']}) и scale {scale}x")
+                elif box:
+                    # Элемент без padding снимается целиком, как element.screenshot (и за пределами viewport)
+                    region = dict(box)
+                    beyond_viewport = True
+                    logger.info(f"✓ Область элемента {box['width']:.0f}x{box['height']:.0f}")
+                else:
+                    logger.warning("⚠️ Нет bounding box элемента, снимаю видимую область")
+            else:
+                # Без элемента в пост ушла бы вся страница вместо виджета
+                raise CaptureFailure('selector', f"Элемент не найден: {selector}")
+        except CaptureFailure:
+            raise
+        except Exception as e:
+            logger.warning(f"⚠️ Ошибка поиска элемента: {e}, делаю скриншот страницы")
+    
+    screenshot_bytes = None
+    crop_in_clip = False
+    if region is None and SCREENSHOT_SETTINGS['full_page'] and not selector:
+        # Скриншот всей страницы целиком - crop/resize останутся на PIL
+        screenshot_bytes = await page.screenshot(full_page=True)
+    else:
+        if region is None:
+            region = {'x': 0, 'y': 0, 'width': viewport['width'], 'height': viewport['height']}
+        
+        # Область с padding/viewport не выходит за видимую область (как page.screenshot).
+        # Сначала ограничиваем, потом crop: crop отсчитывается от краев снятого изображения
+        if not beyond_viewport:
+            region = clamp_clip_to_viewport(region, viewport)
+        
+        # ✅ Crop сразу в clip: браузер не рендерит отбрасываемые пиксели
+        clip = apply_crop_to_clip(region, crop) if crop else region
+        if clip is None:
+            logger.warning(f"⚠️ Crop {crop} больше области захвата, crop пропущен")
+            clip = region
+        else:
+            crop_in_clip = bool(crop)
+        
+        # ✅ Resize сразу при растеризации: масштаб под лимиты Telegram
+        output_scale = get_output_scale(clip['width'], clip['height'])
+        screenshot_bytes = await capture_clip(page, clip, output_scale, beyond_viewport)
+        logger.info(
+            f"✓ Скриншот области {clip['width']:.0f}x{clip['height']:.0f}"
+            f"{f' → x{output_scale:.2f}' if output_scale < 1 else ''} ({len(screenshot_bytes) / 1024:.1f} KB)"
+        )
+    
+    state['screenshot_bytes'] = screenshot_bytes
+    state['crop_in_clip'] = crop_in_clip
+
+
+async def stage_process(page, source_config, source_key, profile, state):
+    """
+    Этап process: рендишены, dHash, архив -> результат захвата
+    
+    Raises:
+        CaptureFailure: Не удалось обработать изображение
+    """
+    screenshot_bytes = state['screenshot_bytes']
+    crop = source_config.get('crop', None)
+    crop_in_clip = state['crop_in_clip']
+    
+    # Оптимизируем для Telegram (в памяти, без промежуточных файлов)
+    # Crop уже применен в clip - PIL только добивает padding/кодирует
+    skip_width_padding = source_config.get('skip_width_padding', False)
+    renditions, image_hash = render_image(screenshot_bytes, skip_width_padding=skip_width_padding, crop=None if crop_in_clip else crop)
+    
+    # FIX BUG #22: Проверяем что оптимизация успешна
+    if not renditions:
+        raise CaptureFailure('image', "Не удалось оптимизировать изображение")
+    
+    image_bytes = renditions['telegram']['bytes']
+    thumbnail = renditions.get('thumbnail')
+    
+    # Файлы пишем только по запросу (архив/отладка)
+    screenshot_path = archive_screenshot(source_key, image_bytes, screenshot_bytes, thumbnail['bytes'] if thumbnail else None)
+    
+    state['result'] = {
+        'source_key': source_key,
+        'image_bytes': image_bytes,
+        'renditions': renditions,
+        'dhash': image_hash,
+        'screenshot_path': screenshot_path,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'source_name': source_config['name'],
+        'consent_accepted': state['consent_accepted'],
+        'timings': state['timings']
+    }
+
+
+CAPTURE_STAGE_FUNCTIONS = {
+    'navigate': stage_navigate,
+    'consent': stage_consent,
+    'ready': stage_ready,
+    'cleanup': stage_cleanup,
+    'capture': stage_capture,
+    'process': stage_process
+}
+
+
+async def run_capture_stages(page, source_config, source_key, profile, state, until=None):
+    """
+    Выполняет этапы, которых еще нет в state['done'] (до until включительно)
+    
+    При ошибке state['stage'] - упавший этап, state['done'] - пройденные.
+    """
+    for name in CAPTURE_STAGES:
+        if name not in state['done']:
+            state['stage'] = name
+            await CAPTURE_STAGE_FUNCTIONS[name](page, source_config, source_key, profile, state)
+            state['done'].append(name)
+        if name == until:
+            break
+    return state
+
+
+def get_resume_state(page, source_config, state):
+    """
+    Состояние для повтора с упавшего этапа
+    
+    Результаты пройденных этапов годны, пока страница открыта и не ушла
+    с домена источника. Упавшая обработка (process) повторяется с capture:
+    снимаем заново с уже загруженной страницы.
+    
+    Returns:
+        dict: state с урезанным done или None (повтор с навигации)
+    """
+    if not state or state['stage'] in (None, 'navigate') or page.is_closed():
+        return None
+    if get_source_domain(page.url) != get_source_domain(source_config['url']):
+        return None
+    
+    resume_from = 'capture' if state['stage'] == 'process' else state['stage']
+    state['done'] = CAPTURE_STAGES[:CAPTURE_STAGES.index(resume_from)]
+    logger.info(f"  ⏭️ Повтор с этапа {resume_from}: пройдены {', '.join(state['done'])}")
+    return state
+
+
+async def prepare_page(page, source_config, source_key, profile=None, state=None):
+    """
+    Подготавливает страницу к захвату: этапы navigate, consent, ready, cleanup
+    
+    Returns:
+        dict: Состояние захвата (new_capture_state) для take_screenshot
+    """
+    return await run_capture_stages(page, source_config, source_key, profile, state or new_capture_state(), until='cleanup')
+
+
+def get_prefetch_lead(source_config):
+    """За сколько секунд до слота начинать подготовку страницы (0 - без предзагрузки)"""
+    return max(0, source_config.get('prefetch_lead_seconds', SCREENSHOT_SETTINGS.get('prefetch_lead_seconds', 0)))
+
+
+def get_max_prefetch_lead():
+    """Максимальный lead среди включенных источников: daemon просыпается заранее на него"""
+    return max(
+        (get_prefetch_lead(config) for config in SCREENSHOT_SOURCES.values() if config.get('enabled', True)),
+        default=0
+    )
+
+
+async def prefetch_page(page, source_config, source_key, profile, fire_at):
+    """
+    Готовит страницу заранее и ждет открытия слота fire_at
+    
+    Returns:
+        dict: Состояние захвата; после ошибки - для продолжения с упавшего
+              этапа или None (захват с нуля, но тоже не раньше fire_at)
+    """
+    lead = (fire_at - datetime.now(timezone.utc)).total_seconds()
+    logger.info(f"⏩ [{source_key}] Предзагрузка за {lead:.0f} сек до слота")
+    
+    state = new_capture_state()
+    prepared = False
+    try:
+        await prepare_page(page, source_config, source_key, profile, state)
+        prepared = True
+    except Exception as e:
+        logger.warning(f"⚠️ [{source_key}] Предзагрузка не удалась на этапе {state['stage']}: {e}")
+        state = get_resume_state(page, source_config, state)
+    
+    wait_seconds = (fire_at - datetime.now(timezone.utc)).total_seconds()
+    if wait_seconds > 0:
+        logger.info(f"  ⏳ [{source_key}] Страница готова, жду открытия слота {wait_seconds:.1f} сек")
+        await asyncio.sleep(wait_seconds)
+    elif prepared:
+        logger.warning(f"  ⚠️ [{source_key}] Подготовка дольше lead на {-wait_seconds:.1f} сек - увеличьте prefetch_lead_seconds")
+    return state
+
+
+async def take_screenshot(page, source_config, source_key, profile=None, state=None):
+    """Делает скриншот согласно конфигурации источника
+    
+    Args:
+        profile: Постоянный профиль домена (open_browser_profile) или None
+        state: Состояние захвата (предзагрузка или повтор) - пройденные этапы
+               не повторяются; обновляется на месте
+    
+    Raises:
+        CaptureFailure: Антибот, элемент не найден, ошибка обработки изображения
+        Exception: Прочие ошибки Playwright (класс определяет classify_failure)
+    """
+    state = state if state is not None else new_capture_state()
+    if 'cleanup' in state['done']:
+        # Страница уже подготовлена: только дорисовываем кадр перед захватом
+        await wait_for_next_frame(page)
+    
+    await run_capture_stages(page, source_config, source_key, profile, state)
+    return state['result']
+
+
+def get_guaranteed_published(now_utc):
+    """
+    Публикации гарантированных постов за текущие сутки (по одному индексному запросу на пост)
+    
+    Returns:
+        dict: {имя поста: datetime публикации или None}
+    """
+    today = to_schedule_time(now_utc).date()
+    published = {}
+    for name, guarantee in GUARANTEED_POSTS.items():
+        counted_start, counted_end = guarantee['counted_msk']
+        start, end = local_interval(today, hours_to_minutes(counted_start), hours_to_minutes(counted_end))
+        published[name] = get_last_published(guarantee['source'], start, end)
+        if published[name]:
+            logger.info(f"  ✓ {name}: уже опубликован в {to_schedule_time(published[name]).strftime('%H:%M')} MSK")
+    return published
+
+
+def get_source_by_schedule(now_utc=None):
+    """
+    Определяет источник для публикации по расписанию MSK
+    
+    v2.0.0: Гарантированная публикация heatmap 2 раза в день
+    Слоты и окна - из скомпилированного индекса (schedule_index)
+    
+    Returns:
+        str: Ключ источника или None если не время публикации
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    now_msk = to_schedule_time(now_utc)
+    
+    logger.info(f"\n⏰ Текущее время MSK: {now_msk.strftime('%H:%M')}")
+    logger.info(f"⏰ Текущее время UTC: {now_utc.strftime('%H:%M')}")
+    
+    # ════════════════════════════════════════════════════════════════════
+    # ГАРАНТИРОВАННАЯ ПУБЛИКАЦИЯ HEATMAP
+    # ════════════════════════════════════════════════════════════════════
+    # GitHub Actions cron может запускаться с задержкой до 30+ минут
+    # Поэтому окна GUARANTEED_POSTS шире слотов, и проверяем историю публикаций
+    
+    published = get_guaranteed_published(now_utc)
+    
+    for window in due_slots(now_utc, guaranteed=True):
+        if not published[window['name']]:
+            logger.info(f"🗺️ ПРИНУДИТЕЛЬНАЯ ПУБЛИКАЦИЯ: {window['name']} ещё не был!")
+            return window['config']['source']
+        logger.info(f"  ℹ️ {window['name']} уже опубликован, пропускаем")
+    
+    # ════════════════════════════════════════════════════════════════════
+    # СТАНДАРТНОЕ РАСПИСАНИЕ
+    # ════════════════════════════════════════════════════════════════════
+    
+    for slot in due_slots(now_utc):
+        slot_name = slot['name']
+        slot_config = slot['config']
+        logger.info(f"📅 Слот расписания: {slot_name}")
+        logger.info(f"⏰ Время слота: {to_schedule_time(slot['start']).strftime('%H:%M')} - {to_schedule_time(slot['end']).strftime('%H:%M')} MSK")
+        
+        # Гарантированный пост уже вышел - слот с тем же именем пропускаем
+        if published.get(slot_name):
+            logger.info(f"  ⏭️ {slot_name} уже опубликован, слот пропущен")
+            continue
+        
+        sources = slot_config['sources']
+        selection_type = slot_config['selection']
+        
+        # Случайный выбор из списка
+        if selection_type == 'random':
+            source_key = random.choice(sources)
+            logger.info(f"🎲 Случайный выбор из {len(sources)} источников: {source_key}")
+            return source_key
+        
+        # Фиксированный источник
+        elif selection_type == 'fixed':
+            source_key = sources[0]
+            logger.info(f"📌 Фиксированный источник: {source_key}")
+            return source_key
+        
+        # Условная логика (ETF Anomaly)
+        elif selection_type == 'conditional':
+            logger.info(f"⚠️ Условный слот: {slot_name}")
+            logger.info(f"ℹ️ Пока пропускаем - аномалии проверяются вручную")
+            return None
+    
+    logger.info(f"⏰ Не время для публикации (текущее время MSK: {now_msk.strftime('%H:%M')})")
+    return None
+
+
+def get_next_slot_start(now_utc=None):
+    """
+    Возвращает ближайшее начало слота POST_SCHEDULE (или окна гарантированной публикации) после now_utc
+    
+    Returns:
+        datetime: Время начала слота в UTC
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    candidates = [slot for slot in (next_slot(now_utc), next_slot(now_utc, guaranteed=True)) if slot]
+    return min(slot['start'] for slot in candidates)
+
+
+async def setup_stealth_mode(page):
+    """Cloudflare bypass: stealth mode + human behavior"""
+    await page.add_init_script("""
+        Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+        Object.defineProperty(navigator, 'plugins', {get: () => [1, 2, 3, 4, 5]});
+        Object.defineProperty(navigator, 'languages', {get: () => ['en-US', 'en']});
+        window.chrome = {runtime: {}};
+    """)
+    
+    await page.set_extra_http_headers({
+        'Accept-Language': 'en-US,en;q=0.9',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
         'Upgrade-Insecure-Requests': '1'
     })
 
 
-async def simulate_human_behavior(page):
-    """Random delays and mouse movements"""
-    await asyncio.sleep(random.uniform(1.5, 3.5))
-    await page.mouse.move(random.randint(100, 300), random.randint(100, 300))
+async def simulate_human_behavior(page):
+    """Random delays and mouse movements"""
+    await asyncio.sleep(random.uniform(1.5, 3.5))
+    await page.mouse.move(random.randint(100, 300), random.randint(100, 300))
+
+
+def get_source_domain(url):
+    """Домен источника без www (ключ профиля и кэшей)"""
+    hostname = urlparse(url).hostname or 'unknown'
+    return hostname[4:] if hostname.startswith('www.') else hostname
+
+
+def get_dir_size(path):
+    """Суммарный размер файлов в директории (байты)"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            try:
+                total += os.path.getsize(os.path.join(root, filename))
+            except OSError:
+                pass
+    return total
+
+
+def open_browser_profile(source_config):
+    """
+    Открывает постоянный профиль браузера для домена источника
+    
+    Профиль хранит cookies/localStorage (storage_state) или целый
+    user-data-dir с HTTP-кэшем. Профиль старше max_age_hours или больше
+    max_size_mb удаляется и создается заново.
+    
+    Returns:
+        dict: Профиль или None если профили отключены
+    """
+    settings = BROWSER_PROFILE_SETTINGS
+    if not settings.get('enabled', False) or not source_config.get('persistent_profile', True):
+        return None
+    
+    mode = settings.get('mode', 'storage_state')
+    domain = get_source_domain(source_config['url'])
+    profile_dir = os.path.join(BROWSER_PROFILES_DIR, domain)
+    meta_path = os.path.join(profile_dir, 'profile.json')
+    
+    meta = None
+    if os.path.exists(meta_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Поврежден профиль {domain}: {e}")
+    
+    # Инвалидация: возраст, размер, смена режима
+    reason = None
+    if meta:
+        try:
+            age_hours = (datetime.now(timezone.utc) - datetime.fromisoformat(meta['created_at'])).total_seconds() / 3600
+        except (KeyError, ValueError, TypeError):
+            age_hours = float('inf')
+        size_mb = get_dir_size(profile_dir) / 1024 / 1024
+        
+        if age_hours > settings.get('max_age_hours', 72):
+            reason = f"возраст {age_hours:.0f} ч"
+        elif size_mb > settings.get('max_size_mb', 200):
+            reason = f"размер {size_mb:.0f} MB"
+        elif meta.get('mode') != mode:
+            reason = f"смена режима {meta.get('mode')} → {mode}"
+    elif os.path.exists(profile_dir):
+        reason = "нет метаданных"
+    
+    if reason:
+        logger.info(f"🗑️  Профиль {domain} сброшен ({reason})")
+        shutil.rmtree(profile_dir, ignore_errors=True)
+        meta = None
+    
+    if not meta:
+        meta = {
+            "domain": domain,
+            "mode": mode,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "consent_accepted": False
+        }
+    
+    os.makedirs(profile_dir, exist_ok=True)
+    
+    return {
+        "domain": domain,
+        "mode": mode,
+        "dir": profile_dir,
+        "meta_path": meta_path,
+        "state_path": os.path.join(profile_dir, 'state.json'),
+        "user_data_dir": os.path.join(profile_dir, 'user_data'),
+        "meta": meta
+    }
+
+
+async def save_browser_profile(context, profile, consent_accepted=False):
+    """Сохраняет storage_state и метаданные профиля после успешного захвата"""
+    if not profile:
+        return
+    
+    try:
+        if profile['mode'] == 'storage_state':
+            await context.storage_state(path=profile['state_path'])
+        
+        if consent_accepted:
+            profile['meta']['consent_accepted'] = True
+        profile['meta']['updated_at'] = datetime.now(timezone.utc).isoformat()
+        
+        with open(profile['meta_path'], 'w', encoding='utf-8') as f:
+            json.dump(profile['meta'], f, indent=2, ensure_ascii=False)
+        
+        logger.info(f"💾 Профиль {profile['domain']} сохранен ({get_dir_size(profile['dir']) / 1024:.0f} KB)")
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось сохранить профиль {profile['domain']}: {e}")
+
+
+def get_profile_lock(profile):
+    """Блокировка профиля: user-data-dir нельзя открыть двумя процессами Chromium"""
+    domain = profile['domain']
+    if domain not in _profile_locks:
+        _profile_locks[domain] = asyncio.Lock()
+    return _profile_locks[domain]
+
+
+async def launch_browser(p, single_process=True):
+    """Запускает headless Chromium с общими флагами
+    
+    Args:
+        p: Экземпляр async_playwright
+        single_process: --single-process (только для одного контекста)
+    """
+    args = list(BROWSER_LAUNCH_ARGS)
+    if single_process:
+        args.append('--single-process')
+    
+    return await p.chromium.launch(headless=True, args=args)
+
+
+async def create_source_context(browser, source_config, profile=None, user_agent=None):
+    """
+    Создает изолированный BrowserContext под настройки источника
+    
+    С профилем в режиме storage_state контекст получает сохраненные
+    cookies/localStorage; в режиме user_data_dir запускается постоянный
+    контекст со своим HTTP-кэшем на диске (отдельный процесс Chromium).
+    
+    Args:
+        user_agent: Другой отпечаток для повтора после антибота (None - из конфига)
+    """
+    # ✅ Получаем custom user-agent если задан в конфиге
+    custom_ua = source_config.get('custom_user_agent')
+    user_agent = user_agent or custom_ua or DEFAULT_USER_AGENT
+    
+    # ✅ Получаем custom viewport если задан в конфиге
+    viewport_width = source_config.get('viewport_width', SCREENSHOT_SETTINGS['viewport_width'])
+    viewport_height = source_config.get('viewport_height', SCREENSHOT_SETTINGS['viewport_height'])
+    
+    context_options = {
+        "user_agent": user_agent,
+        "viewport": {
+            'width': viewport_width, 
+            'height': viewport_height
+        },
+        # ✅ Дополнительные headers для обхода блокировки
+        "extra_http_headers": {
+            'Accept-Language': 'en-US,en;q=0.9',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Sec-Fetch-Dest': 'document',
+            'Sec-Fetch-Mode': 'navigate',
+            'Sec-Fetch-Site': 'none',
+            'Sec-Fetch-User': '?1'
+        }
+    }
+    
+    if profile and profile['mode'] == 'user_data_dir':
+        cache_size = int(BROWSER_PROFILE_SETTINGS.get('max_size_mb', 200) * 1024 * 1024 * 0.8)
+        logger.info(f"💾 Профиль {profile['domain']}: user-data-dir с дисковым кэшем")
+        return await browser.browser_type.launch_persistent_context(
+            profile['user_data_dir'],
+            headless=True,
+            args=BROWSER_LAUNCH_ARGS + [f'--disk-cache-size={cache_size}'],
+            **context_options
+        )
+    
+    if profile and os.path.exists(profile['state_path']):
+        logger.info(f"💾 Профиль {profile['domain']}: восстановлен storage_state")
+        context_options["storage_state"] = profile['state_path']
+    
+    return await browser.new_context(**context_options)
+
+
+async def create_source_page(context, source_config):
+    """Открывает страницу в контексте и удаляет webdriver флаги"""
+    page = await context.new_page()
+    
+    # ✅ Stealth mode если включен
+    if source_config.get('stealth_mode', False):
+        await page.add_init_script("""
+            // Удаляем webdriver
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            });
+            
+            // Скрываем automation
+            Object.defineProperty(navigator, 'plugins', {
+                get: () => [1, 2, 3, 4, 5]
+            });
+            
+            Object.defineProperty(navigator, 'languages', {
+                get: () => ['en-US', 'en']
+            });
+            
+            // Chrome runtime
+            window.chrome = {
+                runtime: {}
+            };
+        """)
+    else:
+        await page.add_init_script("""
+            Object.defineProperty(navigator, 'webdriver', {
+                get: () => undefined
+            });
+        """)
+    
+    return page
+
+
+# Спецсимволы, общие для regex Python и JavaScript
+REGEX_SPECIAL_CHARS = set('\\^$.|?*+()[]{}/')
+
+
+def glob_to_regex(pattern):
+    """
+    Glob-шаблон URL -> regex, который понимают и Python, и JavaScript
+    
+    context.route передает regex.pattern в драйвер Playwright (new RegExp в Node),
+    поэтому fnmatch.translate ((?s:...)\\Z, атомарные группы) не подходит.
+    """
+    return ''.join(
+        '.*' if char == '*' else '.' if char == '?' else '\\' + char if char in REGEX_SPECIAL_CHARS else char
+        for char in pattern
+    )
+
+
+def build_block_rules(source_config):
+    """
+    Собирает правила блокировки запросов: глобальный DEFAULT_BLOCK_RESOURCES + block_resources источника
+    
+    Returns:
+        tuple: (set типов ресурсов, скомпилированный regex URL или None)
+    """
+    source_rules = source_config.get('block_resources', {})
+    if source_rules is False:
+        # Источник явно отключил блокировку (включая глобальную)
+        return set(), None
+    source_rules = source_rules or {}
+    
+    resource_types = set(source_rules.get('resource_types', []))
+    url_patterns = list(source_rules.get('url_patterns', []))
+    
+    if source_rules.get('inherit_default', True):
+        resource_types |= set(DEFAULT_BLOCK_RESOURCES.get('resource_types', []))
+        url_patterns += DEFAULT_BLOCK_RESOURCES.get('url_patterns', [])
+    
+    url_regex = None
+    if url_patterns:
+        # Glob-шаблоны (*://*.doubleclick.net/*) -> один общий regex
+        url_regex = re.compile('^(?:' + '|'.join(glob_to_regex(pattern) for pattern in url_patterns) + ')$')
+    
+    return resource_types, url_regex
+
+
+def _response_size(response):
+    """Размер ответа по Content-Length (0 если сервер его не прислал)"""
+    try:
+        return int(response.headers.get('content-length', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+async def setup_request_blocking(context, source_config):
+    """
+    Включает перехват запросов в контексте: реклама, аналитика, трекеры, медиа
+    
+    Если типы ресурсов не заданы, перехватываются только URL из шаблонов,
+    остальные запросы идут в сеть без захода в Python.
+    
+    Returns:
+        dict: Статистика для отчета (заполняется по ходу загрузки)
+    """
+    stats = {
+        "blocked_requests": 0,
+        "blocked_by_type": {},
+        "loaded_requests": 0,
+        "loaded_bytes": 0,
+        "loaded_by_type": {}
+    }
+    
+    resource_types, url_regex = build_block_rules(source_config)
+    
+    def on_response(response):
+        size = _response_size(response)
+        resource_type = response.request.resource_type
+        count, total = stats["loaded_by_type"].get(resource_type, (0, 0))
+        stats["loaded_by_type"][resource_type] = (count + 1, total + size)
+        stats["loaded_requests"] += 1
+        stats["loaded_bytes"] += size
+    
+    context.on("response", on_response)
+    
+    if not resource_types and not url_regex:
+        return stats
+    
+    async def handle_route(route):
+        request = route.request
+        resource_type = request.resource_type
+        if resource_type in resource_types or (url_regex and url_regex.match(request.url)):
+            stats["blocked_requests"] += 1
+            stats["blocked_by_type"][resource_type] = stats["blocked_by_type"].get(resource_type, 0) + 1
+            await route.abort('blockedbyclient')
+        else:
+            await route.continue_()
+    
+    await context.route("**/*" if resource_types else url_regex, handle_route)
+    return stats
+
+
+def estimate_saved_bytes(stats):
+    """Оценивает сэкономленный трафик: средний размер загруженного ресурса того же типа"""
+    loaded_count = stats.get("loaded_requests", 0)
+    overall_avg = stats.get("loaded_bytes", 0) / loaded_count if loaded_count else 0
+    
+    saved = 0
+    for resource_type, blocked in stats.get("blocked_by_type", {}).items():
+        count, total = stats.get("loaded_by_type", {}).get(resource_type, (0, 0))
+        avg = total / count if count and total else overall_avg
+        saved += blocked * avg
+    return int(saved)
+
+
+def log_block_report(stats, label):
+    """Логирует отчет о заблокированных запросах и сэкономленном трафике"""
+    blocked = stats.get("blocked_requests", 0)
+    by_type = ', '.join(f"{t}: {n}" for t, n in sorted(stats.get("blocked_by_type", {}).items()))
+    logger.info(
+        f"🚫 [{label}] Заблокировано {blocked} запросов (≈{estimate_saved_bytes(stats) / 1024:.0f} KB)"
+        f"{' - ' + by_type if by_type else ''}; "
+        f"загружено {stats.get('loaded_requests', 0)} ({stats.get('loaded_bytes', 0) / 1024:.0f} KB)"
+    )
+
+
+def merge_block_stats(stats_list):
+    """Складывает статистику блокировки нескольких захватов (отчет батча)"""
+    total = {"blocked_requests": 0, "blocked_by_type": {}, "loaded_requests": 0, "loaded_bytes": 0, "loaded_by_type": {}}
+    for stats in stats_list:
+        total["blocked_requests"] += stats.get("blocked_requests", 0)
+        total["loaded_requests"] += stats.get("loaded_requests", 0)
+        total["loaded_bytes"] += stats.get("loaded_bytes", 0)
+        for resource_type, blocked in stats.get("blocked_by_type", {}).items():
+            total["blocked_by_type"][resource_type] = total["blocked_by_type"].get(resource_type, 0) + blocked
+        for resource_type, (count, size) in stats.get("loaded_by_type", {}).items():
+            old_count, old_size = total["loaded_by_type"].get(resource_type, (0, 0))
+            total["loaded_by_type"][resource_type] = (old_count + count, old_size + size)
+    return total
+
+
+async def close_source_context(context, source_key):
+    """Закрывает контекст источника (ошибка закрытия не прерывает захват)"""
+    try:
+        await context.close()
+    except Exception as e:
+        logger.warning(f"⚠️ [{source_key}] Ошибка закрытия контекста: {e}")
+
+
+def pick_fresh_user_agent(current):
+    """Случайный отпечаток из FINGERPRINT_USER_AGENTS, отличный от текущего"""
+    return random.choice([ua for ua in FINGERPRINT_USER_AGENTS if ua != current] or FINGERPRINT_USER_AGENTS)
+
+
+async def capture_source(browser, source_key, source_config, fire_at=None):
+    """
+    Делает скриншот источника в собственном BrowserContext с повторными попытками
+    
+    Повтор зависит от класса отказа (RETRY_POLICIES): число повторов,
+    экспоненциальная пауза, свежий контекст с другим отпечатком.
+    В том же контексте повтор продолжает с упавшего этапа (CAPTURE_STAGES).
+    Отказы домена (антибот, навигация) копятся в circuit breaker:
+    разомкнутый домен не снимается вовсе.
+    
+    Args:
+        fire_at: Время открытия слота (UTC) - страница готовится заранее,
+                 захват ровно в fire_at (None - сразу)
+    
+    Returns:
+        dict: Результат take_screenshot или None (попытки исчерпаны / домен разомкнут)
+    """
+    domain = get_source_domain(source_config['url'])
+    if get_breaker_open_until(source_key, source_config):
+        return None
+    
+    context = None
+    profile = open_browser_profile(source_config)
+    profile_lock = get_profile_lock(profile) if profile and profile['mode'] == 'user_data_dir' else None
+    
+    try:
+        if profile_lock:
+            await profile_lock.acquire()
+        
+        user_agent = None
+        context = await create_source_context(browser, source_config, profile)
+        stats_list = [await setup_request_blocking(context, source_config)]
+        page = await create_source_page(context, source_config)
+        
+        result = None
+        failure = None
+        state = None  # Пройденные этапы: повтор продолжает с упавшего
+        retries_used = {}  # Класс отказа -> сделано повторов
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt == 0 and fire_at:
+                state = await prefetch_page(page, source_config, source_key, profile, fire_at)
+            state = state or new_capture_state()
+            
+            try:
+                result = await take_screenshot(page, source_config, source_key, profile, state)
+                failure = None
+                break
+            except Exception as e:
+                failure = classify_failure(e)
+                logger.error(f"✗ [{source_key}] Ошибка создания скриншота ({failure}, этап {state['stage']}): {e}")
+                if failure == 'unknown':
+                    logger.error(traceback.format_exc())
+            
+            policy = RETRY_POLICIES.get(failure, RETRY_POLICIES['unknown'])
+            used = retries_used.get(failure, 0)
+            if attempt == MAX_RETRIES or used >= policy['retries']:
+                break
+            retries_used[failure] = used + 1
+            
+            delay = policy.get('backoff', 0) * (2 ** used)
+            fresh = policy.get('fresh_context', False)
+            logger.info(
+                f"\n🔄 [{source_key}] Повторная попытка {attempt + 1}/{MAX_RETRIES} ({failure})"
+                f"{f', пауза {delay:.0f} сек' if delay else ''}{', новый контекст' if fresh else ''}"
+            )
+            if fresh:
+                # Новый отпечаток без сохраненных cookies: старый профиль мог попасть под блок
+                await close_source_context(context, source_key)
+                context = None
+                profile = None
+                user_agent = pick_fresh_user_agent(user_agent or source_config.get('custom_user_agent') or DEFAULT_USER_AGENT)
+                context = await create_source_context(browser, source_config, None, user_agent)
+                stats_list.append(await setup_request_blocking(context, source_config))
+                page = await create_source_page(context, source_config)
+                state = None
+            else:
+                state = get_resume_state(page, source_config, state)
+            if delay:
+                await asyncio.sleep(delay)
+        
+        block_stats = merge_block_stats(stats_list) if len(stats_list) > 1 else stats_list[0]
+        log_block_report(block_stats, source_key)
+        if result:
+            result['network'] = block_stats
+            record_domain_success(domain)
+            await save_browser_profile(context, profile, result.get('consent_accepted', False))
+        elif failure and RETRY_POLICIES.get(failure, RETRY_POLICIES['unknown']).get('breaker'):
+            record_domain_failure(domain, failure)
+        
+        return result
+    
+    finally:
+        # CRITICAL: Контекст закрывается всегда, браузер остается общим
+        if context:
+            await close_source_context(context, source_key)
+        if profile_lock and profile_lock.locked():
+            profile_lock.release()
+
+
+async def capture_sources_batch(browser, source_keys, concurrency=None):
+    """
+    Параллельно снимает несколько источников в одном браузере
+    
+    Каждый источник получает свой BrowserContext, одновременно работает
+    не больше concurrency контекстов. Время батча ≈ время самого медленного
+    источника, а не сумма всех ожиданий take_screenshot.
+    
+    Returns:
+        dict: {source_key: result или None}
+    """
+    concurrency = max(1, concurrency or BATCH_CONCURRENCY)
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _capture(source_key):
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                result = await capture_source(browser, source_key, SCREENSHOT_SOURCES[source_key])
+            except Exception as e:
+                logger.error(f"✗ [{source_key}] Ошибка захвата: {e}")
+                result = None
+            logger.info(f"⏱️  [{source_key}] Захват: {time.monotonic() - started:.1f} сек ({'✓' if result else '✗'})")
+            return source_key, result
+    
+    logger.info(f"📦 Батч: {len(source_keys)} источников, параллельно до {concurrency}")
+    pairs = await asyncio.gather(*(_capture(key) for key in source_keys))
+    return dict(pairs)
+
+
+async def capture_speculative(browser, candidates, fire_at=None):
+    """
+    Спекулятивный захват: кандидаты слота снимаются параллельно в своих контекстах
+    
+    Результаты проверяются в порядке candidates (случайный порядок слота):
+    публикуется первый успешный, остальные захваты отменяются.
+    
+    Returns:
+        tuple: (source_key, result) или (candidates[0], None) если не удался ни один
+    """
+    logger.info(f"🎲 Спекулятивный захват: {', '.join(candidates)}")
+    started = time.monotonic()
+    tasks = {
+        key: asyncio.create_task(capture_source(browser, key, SCREENSHOT_SOURCES[key], fire_at))
+        for key in candidates
+    }
+    
+    try:
+        for source_key in candidates:
+            try:
+                result = await tasks[source_key]
+            except Exception as e:
+                logger.error(f"✗ [{source_key}] Ошибка захвата: {e}")
+                result = None
+            
+            if result:
+                logger.info(f"⏱️  Спекулятивный захват: {source_key} за {time.monotonic() - started:.1f} сек")
+                return source_key, result
+            logger.warning(f"⚠️ [{source_key}] Кандидат не снят, беру следующий")
+        
+        return candidates[0], None
+    
+    finally:
+        pending = [task for task in tasks.values() if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            # Ждем finally в capture_source: контексты закрываются
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.info(f"  ✂️ Отменено захватов: {len(pending)}")
+
+
+def get_unchanged_reason(source_key, source_config, result):
+    """
+    Проверяет, что скриншот визуально совпадает с последней публикацией источника
+    
+    Returns:
+        str: Причина пропуска публикации или None если публикуем
+    """
+    if not DEDUPE_SETTINGS.get('enabled', True) or not source_config.get('dedupe', True):
+        return None
+    
+    previous_hash, previous_at = get_last_hash(source_key)
+    if not previous_hash or not result.get('dhash'):
+        return None
+    
+    from image_pipeline import hash_distance
+    
+    distance = hash_distance(result['dhash'], previous_hash)
+    if distance is None:
+        return None
+    
+    age_hours = (datetime.now(timezone.utc) - previous_at).total_seconds() / 3600
+    
+    logger.info(f"  🔍 dHash: {distance} бит отличий от публикации {age_hours:.1f} ч назад (порог {DEDUPE_SETTINGS['max_distance']})")
+    
+    if distance > DEDUPE_SETTINGS['max_distance']:
+        return None
+    if age_hours >= DEDUPE_SETTINGS['max_age_hours']:
+        logger.info(f"  ℹ️  Без изменений, но публикации больше {DEDUPE_SETTINGS['max_age_hours']} ч - публикуем")
+        return None
+    
+    return f"скриншот не изменился ({distance} бит отличий ≤ {DEDUPE_SETTINGS['max_distance']}, последняя публикация {age_hours:.1f} ч назад)"
+
+
+async def publish_screenshot(source_key, source_config, result):
+    """
+    Публикует готовый скриншот: Alpha Take, Telegram, Twitter и история
+    
+    Returns:
+        dict: {"telegram": bool, "twitter": bool, "skipped": причина или None}
+    """
+    # Неизмененный скриншот не публикуем: экономим OpenAI, Telegram и коммит истории
+    skip_reason = get_unchanged_reason(source_key, source_config, result)
+    if skip_reason:
+        logger.info(f"\n⏭️  ПУБЛИКАЦИЯ ПРОПУЩЕНА: {source_config['name']} - {skip_reason}")
+        return {"telegram": False, "twitter": False, "skipped": skip_reason}
+    
+    # Формируем caption для Telegram
+    title = source_config['telegram_title']
+    hashtags = source_config['telegram_hashtags']
+    
+    # FIX ISSUE #26: HTML escape для безопасности
+    title_escaped = html.escape(title)
+    hashtags_escaped = html.escape(hashtags)
+    
+    # 🤖 ALPHA TAKE от OpenAI
+    ai_result = None
+    skip_ai = source_config.get('skip_ai', False)
+    if OPENAI_ENABLED and not skip_ai:
+        logger.info("\n🤖 ГЕНЕРАЦИЯ ALPHA TAKE")
+        # Синхронный клиент OpenAI - в потоке, как tweepy: event loop не стоит секунды запроса
+        ai_result = await asyncio.to_thread(get_ai_comment, source_key, get_rendition(result, 'ai'))
+        if ai_result:
+            logger.info("  ✓ Alpha Take получен")
+        else:
+            logger.info("  ⚠️ Alpha Take не получен")
+    else:
+        if skip_ai:
+            logger.info("  ℹ️  AI отключен для этого источника (skip_ai=True)")
+        else:
+            logger.info("  ℹ️  OpenAI отключен")
+    
+    # Формируем финальный caption
+    caption = add_alpha_take_to_caption(title_escaped, hashtags_escaped, ai_result)
+    
+    # FIX ISSUE #10: Валидация длины caption (Telegram limit: 1024)
+    if len(caption) > 1024:
+        logger.warning(f"⚠️ Caption слишком длинный ({len(caption)} символов), обрезаю")
+        caption = caption[:1020] + "..."
+    
+    # Отправляем в Telegram
+    logger.info("\n📤 ОТПРАВКА В TELEGRAM")
+    tg_success = await send_telegram_photo(get_rendition(result, 'telegram'), caption)
+    
+    if not tg_success:
+        logger.warning("⚠️ Ошибка отправки в Telegram")
+    
+    await asyncio.sleep(2)
+    
+    # Отправляем в Twitter (после rate limit - не раньше twitter_retry_at)
+    tw_success = False
+    twitter_retry_at = get_state("twitter_retry_at")
+    if not TWITTER_ENABLED:
+        logger.info("ℹ️  Twitter отключен")
+    elif twitter_retry_at and datetime.fromisoformat(twitter_retry_at) > datetime.now(timezone.utc):
+        logger.info(f"⏸️  Twitter: rate limit до {twitter_retry_at}, пропускаю")
+    else:
+        tw_result = await send_to_twitter(title, hashtags, get_rendition(result, 'twitter'))
+        tw_success = tw_result['ok']
+        set_state("twitter_retry_at", tw_result['retry_at'])
+    
+    # Обновляем историю публикаций (одна строка в журнал)
+    # Хэш сохраняем только для реально опубликованного скриншота
+    record_publication(
+        source_key,
+        name=source_config['name'],
+        telegram=tg_success,
+        twitter=tw_success,
+        dhash=result.get('dhash') if (tg_success or tw_success) else None
+    )
+    day_start_utc, day_end_utc = local_interval(to_schedule_time(datetime.now(timezone.utc)).date(), 0, 24 * 60)
+    published_today = count_publications(source_key, day_start_utc, day_end_utc)
+    
+    logger.info(f"\n🎯 ИТОГ")
+    logger.info(f"  ✓ Источник: {source_config['name']}")
+    logger.info(f"  ✓ Скриншот: {len(result['image_bytes']) / 1024:.1f} KB{' (архив: ' + result['screenshot_path'] + ')' if result.get('screenshot_path') else ''}")
+    logger.info(f"  ✓ Telegram: {tg_success}")
+    logger.info(f"  ✓ Twitter: {tw_success}")
+    logger.info(f"  ✓ Публикаций источника за сутки (MSK): {published_today}")
+    
+    return {"telegram": tg_success, "twitter": tw_success, "skipped": None}
+
+
+def select_scheduled_source(now_utc=None):
+    """
+    Выбирает источник по расписанию с учетом cooldown и enabled
+    
+    Args:
+        now_utc: Момент выбора (None - сейчас; начало слота - для предзагрузки)
+    
+    Returns:
+        tuple: (source_key, source_config) или (None, None) если публиковать нечего
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    
+    # ✅ НОВОЕ: Определяем источник по расписанию MSK
+    source_key = get_source_by_schedule(now_utc)
+    
+    if not source_key:
+        logger.info("⏰ Сейчас не время для публикации по расписанию")
+        return None, None  # ✅ Это не ошибка - просто не время
+    
+    # ✅ ЗАЩИТА ОТ ДУБЛЕЙ: Проверяем когда последний раз публиковался этот источник
+    last_time = get_last_published(source_key)
+    
+    if last_time:
+        time_since_last = (now_utc - last_time).total_seconds() / 60  # минуты
+        
+        # Cooldown 30 минут - не публиковать один источник чаще
+        if time_since_last < 30:
+            logger.info(f"⏸️  Источник {source_key} уже публиковался {int(time_since_last)} минут назад")
+            logger.info(f"⏸️  Cooldown: ждем еще {int(30 - time_since_last)} минут")
+            return None, None  # ✅ Это не ошибка - просто cooldown
+    
+    source_config = SCREENSHOT_SOURCES.get(source_key)
+    
+    if not source_config:
+        raise Exception(f"Источник {source_key} не найден в конфигурации")
+    
+    if not source_config.get('enabled', True):
+        logger.info(f"⚠️ Источник {source_key} отключен")
+        return None, None  # ✅ Это не ошибка - источник просто отключен
+    
+    logger.info(f"📅 Выбранный источник: {source_config['name']}")
+    return source_key, source_config
+
+
+def get_breaker_open_until(source_key, source_config, log=True):
+    """
+    Разомкнут ли circuit breaker домена источника (отказы антибота/навигации)
+    
+    Пока домен разомкнут, захват не запускается: это плановый пропуск, не ошибка.
+    
+    Returns:
+        datetime: До какого времени (UTC) домен пропускается, или None
+    """
+    domain = get_source_domain(source_config['url'])
+    open_until = get_open_until(domain)
+    if not open_until:
+        return None
+    open_until = datetime.fromtimestamp(open_until, timezone.utc)
+    if log:
+        logger.warning(
+            f"🔌 [{source_key}] Домен {domain} разомкнут до "
+            f"{to_schedule_time(open_until).strftime('%d.%m %H:%M')} MSK - захват пропущен"
+        )
+    return open_until
+
+
+def is_source_available(source_key, now_utc):
+    """Источник включен, не в cooldown и домен не разомкнут (без логов - для подбора кандидатов)"""
+    source_config = SCREENSHOT_SOURCES.get(source_key)
+    if not source_config or not source_config.get('enabled', True):
+        return False
+    if get_breaker_open_until(source_key, source_config, log=False):
+        return False
+    last_time = get_last_published(source_key)
+    return not last_time or (now_utc - last_time).total_seconds() >= 30 * 60
+
+
+def get_speculative_candidates(source_key, now_utc=None):
+    """
+    Кандидаты спекулятивного захвата для выбранного источника
+    
+    Для слота с selection "random" и "speculative": N - выбранный источник
+    и до N - 1 других доступных источников слота в случайном порядке.
+    
+    Returns:
+        list: [source_key, ...] - один элемент, если спекуляция не включена
+    """
+    now_utc = now_utc or datetime.now(timezone.utc)
+    for slot in due_slots(now_utc):
+        slot_config = slot['config']
+        count = slot_config.get('speculative', 1)
+        if slot_config.get('selection') != 'random' or count <= 1 or source_key not in slot_config['sources']:
+            continue
+        others = [key for key in slot_config['sources'] if key != source_key and is_source_available(key, now_utc)]
+        random.shuffle(others)
+        return [source_key] + others[:count - 1]
+    return [source_key]
 
 
-async def main_parser():
-    """Главная функция парсера со скриншотами"""
+def has_speculative_slots():
+    """Есть ли слоты со спекулятивным захватом (нужны параллельные контексты)"""
+    return any(slot.get('speculative', 1) > 1 for slot in POST_SCHEDULE.values())
+
+
+def resolve_planned_source(source_key):
+    """
+    Источник, выбранный заранее (plan.py в workflow): без повторного выбора по расписанию
+    
+    Returns:
+        tuple: (source_key, source_config) или (None, None) если источник отключен
+    """
+    source_config = SCREENSHOT_SOURCES.get(source_key)
+    
+    if not source_config:
+        raise Exception(f"Источник {source_key} не найден в конфигурации")
+    
+    if not source_config.get('enabled', True):
+        logger.info(f"⚠️ Источник {source_key} отключен")
+        return None, None
+    
+    logger.info(f"📅 Источник из плана: {source_config['name']}")
+    return source_key, source_config
+
+
+async def capture_and_publish(browser, source_key, source_config, fire_at=None, candidates=None):
+    """Снимает источник в уже запущенном браузере и публикует результат
+    
+    Args:
+        fire_at: Время открытия слота для предзагрузки (см. capture_source)
+        candidates: Кандидаты спекулятивного захвата (None - get_speculative_candidates)
+    
+    Returns:
+        Результат publish_screenshot или None, если домен разомкнут (пропуск без ошибки)
+    """
+    candidates = candidates or get_speculative_candidates(source_key, fire_at)
+    if len(candidates) == 1 and get_breaker_open_until(source_key, source_config):
+        return None
+    
+    # Делаем скриншот с повторными попытками
+    if len(candidates) > 1:
+        source_key, result = await capture_speculative(browser, candidates, fire_at)
+        source_config = SCREENSHOT_SOURCES[source_key]
+    else:
+        result = await capture_source(browser, source_key, source_config, fire_at)
+    
+    if not result:
+        raise Exception(f"Не удалось создать скриншот после {MAX_RETRIES + 1} попыток")
+    
+    return await publish_screenshot(source_key, source_config, result)
+
+
+async def main_parser(planned_source=None):
+    """Главная функция парсера со скриншотами
+    
+    Args:
+        planned_source: Ключ источника, уже выбранного plan.py (None = выбрать по расписанию)
+    """
     browser = None  # CRITICAL: Initialize before try block
     
     try:
@@ -1080,216 +2705,212 @@ async def main_parser():
         logger.info("🚀 ЗАПУСК ПАРСЕРА СКРИНШОТОВ v2.0 - MSK SCHEDULE")
         logger.info("="*70)
         
-        # ✅ НОВОЕ: Определяем источник по расписанию MSK
-        source_key = get_source_by_schedule()
+        if planned_source:
+            source_key, source_config = resolve_planned_source(planned_source)
+        else:
+            source_key, source_config = select_scheduled_source()
         
         if not source_key:
-            logger.info("⏰ Сейчас не время для публикации по расписанию")
-            return True  # ✅ Это не ошибка - просто не время
-        
-        # ✅ ЗАЩИТА ОТ ДУБЛЕЙ: Проверяем когда последний раз публиковался этот источник
-        history = load_publication_history()
-        last_published = history.get("last_published", {}).get(source_key)
-        
-        if last_published:
-            try:
-                last_time = datetime.fromisoformat(last_published)
-                now = datetime.now(timezone.utc)
-                time_since_last = (now - last_time).total_seconds() / 60  # минуты
-                
-                # Cooldown 30 минут - не публиковать один источник чаще
-                if time_since_last < 30:
-                    logger.info(f"⏸️  Источник {source_key} уже публиковался {int(time_since_last)} минут назад")
-                    logger.info(f"⏸️  Cooldown: ждем еще {int(30 - time_since_last)} минут")
-                    return True  # ✅ Это не ошибка - просто cooldown
-            except (ValueError, TypeError) as e:
-                logger.warning(f"⚠️ Невалидный формат времени в истории для {source_key}: {e}")
-                logger.info(f"  Продолжаем выполнение...")
-                # Продолжаем - публикуем, так как не можем определить когда была последняя публикация
-        
-        source_config = SCREENSHOT_SOURCES.get(source_key)
+            return True
         
-        if not source_config:
-            raise Exception(f"Источник {source_key} не найден в конфигурации")
+        if not await validate_telegram_credentials():
+            logger.error("✗ КРИТИЧЕСКАЯ ОШИБКА: Невалидные Telegram credentials!")
+            return False
         
-        if not source_config.get('enabled', True):
-            logger.info(f"⚠️ Источник {source_key} отключен")
-            return True  # ✅ Это не ошибка - источник просто отключен
+        candidates = get_speculative_candidates(source_key)
+        if len(candidates) == 1 and get_breaker_open_until(source_key, source_config):
+            # Плановый пропуск: браузер не запускаем, запуск не считается упавшим
+            return True
         
-        logger.info(f"📅 Выбранный источник: {source_config['name']}")
+        from playwright.async_api import async_playwright
         
         async with async_playwright() as p:
             logger.info("🌐 Запуск браузера...")
-
-            browser = await p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-setuid-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--single-process',
-                    '--disable-blink-features=AutomationControlled'  # ✅ Скрыть автоматизацию
-                ]
-            )
-
-            # ✅ Получаем custom user-agent если задан в конфиге
-            custom_ua = source_config.get('custom_user_agent')
-            user_agent = custom_ua if custom_ua else 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36'
+            # Спекулятивный захват - несколько контекстов: --single-process не используем
+            browser = await launch_browser(p, single_process=len(candidates) == 1)
             
-            # ✅ Получаем custom viewport если задан в конфиге
-            viewport_width = source_config.get('viewport_width', SCREENSHOT_SETTINGS['viewport_width'])
-            viewport_height = source_config.get('viewport_height', SCREENSHOT_SETTINGS['viewport_height'])
+            await capture_and_publish(browser, source_key, source_config, candidates=candidates)
             
-            context = await browser.new_context(
-                user_agent=user_agent,
-                viewport={
-                    'width': viewport_width, 
-                    'height': viewport_height
-                },
-                # ✅ Дополнительные headers для обхода блокировки
-                extra_http_headers={
-                    'Accept-Language': 'en-US,en;q=0.9',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                    'Sec-Fetch-Dest': 'document',
-                    'Sec-Fetch-Mode': 'navigate',
-                    'Sec-Fetch-Site': 'none',
-                    'Sec-Fetch-User': '?1'
-                }
-            )
-
-            # ✅ Удаляем webdriver флаги
-            page = await context.new_page()
-            
-            # ✅ Stealth mode если включен
-            if source_config.get('stealth_mode', False):
-                await page.add_init_script("""
-                    // Удаляем webdriver
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    });
-                    
-                    // Скрываем automation
-                    Object.defineProperty(navigator, 'plugins', {
-                        get: () => [1, 2, 3, 4, 5]
-                    });
-                    
-                    Object.defineProperty(navigator, 'languages', {
-                        get: () => ['en-US', 'en']
-                    });
-                    
-                    // Chrome runtime
-                    window.chrome = {
-                        runtime: {}
-                    };
-                """)
-            else:
-                await page.add_init_script("""
-                    Object.defineProperty(navigator, 'webdriver', {
-                        get: () => undefined
-                    });
-                """)
+            logger.info("="*70)
             
-            # Делаем скриншот с повторными попытками
-            result = None
-            for retry in range(MAX_RETRIES + 1):
-                if retry > 0:
-                    logger.info(f"\n🔄 Повторная попытка {retry}/{MAX_RETRIES}")
-                    await asyncio.sleep(3)
+            return True
+
+    except Exception as e:
+        logger.error(f"\n❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
+        logger.error(traceback.format_exc())
+        return False
+    
+    finally:
+        await close_telegram_session()
+        # CRITICAL: Guaranteed browser cleanup
+        if browser:
+            try:
+                await browser.close()
+                logger.info("✓ Браузер закрыт\n")
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка закрытия браузера: {e}")
+
+
+def get_daemon_wake(now_utc, upcoming=None, success=True):
+    """
+    Когда daemon просыпается в следующий раз
+    
+    Args:
+        now_utc: Текущее время
+        upcoming: Слот, к которому готовилась предзагрузка (или None)
+        success: Итог прошедшего цикла
+    
+    Returns:
+        tuple: (wake_at, upcoming) - upcoming None: на пробуждении обычный путь
+               открытого слота, иначе предзагрузка к слоту upcoming
+    """
+    if upcoming and now_utc < upcoming:
+        # Предзагрузка не дошла до слота (источник не выбран, захват упал сразу):
+        # ждем открытия и обрабатываем слот обычным путем - без холостых циклов
+        return upcoming, None
+    
+    # Следующий слот - строго после now_utc, а now_utc уже не раньше upcoming
+    next_start = get_next_slot_start(now_utc)
+    wake_at = max(now_utc, next_start - timedelta(seconds=get_max_prefetch_lead()))
+    retry_at = now_utc + timedelta(seconds=DAEMON_RETRY_SECONDS)
+    if not success and retry_at < wake_at:
+        # Повтор в текущем открытом слоте, без предзагрузки
+        return retry_at, None
+    return wake_at, next_start
+
+
+async def daemon_parser():
+    """
+    Резидентный режим: один прогретый браузер на весь процесс
+    
+    Спит до начала следующего слота POST_SCHEDULE и выполняет
+    захват/публикацию в том же процессе, без повторного импорта модулей
+    и chromium.launch. Просыпается за prefetch_lead_seconds до слота:
+    страница уже загружена и готова, захват - ровно в момент открытия.
+    После неудачной попытки внутри открытого слота повторяет через
+    DAEMON_RETRY_SECONDS.
+    """
+    browser = None
+    upcoming = None  # Начало слота, к которому daemon проснулся заранее
+    
+    try:
+        logger.info("="*70)
+        logger.info("🚀 ЗАПУСК ПАРСЕРА СКРИНШОТОВ v2.0 - DAEMON MODE")
+        logger.info("="*70)
+        
+        if not await validate_telegram_credentials():
+            logger.error("✗ КРИТИЧЕСКАЯ ОШИБКА: Невалидные Telegram credentials!")
+            return False
+        
+        from playwright.async_api import async_playwright
+        
+        async with async_playwright() as p:
+            while True:
+                # Перезапускаем браузер только если он упал
+                if browser is None or not browser.is_connected():
+                    logger.info("🌐 Запуск браузера...")
+                    browser = await launch_browser(p, single_process=not has_speculative_slots())
                 
-                result = await take_screenshot(page, source_config, source_key)
+                cleanup_old_screenshots(max_age_hours=24)
                 
-                if result:
-                    break
-            
-            if not result:
-                raise Exception(f"Не удалось создать скриншот после {MAX_RETRIES + 1} попыток")
-            
-            # Формируем caption для Telegram
-            title = source_config['telegram_title']
-            hashtags = source_config['telegram_hashtags']
-            
-            # FIX ISSUE #26: HTML escape для безопасности
-            title_escaped = html.escape(title)
-            hashtags_escaped = html.escape(hashtags)
-            
-            # 🤖 ALPHA TAKE от OpenAI
-            ai_result = None
-            skip_ai = source_config.get('skip_ai', False)
-            if OPENAI_ENABLED and not skip_ai:
-                logger.info("\n🤖 ГЕНЕРАЦИЯ ALPHA TAKE")
-                ai_result = get_ai_comment(source_key, result['screenshot_path'])
-                if ai_result:
-                    logger.info("  ✓ Alpha Take получен")
-                else:
-                    logger.info("  ⚠️ Alpha Take не получен")
-            else:
-                if skip_ai:
-                    logger.info("  ℹ️  AI отключен для этого источника (skip_ai=True)")
-                else:
-                    logger.info("  ℹ️  OpenAI отключен")
-            
-            # Формируем финальный caption
-            caption = add_alpha_take_to_caption(title_escaped, hashtags_escaped, ai_result)
-            
-            # FIX ISSUE #10: Валидация длины caption (Telegram limit: 1024)
-            if len(caption) > 1024:
-                logger.warning(f"⚠️ Caption слишком длинный ({len(caption)} символов), обрезаю")
-                caption = caption[:1020] + "..."
-            
-            # Отправляем в Telegram
-            logger.info("\n📤 ОТПРАВКА В TELEGRAM")
-            tg_success = send_telegram_photo(result['screenshot_path'], caption)
-            
-            if not tg_success:
-                logger.warning("⚠️ Ошибка отправки в Telegram")
-            
-            time.sleep(2)
-            
-            # Отправляем в Twitter
-            if TWITTER_ENABLED:
-                tw_success = send_to_twitter(title, hashtags, result['screenshot_path'])
-            else:
-                tw_success = False
-                logger.info("ℹ️  Twitter отключен")
-            
-            # Обновляем историю публикаций
-            history = load_publication_history()
-            current_hour = datetime.now(timezone.utc).hour  # ✅ Добавил определение
-            
-            # ✅ ИСПРАВЛЕНИЕ БАГ #1: Инициализируем last_published если его нет
-            if "last_published" not in history:
-                history["last_published"] = {}
-            
-            history["last_published"][source_key] = datetime.now(timezone.utc).isoformat()
-            history["last_publication"] = {
-                "source": source_key,
-                "name": source_config['name'],
-                "published_at": datetime.now(timezone.utc).isoformat(),
-                "hour_utc": current_hour,
-                "telegram": tg_success,
-                "twitter": tw_success
-            }
-            save_publication_history(history)
-            
-            logger.info(f"\n🎯 ИТОГ")
-            logger.info(f"  ✓ Источник: {source_config['name']}")
-            logger.info(f"  ✓ Скриншот: {result['screenshot_path']}")
-            logger.info(f"  ✓ Telegram: {tg_success}")
-            logger.info(f"  ✓ Twitter: {tw_success}")
-            
-            # Cleanup: удаляем файл скриншота после успешной публикации
-            screenshot_file = result['screenshot_path']
-            if screenshot_file and os.path.exists(screenshot_file):
+                success = True
                 try:
-                    os.remove(screenshot_file)
-                    logger.info(f"  🗑️  Удален файл скриншота: {os.path.basename(screenshot_file)}")
+                    if upcoming and datetime.now(timezone.utc) < upcoming:
+                        # Слот еще не открыт: источник выбираем на момент открытия и готовим страницу
+                        source_key, source_config = select_scheduled_source(upcoming)
+                        if source_key:
+                            prefetch_at = upcoming - timedelta(seconds=get_prefetch_lead(source_config))
+                            await asyncio.sleep(max(0.0, (prefetch_at - datetime.now(timezone.utc)).total_seconds()))
+                            await capture_and_publish(browser, source_key, source_config, fire_at=upcoming)
+                    else:
+                        source_key, source_config = select_scheduled_source()
+                        if source_key:
+                            await capture_and_publish(browser, source_key, source_config)
                 except Exception as e:
-                    logger.warning(f"  ⚠️ Не удалось удалить скриншот: {e}")
-            
-            logger.info("="*70)
-            
+                    success = False
+                    logger.error(f"\n❌ ОШИБКА ЦИКЛА: {e}")
+                    logger.error(traceback.format_exc())
+                
+                wake_at, upcoming = get_daemon_wake(datetime.now(timezone.utc), upcoming, success)
+                
+                sleep_seconds = max(0.0, (wake_at - datetime.now(timezone.utc)).total_seconds())
+                wake_msk = to_schedule_time(wake_at)
+                slot_note = f", слот {to_schedule_time(upcoming).strftime('%H:%M')}" if upcoming else ""
+                logger.info(f"💤 Следующий запуск: {wake_msk.strftime('%Y-%m-%d %H:%M:%S')} MSK (через {sleep_seconds / 60:.1f} мин{slot_note})")
+                await asyncio.sleep(sleep_seconds)
+    
+    finally:
+        await close_telegram_session()
+        if browser:
+            try:
+                await browser.close()
+                logger.info("✓ Браузер закрыт\n")
+            except Exception as e:
+                logger.warning(f"⚠️ Ошибка закрытия браузера: {e}")
+
+
+async def batch_parser(source_keys=None, concurrency=None):
+    """
+    Батч-режим: параллельный захват нескольких источников и их публикация
+    
+    Args:
+        source_keys: Список ключей источников (None = все включенные)
+        concurrency: Максимум одновременных контекстов (None = BATCH_CONCURRENCY)
+    """
+    browser = None
+    
+    try:
+        logger.info("="*70)
+        logger.info("🚀 ЗАПУСК ПАРСЕРА СКРИНШОТОВ v2.0 - BATCH MODE")
+        logger.info("="*70)
+        
+        if not source_keys:
+            source_keys = [key for key, config in SCREENSHOT_SOURCES.items() if config.get('enabled', True)]
+        
+        unknown = [key for key in source_keys if key not in SCREENSHOT_SOURCES]
+        if unknown:
+            raise Exception(f"Источники не найдены в конфигурации: {', '.join(unknown)}")
+        
+        disabled = [key for key in source_keys if not SCREENSHOT_SOURCES[key].get('enabled', True)]
+        for key in disabled:
+            logger.info(f"⚠️ Источник {key} отключен, пропускаю")
+        source_keys = [key for key in source_keys if key not in disabled]
+        
+        if not source_keys:
+            logger.info("ℹ️  Нет включенных источников для батча")
             return True
+        
+        if not await validate_telegram_credentials():
+            logger.error("✗ КРИТИЧЕСКАЯ ОШИБКА: Невалидные Telegram credentials!")
+            return False
+        
+        from playwright.async_api import async_playwright
+        
+        async with async_playwright() as p:
+            logger.info("🌐 Запуск браузера...")
+            # Несколько контекстов в одном процессе: --single-process не используем
+            browser = await launch_browser(p, single_process=False)
+            
+            started = time.monotonic()
+            results = await capture_sources_batch(browser, source_keys, concurrency)
+            logger.info(f"⏱️  Батч захвачен за {time.monotonic() - started:.1f} сек")
+            log_block_report(merge_block_stats(r['network'] for r in results.values() if r and r.get('network')), "батч")
+        
+        # Публикуем последовательно в порядке запроса
+        failed = []
+        for source_key in source_keys:
+            result = results.get(source_key)
+            if not result:
+                failed.append(source_key)
+                continue
+            await publish_screenshot(source_key, SCREENSHOT_SOURCES[source_key], result)
+        
+        logger.info(f"\n🎯 БАТЧ: {len(source_keys) - len(failed)}/{len(source_keys)} источников опубликовано")
+        if failed:
+            logger.warning(f"⚠️ Не удалось снять: {', '.join(failed)}")
+        logger.info("="*70)
+        
+        return not failed
 
     except Exception as e:
         logger.error(f"\n❌ КРИТИЧЕСКАЯ ОШИБКА: {e}")
@@ -1297,7 +2918,7 @@ async def main_parser():
         return False
     
     finally:
-        # CRITICAL: Guaranteed browser cleanup
+        await close_telegram_session()
         if browser:
             try:
                 await browser.close()
@@ -1306,10 +2927,42 @@ async def main_parser():
                 logger.warning(f"⚠️ Ошибка закрытия браузера: {e}")
 
 
+def parse_args(argv=None):
+    """Разбирает аргументы командной строки"""
+    parser = argparse.ArgumentParser(description="CMC screenshot parser")
+    parser.add_argument(
+        '--batch',
+        nargs='?',
+        const='all',
+        metavar='KEYS',
+        help="Параллельно снять источники (через запятую, по умолчанию все включенные)"
+    )
+    parser.add_argument(
+        '--daemon',
+        action='store_true',
+        help="Резидентный режим: прогретый браузер и сон до следующего слота"
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help=f"Максимум одновременных контекстов в батче (по умолчанию {BATCH_CONCURRENCY})"
+    )
+    parser.add_argument(
+        '--source',
+        default=None,
+        metavar='KEY',
+        help="Источник, уже выбранный plan.py (без повторного выбора по расписанию)"
+    )
+    return parser.parse_args(argv)
+
+
 def main():
     """Точка входа в программу"""
     lock_file = None
     lock_path = None
+    args = parse_args()
+    mode = 'DAEMON' if args.daemon else 'BATCH' if args.batch else 'SCHEDULED'
     
     try:
         # Проверка lock-файла
@@ -1319,23 +2972,21 @@ def main():
             sys.exit(2)
         
         logger.info("\n" + "="*70)
-        logger.info("🤖 CMC SCREENSHOT PARSER - SCHEDULED MODE")
+        logger.info(f"🤖 CMC SCREENSHOT PARSER - {mode} MODE")
         logger.info("="*70)
         logger.info(f"📅 Дата запуска: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')} UTC")
         logger.info(f"💻 Платформа: {platform.system()} {platform.release()}")
         logger.info(f"🔒 Lock файл: {lock_path}")
         logger.info(f"⚙️  Настройки:")
         logger.info(f"   • MAX_RETRIES: {MAX_RETRIES}")
+        if args.daemon:
+            logger.info(f"   • DAEMON_RETRY_SECONDS: {DAEMON_RETRY_SECONDS}")
+        if args.batch:
+            logger.info(f"   • BATCH_CONCURRENCY: {args.concurrency or BATCH_CONCURRENCY}")
         logger.info(f"   • Telegram: {'✓' if TELEGRAM_BOT_TOKEN else '✗'}")
         logger.info(f"   • Twitter: {'✓' if TWITTER_ENABLED and TWITTER_API_KEY else '✗'}")
         logger.info("="*70 + "\n")
         
-        # Валидация Telegram
-        if not validate_telegram_credentials():
-            logger.error("✗ КРИТИЧЕСКАЯ ОШИБКА: Невалидные Telegram credentials!")
-            release_lock(lock_file, lock_path)
-            sys.exit(1)
-        
         # CRITICAL: Cleanup старых файлов перед запуском
         logger.info("\n🗑️  CLEANUP СТАРЫХ ФАЙЛОВ")
         cleanup_old_screenshots(max_age_hours=24)
@@ -1343,7 +2994,16 @@ def main():
         logger.info("")
         
         # Запускаем основной парсер
-        success = asyncio.run(main_parser())
+        if args.daemon:
+            success = asyncio.run(daemon_parser())
+        elif args.batch:
+            batch_keys = None if args.batch == 'all' else [key.strip() for key in args.batch.split(',') if key.strip()]
+            success = asyncio.run(batch_parser(batch_keys, args.concurrency))
+        else:
+            success = asyncio.run(main_parser(args.source))
+        
+        # Файл базы истории должен быть закрыт до коммита в workflow
+        close_history_db()
         
         # Освобождаем lock
         release_lock(lock_file, lock_path)
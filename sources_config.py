@@ -165,7 +165,8 @@ SCREENSHOT_SOURCES = {
         "element_padding": {"top": 50, "right": 50, "bottom": 50, "left": 50},
         "hide_elements": "header, nav, footer, aside, [class*='navbar'], [class*='Navigation'], [class*='sidebar'], [class*='banner'], [class*='ad'], [class*='cookie']",
         "crop": {"top": 0, "right": 0, "bottom": 0, "left": 0},
-        "skip_width_padding": True
+        "skip_width_padding": True,
+        "dedupe": False  # Гарантированная публикация 2 раза в день
     },
     
     # ОТКЛЮЧЕННЫЕ (для истории)
@@ -205,10 +206,53 @@ SCREENSHOT_SOURCES = {
         "hide_elements": "header, nav, footer, [class*='banner'], [class*='ad'], [class*='cookie'], [class*='popup'], [class*='modal'], aside",
         "crop": {"top": 0, "right": 0, "bottom": 400, "left": 0},  # Обрезаем снизу лишнее
         "skip_width_padding": True,
-        "stealth_mode": True
+        "stealth_mode": True,
+        "block_resources": {
+            "resource_types": ["media"],
+            "url_patterns": ["*://*.coinzilla.*/*"]
+        }
     }
 }
 
+# ===============================================================================
+# БЛОКИРОВКА ЗАПРОСОВ (page.route)
+# ===============================================================================
+# Глобальный blocklist для всех источников: реклама, аналитика, трекеры.
+# Источник может расширить его своим "block_resources":
+#   "block_resources": {
+#       "resource_types": ["media", "font"],      # типы ресурсов Playwright
+#       "url_patterns": ["*://*.example-ads.com/*"],  # glob-шаблоны URL
+#       "inherit_default": True                   # False - без глобального списка
+#   }
+# или отключить блокировку полностью: "block_resources": False
+DEFAULT_BLOCK_RESOURCES = {
+    "resource_types": [],
+    "url_patterns": [
+        "*://*.google-analytics.com/*",
+        "*://*.googletagmanager.com/*",
+        "*://*.doubleclick.net/*",
+        "*://*.googlesyndication.com/*",
+        "*://*.googleadservices.com/*",
+        "*://adservice.google.com/*",
+        "*://*.hotjar.com/*",
+        "*://*.clarity.ms/*",
+        "*://connect.facebook.net/*",
+        "*://*.facebook.com/tr*",
+        "*://analytics.twitter.com/*",
+        "*://static.ads-twitter.com/*",
+        "*://*.amplitude.com/*",
+        "*://*.segment.io/*",
+        "*://*.mixpanel.com/*",
+        "*://*.criteo.com/*",
+        "*://*.criteo.net/*",
+        "*://*.taboola.com/*",
+        "*://*.outbrain.com/*",
+        "*://*.coinzilla.com/*",
+        "*://*.bitmedia.io/*",
+        "*://*.a-ads.com/*"
+    ]
+}
+
 # ===============================================================================
 # РАСПИСАНИЕ - ГИБКАЯ ЛОГИКА ПО ВРЕМЕНИ MSK
 # ===============================================================================
@@ -232,7 +276,9 @@ POST_SCHEDULE = {
     "daily_market_sentiment": {
         "time_range_msk": (16.35, 17.0),  # 16:21-17:00 (16:30 MSK)
         "sources": ["fear_greed", "altcoin_season", "btc_dominance"],
-        "selection": "random"
+        "selection": "random",
+        # Снимать 2 кандидата параллельно: публикуется первый успешный в случайном порядке
+        "speculative": 2
     },
     "crypto_liquidations_daily": {
         "time_range_msk": (17.85, 18.85),  # 17:51-18:51 (18:00 MSK) ✅ FIX: было 19.00, убрано пересечение
@@ -263,12 +309,35 @@ POST_SCHEDULE = {
     }
 }
 
+# Часовой пояс расписания (time_range_msk, window_msk, counted_msk)
+SCHEDULE_TIMEZONE = "Europe/Moscow"
+
+# Гарантированные публикации (heatmap 2 раза в день)
+# window_msk - окно принудительной публикации: шире слота, cron GitHub Actions опаздывает до 30+ минут
+# counted_msk - публикация источника в этом интервале засчитывается; одноименный слот POST_SCHEDULE
+#   после нее пропускается
+GUARANTEED_POSTS = {
+    "morning_heatmap": {"source": "heatmap_blockchain", "window_msk": (6.5, 9.5), "counted_msk": (6.0, 9.0)},
+    "evening_heatmap": {"source": "heatmap_blockchain", "window_msk": (18.5, 21.5), "counted_msk": (18.0, 21.0)}
+}
+
 # Настройки для обработки изображений
 IMAGE_SETTINGS = {
     "telegram_max_width": 1200,
     "telegram_min_width": 1000,
     "telegram_max_height": 1280,
-    "quality": 85,
+    "quality": 85,                  # Максимальный quality JPEG (кодировщик ищет лучший в лимите)
+    "jpeg_min_quality": 40,         # Ниже - изображение уменьшается
+    "jpeg_subsampling": "4:2:0",
+    "jpeg_try_444": False,          # Сначала пробовать 4:4:4 (четкий текст), если влезает
+    "jpeg_progressive": False,
+    # Рендишены из одного декодированного изображения (после crop/resize/padding)
+    "renditions": {
+        "telegram": {"max_bytes": 10 * 1024 * 1024},                                 # sendPhoto: 10 MB
+        "twitter": {"max_width": 4096, "max_height": 4096, "max_bytes": 5 * 1024 * 1024},  # media_upload: 5 MB
+        "ai": {"max_width": 2048, "max_height": 2048, "max_bytes": 1024 * 1024},     # OpenAI vision сам ужимает до 2048
+        "thumbnail": {"max_width": 320, "max_height": 640, "max_bytes": 64 * 1024, "quality": 70}
+    },
     "format": "JPEG",
     "crop_padding": 20,
     "add_padding_if_narrow": True,
@@ -281,5 +350,47 @@ SCREENSHOT_SETTINGS = {
     "viewport_height": 1080,
     "full_page": False,
     "wait_timeout": 30000,
-    "wait_after_load": 5
+    "wait_after_load": 5,
+    # Детектор готовности: wait_after_load + extra_wait - только верхняя граница
+    "ready_detection": True,
+    "ready_quiet_ms": 800,          # Сколько DOM/canvas должен не меняться
+    "network_idle_timeout": 3000,   # Максимум ожидания networkidle (мс)
+    # Daemon: за сколько секунд до слота загружать страницу (навигация, cookies, extra_wait),
+    # чтобы захват прошел ровно в момент открытия. Источник может переопределить
+    # ("prefetch_lead_seconds": 90), 0 - без предзагрузки
+    "prefetch_lead_seconds": 60
+}
+
+# Повторы захвата по классу отказа (общий лимит попыток - MAX_RETRIES)
+# retries - повторов для класса, backoff - пауза перед повтором (сек, x2 на каждый следующий),
+# fresh_context - новый контекст с другим user-agent и без сохраненного профиля,
+# breaker - отказ засчитывается домену (circuit breaker: домен пропускается в следующих запусках)
+RETRY_POLICIES = {
+    "navigation": {"retries": 2, "backoff": 5, "fresh_context": False, "breaker": True},   # таймаут/сеть page.goto
+    "antibot": {"retries": 1, "backoff": 10, "fresh_context": True, "breaker": True},      # Cloudflare, captcha, 403
+    "selector": {"retries": 0},                                                           # верстка изменилась - повтор не поможет
+    "image": {"retries": 1, "backoff": 0},                                                # снимаем заново с загруженной страницы
+    "unknown": {"retries": 2, "backoff": 3}
+}
+
+# Постоянный профиль браузера по домену источника
+# mode "storage_state" - cookies + localStorage (согласие на cookies), общий браузер
+# mode "user_data_dir" - полный профиль Chromium с HTTP-кэшем на диске
+#   (отдельный процесс Chromium на захват)
+# Источник может отказаться от профиля: "persistent_profile": False
+BROWSER_PROFILE_SETTINGS = {
+    "enabled": True,
+    "mode": "storage_state",
+    "max_size_mb": 200,      # Профиль больше - удаляется целиком
+    "max_age_hours": 72      # Профиль старше - удаляется (свежие cookies/бандлы)
+}
+
+# Пропуск публикации если скриншот визуально не изменился (dHash)
+# Хэш опубликованной версии хранится в publication_history.db (колонка publications.dhash)
+# Источник может отказаться: "dedupe": False (например, гарантированный heatmap)
+DEDUPE_SETTINGS = {
+    "enabled": True,
+    "hash_size": 16,         # dHash 16x16 = 256 бит
+    "max_distance": 6,       # Бит различий (Хэмминг) - не больше считается "не изменилось"
+    "max_age_hours": 24      # Последняя публикация старше - публикуем даже без изменений
 }
@@ -0,0 +1,125 @@
+"""
+Асинхронный клиент Telegram Bot API
+Version: 1.0.0
+
+- Один keep-alive пул соединений (httpx.AsyncClient) на event loop
+- HTTP 429: ждем parameters.retry_after из ответа Telegram
+- 5xx и сетевые ошибки: экспоненциальная пауза с jitter
+- Не блокирует event loop - можно вызывать параллельно из батча
+"""
+
+import asyncio
+import logging
+import os
+import random
+
+logger = logging.getLogger(__name__)
+# httpx логирует URL запроса, а в URL Bot API - токен
+logging.getLogger('httpx').setLevel(logging.WARNING)
+
+TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+# Повторы: всего попыток = TELEGRAM_MAX_RETRIES + 1
+TELEGRAM_MAX_RETRIES = int(os.getenv('TELEGRAM_MAX_RETRIES', '3'))
+TELEGRAM_BACKOFF_BASE = float(os.getenv('TELEGRAM_BACKOFF_BASE', '1.0'))
+# retry_after больше лимита - не ждем (например, flood-бан на час)
+TELEGRAM_MAX_RETRY_AFTER = int(os.getenv('TELEGRAM_MAX_RETRY_AFTER', '60'))
+
+# Пул соединений привязан к event loop, в котором создан
+_session = None
+_session_loop = None
+
+
+def get_session():
+    """Возвращает keep-alive сессию для текущего event loop (создает при первом вызове)"""
+    global _session, _session_loop
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    if _session is None or _session.is_closed or _session_loop is not loop:
+        _session = httpx.AsyncClient(
+            timeout=httpx.Timeout(30.0, connect=10.0),
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+        )
+        _session_loop = loop
+    return _session
+
+
+async def close_session():
+    """Закрывает пул соединений (в конце запуска)"""
+    global _session, _session_loop
+    if _session is not None and not _session.is_closed and _session_loop is asyncio.get_running_loop():
+        await _session.aclose()
+    _session = None
+    _session_loop = None
+
+
+def get_backoff_delay(attempt):
+    """Экспоненциальная пауза с jitter: случайно в [base * 2^attempt / 2, base * 2^attempt]"""
+    delay = TELEGRAM_BACKOFF_BASE * (2 ** attempt)
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def telegram_request(method, data=None, files=None, token=None, timeout=None):
+    """
+    Вызывает метод Bot API с повторами
+
+    Args:
+        method: Метод API (getMe, sendPhoto, ...)
+        data: Поля формы
+        files: Файлы multipart {"photo": (name, bytes, mime)}
+        token: Токен бота (по умолчанию TELEGRAM_BOT_TOKEN)
+        timeout: Таймаут запроса в секундах (по умолчанию таймаут сессии)
+
+    Returns:
+        dict: Ответ Telegram ({"ok": bool, ...}) или {"ok": False, "description": ...}
+              если запрос так и не удался
+    """
+    import httpx
+
+    url = f"{TELEGRAM_API_URL}/bot{token or TELEGRAM_BOT_TOKEN}/{method}"
+    last_error = None
+
+    for attempt in range(TELEGRAM_MAX_RETRIES + 1):
+        try:
+            response = await get_session().post(
+                url, data=data, files=files,
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+            )
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = {"ok": False, "error_code": response.status_code, "description": response.text[:200]}
+
+            if response.status_code == 429:
+                # retry_after 0 - повтор сразу, а не через секунду по умолчанию
+                retry_after = payload.get('parameters', {}).get('retry_after')
+                if retry_after is None:
+                    retry_after = int(response.headers.get('Retry-After', '1'))
+                if retry_after > TELEGRAM_MAX_RETRY_AFTER or attempt == TELEGRAM_MAX_RETRIES:
+                    logger.warning(f"  ⚠️ Telegram 429: retry_after {retry_after} сек - не повторяем")
+                    return payload
+                logger.warning(f"  ⏳ Telegram 429 ({method}): жду retry_after {retry_after} сек")
+                await asyncio.sleep(retry_after)
+                continue
+
+            if response.status_code >= 500:
+                last_error = f"HTTP {response.status_code}"
+            else:
+                return payload
+
+        except httpx.TransportError as e:
+            last_error = f"{type(e).__name__}: {e}"
+            # Запрос мог дойти: повтор sendPhoto после обрыва чтения = дубль поста
+            unsent = isinstance(e, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+            if not unsent and not method.startswith('get'):
+                logger.warning(f"  ⚠️ Telegram {method}: {last_error} - не повторяем (запрос мог быть доставлен)")
+                return {"ok": False, "description": last_error}
+
+        if attempt < TELEGRAM_MAX_RETRIES:
+            delay = get_backoff_delay(attempt)
+            logger.warning(f"  ⚠️ Telegram {method}: {last_error}, повтор через {delay:.1f} сек ({attempt + 1}/{TELEGRAM_MAX_RETRIES})")
+            await asyncio.sleep(delay)
+
+    return {"ok": False, "description": last_error}
@@ -0,0 +1,92 @@
+"""Тесты кэша ответов AI (openai_integration)"""
+
+import pytest
+
+import openai_integration
+
+SOURCE_KEY = 'fear_greed'
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(openai_integration, 'AI_CACHE_PATH', str(tmp_path / 'ai_comments.json'))
+    monkeypatch.setattr(openai_integration, 'AI_CACHE_TTL_HOURS', 24)
+    monkeypatch.setattr(openai_integration, 'AI_CACHE_MAX_ENTRIES', 2)
+    monkeypatch.setattr(openai_integration, '_ai_cache', None)
+    return openai_integration
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(openai_integration.time, 'time', lambda: now[0])
+    return now
+
+
+def store(cache, key, created_at):
+    cache.load_ai_cache()[key] = {"result": {"alpha_take": key}, "created_at": created_at, "used_at": created_at}
+    cache.save_ai_cache()
+
+
+def reload_cache(cache):
+    """Как следующий запуск: кэш читается из файла заново"""
+    cache._ai_cache = None
+
+
+def test_key_depends_on_source_prompt_and_image(cache):
+    key = cache.get_ai_cache_key(SOURCE_KEY, 'prompt', b'image')
+
+    assert key == cache.get_ai_cache_key(SOURCE_KEY, 'prompt', b'image')
+    assert cache.OPENAI_MODEL in key
+    assert key != cache.get_ai_cache_key('btc_etf', 'prompt', b'image')
+    assert key != cache.get_ai_cache_key(SOURCE_KEY, 'prompt v2', b'image')
+    assert key != cache.get_ai_cache_key(SOURCE_KEY, 'prompt', b'image2')
+
+
+def test_entry_expires_after_ttl(cache, clock):
+    store(cache, 'a', clock[0])
+
+    clock[0] += 23 * 3600
+    reload_cache(cache)
+    assert cache.get_cached_ai_comment('a') == {"alpha_take": 'a'}
+
+    clock[0] += 2 * 3600
+    assert cache.get_cached_ai_comment('a') is None
+    assert 'a' not in cache.load_ai_cache()
+
+
+def test_save_drops_expired_entries(cache, clock):
+    store(cache, 'old', clock[0] - 25 * 3600)
+    store(cache, 'fresh', clock[0])
+
+    reload_cache(cache)
+    assert list(cache.load_ai_cache()) == ['fresh']
+
+
+def test_lru_evicts_least_recently_used(cache, clock):
+    store(cache, 'a', clock[0])
+    clock[0] += 1
+    store(cache, 'b', clock[0])
+    clock[0] += 1
+    # Чтение 'a' делает ее свежей - вытесняется 'b', хотя записана позже
+    assert cache.get_cached_ai_comment('a')
+    clock[0] += 1
+    store(cache, 'c', clock[0])
+
+    reload_cache(cache)
+    assert list(cache.load_ai_cache()) == ['a', 'c']
+
+
+def test_cached_comment_skips_openai_request(cache, monkeypatch):
+    class FailingCompletions:
+        def create(self, **kwargs):
+            raise AssertionError("запрос к OpenAI при попадании в кэш")
+
+    class FakeClient:
+        chat = type('Chat', (), {'completions': FailingCompletions()})()
+
+    monkeypatch.setattr(openai_integration, 'get_client', lambda: FakeClient())
+    key = cache.get_ai_cache_key(SOURCE_KEY, openai_integration.SOURCE_PROMPTS[SOURCE_KEY], b'jpeg')
+    store(cache, key, openai_integration.time.time())
+
+    assert cache.get_ai_comment(SOURCE_KEY, b'jpeg') == {"alpha_take": key}
@@ -0,0 +1,78 @@
+"""Тесты планового пропуска источника с разомкнутым circuit breaker (plan.py, парсер)"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import circuit_breaker
+import plan
+import screenshot_parser
+
+MSK = timezone(timedelta(hours=3))
+# 18:00 MSK - слот crypto_liquidations_daily с единственным источником
+SLOT_TIME = datetime(2026, 10, 18, 18, 0, tzinfo=MSK)
+SOURCE_KEY = 'crypto_liquidations'
+
+
+class SlotDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return SLOT_TIME.astimezone(tz)
+
+
+@pytest.fixture
+def breaker(tmp_path, monkeypatch, history_db):
+    monkeypatch.setattr(circuit_breaker, 'CIRCUIT_BREAKER_PATH', str(tmp_path / 'circuit_breaker.json'))
+    monkeypatch.setattr(circuit_breaker, '_breaker_state', None)
+    monkeypatch.setattr(plan, 'datetime', SlotDatetime)
+    return circuit_breaker
+
+
+def open_breaker(breaker):
+    domain = screenshot_parser.get_source_domain(screenshot_parser.SCREENSHOT_SOURCES[SOURCE_KEY]['url'])
+    for _ in range(breaker.BREAKER_FAILURE_THRESHOLD):
+        breaker.record_failure(domain, 'antibot')
+
+
+def test_plan_due_when_breaker_closed(breaker):
+    result = plan.plan()
+
+    assert result['due'] is True
+    assert result['source'] == SOURCE_KEY
+    assert result['skip_reason'] is None
+
+
+def test_plan_skips_open_domain(breaker):
+    open_breaker(breaker)
+
+    result = plan.plan()
+
+    assert result['due'] is False
+    assert result['source'] == SOURCE_KEY
+    assert result['skip_reason'] == "breaker open"
+    assert datetime.fromisoformat(result['breaker_open_until']) > datetime.now(timezone.utc)
+
+
+def test_github_output_has_skip_reason(breaker, tmp_path, monkeypatch):
+    open_breaker(breaker)
+    output = tmp_path / 'github_output'
+    monkeypatch.setenv('GITHUB_OUTPUT', str(output))
+
+    plan.write_github_output(plan.plan())
+
+    assert output.read_text(encoding='utf-8').splitlines() == [
+        'due=false', f'source={SOURCE_KEY}', 'skip_reason=breaker open'
+    ]
+
+
+def test_capture_and_publish_skips_open_domain_without_error(breaker, monkeypatch):
+    open_breaker(breaker)
+
+    async def no_capture(*args, **kwargs):
+        raise AssertionError("захват разомкнутого домена")
+
+    monkeypatch.setattr(screenshot_parser, 'capture_source', no_capture)
+    source_config = screenshot_parser.SCREENSHOT_SOURCES[SOURCE_KEY]
+
+    assert asyncio.run(screenshot_parser.capture_and_publish(None, SOURCE_KEY, source_config, candidates=[SOURCE_KEY])) is None
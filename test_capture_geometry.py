@@ -0,0 +1,25 @@
+"""Тесты геометрии захвата: clip, viewport, crop (без браузера)"""
+
+from screenshot_parser import apply_crop_to_clip, clamp_clip_to_viewport
+
+VIEWPORT = {'width': 1920, 'height': 1080}
+ETF_CROP = {"top": 50, "right": 30, "bottom": 220, "left": 0}
+
+
+def test_crop_counts_from_clamped_bottom_edge():
+    # Элемент выше viewport: bottom crop отсчитывается от края снятой области, а не элемента
+    region = clamp_clip_to_viewport({'x': 0, 'y': 0, 'width': 1250, 'height': 3050}, VIEWPORT)
+    clip = apply_crop_to_clip(region, ETF_CROP)
+
+    assert clip == {'x': 0, 'y': 50, 'width': 1220, 'height': 810}
+    assert clip['y'] + clip['height'] == VIEWPORT['height'] - ETF_CROP['bottom']
+
+
+def test_clamp_keeps_region_inside_viewport():
+    region = clamp_clip_to_viewport({'x': 1800, 'y': 100, 'width': 400, 'height': 200}, VIEWPORT)
+
+    assert region == {'x': 1800, 'y': 100, 'width': 120, 'height': 200}
+
+
+def test_crop_larger_than_region():
+    assert apply_crop_to_clip({'x': 0, 'y': 0, 'width': 100, 'height': 100}, {"top": 60, "bottom": 60}) is None
@@ -0,0 +1,96 @@
+"""Тесты повторов захвата (capture_source) с продолжением с упавшего этапа"""
+
+import asyncio
+
+import pytest
+
+import screenshot_parser
+
+SOURCE_KEY = 'fear_greed'
+
+
+class FakePage:
+    def __init__(self, url):
+        self.url = url
+
+    def is_closed(self):
+        return False
+
+
+class FakeContext:
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def capture_env(monkeypatch):
+    """capture_source без браузера: этапы до capture записывают вызовы"""
+    source_config = screenshot_parser.SCREENSHOT_SOURCES[SOURCE_KEY]
+    calls = []
+
+    async def create_context(browser, config, profile=None, user_agent=None):
+        return FakeContext()
+
+    async def create_page(context, config):
+        return FakePage(config['url'])
+
+    async def setup_blocking(context, config):
+        return {}
+
+    async def no_frame(page):
+        pass
+
+    def make_stage(name):
+        async def stage(page, config, key, profile, state):
+            calls.append(name)
+            if name == 'capture':
+                state['screenshot_bytes'] = b'png'
+                state['crop_in_clip'] = False
+        return stage
+
+    for name in ('navigate', 'consent', 'ready', 'cleanup', 'capture'):
+        monkeypatch.setitem(screenshot_parser.CAPTURE_STAGE_FUNCTIONS, name, make_stage(name))
+    monkeypatch.setattr(screenshot_parser, 'get_open_until', lambda domain: None)
+    monkeypatch.setattr(screenshot_parser, 'record_domain_success', lambda domain: None)
+    monkeypatch.setattr(screenshot_parser, 'record_domain_failure', lambda domain, failure: None)
+    monkeypatch.setattr(screenshot_parser, 'open_browser_profile', lambda config: None)
+    monkeypatch.setattr(screenshot_parser, 'create_source_context', create_context)
+    monkeypatch.setattr(screenshot_parser, 'create_source_page', create_page)
+    monkeypatch.setattr(screenshot_parser, 'setup_request_blocking', setup_blocking)
+    monkeypatch.setattr(screenshot_parser, 'wait_for_next_frame', no_frame)
+    monkeypatch.setattr(screenshot_parser, 'archive_screenshot', lambda *args: None)
+    return source_config, calls
+
+
+def test_render_image_failure_returns_nothing():
+    assert screenshot_parser.render_image(b'not an image') == (None, None)
+
+
+def test_process_failure_resumes_at_capture(capture_env, monkeypatch):
+    source_config, calls = capture_env
+    rendered = []
+
+    def render(image, skip_width_padding=False, crop=None):
+        rendered.append(image)
+        if len(rendered) == 1:
+            return None, None
+        return {"telegram": {"bytes": b'jpeg', "size": (10, 10), "quality": 90, "reused": False}}, 'ab' * 32
+
+    monkeypatch.setattr(screenshot_parser, 'render_image', render)
+
+    result = asyncio.run(screenshot_parser.capture_source(None, SOURCE_KEY, source_config))
+
+    assert result['image_bytes'] == b'jpeg'
+    assert result['dhash'] == 'ab' * 32
+    # Навигация и ожидания не повторяются: второй проход начинается с capture
+    assert calls == ['navigate', 'consent', 'ready', 'cleanup', 'capture', 'capture']
+
+
+def test_process_failure_gives_up_after_image_retries(capture_env, monkeypatch):
+    source_config, calls = capture_env
+    monkeypatch.setattr(screenshot_parser, 'render_image', lambda image, **kwargs: (None, None))
+
+    assert asyncio.run(screenshot_parser.capture_source(None, SOURCE_KEY, source_config)) is None
+    retries = screenshot_parser.RETRY_POLICIES['image']['retries']
+    assert calls.count('capture') == 1 + retries
+    assert calls.count('navigate') == 1
@@ -0,0 +1,54 @@
+"""Тесты circuit breaker по домену"""
+
+import pytest
+
+import circuit_breaker
+
+
+@pytest.fixture
+def breaker(tmp_path, monkeypatch):
+    monkeypatch.setattr(circuit_breaker, 'CIRCUIT_BREAKER_PATH', str(tmp_path / 'circuit_breaker.json'))
+    monkeypatch.setattr(circuit_breaker, 'BREAKER_FAILURE_THRESHOLD', 3)
+    monkeypatch.setattr(circuit_breaker, 'BREAKER_COOLDOWN_HOURS', 6)
+    monkeypatch.setattr(circuit_breaker, '_breaker_state', None)
+    return circuit_breaker
+
+
+def reload_state(breaker):
+    """Как следующий запуск: состояние читается из файла заново"""
+    breaker._breaker_state = None
+
+
+def test_opens_after_threshold_and_persists(breaker):
+    for _ in range(2):
+        breaker.record_failure('coinmarketcap.com', 'antibot')
+    assert breaker.get_open_until('coinmarketcap.com') is None
+
+    breaker.record_failure('coinmarketcap.com', 'antibot')
+    reload_state(breaker)
+    assert breaker.get_open_until('coinmarketcap.com') is not None
+    assert breaker.get_open_until('blockchain.com') is None
+
+
+def test_success_resets_counter(breaker):
+    for _ in range(2):
+        breaker.record_failure('coinmarketcap.com', 'navigation')
+    breaker.record_success('coinmarketcap.com')
+    breaker.record_failure('coinmarketcap.com', 'navigation')
+
+    reload_state(breaker)
+    assert breaker.get_open_until('coinmarketcap.com') is None
+
+
+def test_half_open_failure_reopens(breaker, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(circuit_breaker.time, 'time', lambda: clock[0])
+    for _ in range(3):
+        breaker.record_failure('coinmarketcap.com', 'antibot')
+
+    # Пауза прошла: одна пробная попытка разрешена
+    clock[0] += 6 * 3600 + 1
+    assert breaker.get_open_until('coinmarketcap.com') is None
+
+    breaker.record_failure('coinmarketcap.com', 'antibot')
+    assert breaker.get_open_until('coinmarketcap.com') == clock[0] + 6 * 3600
@@ -0,0 +1,81 @@
+"""Тесты обработки cookie-баннеров (accept_cookies, stage_consent)"""
+
+import asyncio
+
+import pytest
+
+import screenshot_parser
+
+
+class FakePage:
+    """Страница, на которой CONSENT_PROBE_JS "кликает" по кнопке clicked"""
+
+    url = 'https://coinmarketcap.com/'
+
+    def __init__(self, clicked=None):
+        self.clicked = clicked
+        self.probes = 0
+        self.styles = []
+
+    async def evaluate(self, script, args=None):
+        self.probes += 1
+        return self.clicked
+
+    async def wait_for_selector(self, selector, state=None, timeout=None):
+        pass
+
+    async def add_style_tag(self, content=None):
+        self.styles.append(content)
+
+
+@pytest.fixture(autouse=True)
+def consent_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(screenshot_parser, 'CONSENT_CACHE_PATH', str(tmp_path / 'consent_cache.json'))
+    monkeypatch.setattr(screenshot_parser, '_consent_cache', None)
+
+
+def stored_consent_profile():
+    return {"domain": 'coinmarketcap.com', "meta": {"consent_accepted": True}}
+
+
+def test_accept_button_counts_as_consent():
+    page = FakePage('button:has-text("Accept All Cookies")')
+
+    assert asyncio.run(screenshot_parser.accept_cookies(page, 'coinmarketcap.com')) is True
+    assert page.styles == []
+
+
+@pytest.mark.parametrize("clicked", ['[aria-label="Close"]', 'button[class*="close"]', 'button:text-is("OK")'])
+def test_closing_banner_is_not_consent(clicked):
+    page = FakePage(clicked)
+
+    assert asyncio.run(screenshot_parser.accept_cookies(page, 'coinmarketcap.com')) is False
+
+
+def test_no_button_hides_banners_with_css():
+    page = FakePage(None)
+
+    assert asyncio.run(screenshot_parser.accept_cookies(page, 'coinmarketcap.com')) is False
+    assert page.styles == [screenshot_parser.CONSENT_HIDE_CSS]
+
+
+def test_stored_consent_still_probes_for_banner():
+    page = FakePage(None)
+    state = screenshot_parser.new_capture_state()
+    source_config = screenshot_parser.SCREENSHOT_SOURCES['fear_greed']
+
+    asyncio.run(screenshot_parser.stage_consent(page, source_config, 'fear_greed', stored_consent_profile(), state))
+
+    assert page.probes == 1
+    assert page.styles == [screenshot_parser.CONSENT_HIDE_CSS]
+    assert state['consent_accepted'] is False
+
+
+def test_stored_consent_accepts_returning_banner():
+    page = FakePage('button:has-text("Accept Cookies and Continue")')
+    state = screenshot_parser.new_capture_state()
+    source_config = screenshot_parser.SCREENSHOT_SOURCES['fear_greed']
+
+    asyncio.run(screenshot_parser.stage_consent(page, source_config, 'fear_greed', stored_consent_profile(), state))
+
+    assert state['consent_accepted'] is True
@@ -0,0 +1,55 @@
+"""Тесты кэша проверки учетных данных"""
+
+import pytest
+
+import credentials_cache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(credentials_cache, 'CREDENTIALS_CACHE_PATH', str(tmp_path / 'credentials.json'))
+    monkeypatch.setattr(credentials_cache, 'CREDENTIALS_TTL_HOURS', 24)
+    monkeypatch.setattr(credentials_cache, 'CREDENTIALS_INVALID_TTL_HOURS', 1)
+    monkeypatch.setattr(credentials_cache, '_credentials_cache', None)
+    return credentials_cache
+
+
+def test_secret_is_not_stored(cache, tmp_path):
+    secret_hash = cache.hash_secret('123:token')
+    cache.store_validation('telegram', secret_hash, True, {"username": "bot"})
+
+    content = (tmp_path / 'credentials.json').read_text(encoding='utf-8')
+    assert '123:token' not in content
+    assert secret_hash in content
+
+
+def test_cached_until_ttl(cache, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(credentials_cache.time, 'time', lambda: clock[0])
+    secret_hash = cache.hash_secret('123:token')
+    cache.store_validation('telegram', secret_hash, True)
+
+    clock[0] += 23 * 3600
+    assert cache.get_cached_validation('telegram', secret_hash)['valid'] is True
+    clock[0] += 2 * 3600
+    assert cache.get_cached_validation('telegram', secret_hash) is None
+
+
+def test_invalid_result_has_shorter_ttl(cache, monkeypatch):
+    clock = [1_000_000.0]
+    monkeypatch.setattr(credentials_cache.time, 'time', lambda: clock[0])
+    secret_hash = cache.hash_secret('bad')
+    cache.store_validation('openai', secret_hash, False)
+
+    assert cache.get_cached_validation('openai', secret_hash)['valid'] is False
+    clock[0] += 3601
+    assert cache.get_cached_validation('openai', secret_hash) is None
+
+
+def test_token_change_and_invalidate(cache):
+    old_hash = cache.hash_secret('old')
+    cache.store_validation('telegram', old_hash, True)
+
+    assert cache.get_cached_validation('telegram', cache.hash_secret('new')) is None
+    cache.invalidate('telegram')
+    assert cache.get_cached_validation('telegram', old_hash) is None
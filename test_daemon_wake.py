@@ -0,0 +1,84 @@
+"""Тесты расписания пробуждений daemon (get_daemon_wake) на фиктивных часах"""
+
+from datetime import datetime, timedelta, timezone
+
+import screenshot_parser
+from screenshot_parser import get_daemon_wake, get_next_slot_start
+
+MSK = timezone(timedelta(hours=3))
+START = datetime(2026, 10, 18, 0, 0, tzinfo=MSK)
+
+
+def run_daemon_clock(hours, success=True):
+    """
+    Прогоняет цикл daemon без захватов: предзагрузка ничего не выбирает,
+    время стоит на месте между пробуждениями
+
+    Returns:
+        list: Моменты пробуждений
+    """
+    now = START
+    upcoming = None
+    wakes = []
+    while now < START + timedelta(hours=hours):
+        wake_at, upcoming = get_daemon_wake(now, upcoming, success)
+        assert wake_at >= now
+        wakes.append(wake_at)
+        assert len(wakes) < 1000, "daemon крутится без сна"
+        now = wake_at
+    return wakes
+
+
+def test_prefetch_without_source_sleeps_until_slot():
+    slot = get_next_slot_start(START)
+    now = slot - timedelta(seconds=30)
+
+    assert get_daemon_wake(now, slot) == (slot, None)
+
+
+def test_wake_ahead_of_next_slot_by_prefetch_lead():
+    slot = get_next_slot_start(START)
+    lead = timedelta(seconds=screenshot_parser.get_max_prefetch_lead())
+
+    assert get_daemon_wake(START) == (slot - lead, slot)
+
+
+def test_next_upcoming_is_after_handled_slot():
+    slot = get_next_slot_start(START)
+    wake_at, upcoming = get_daemon_wake(slot)
+
+    assert upcoming > slot
+    assert wake_at > slot
+
+
+def test_slot_within_lead_wakes_immediately():
+    slot = get_next_slot_start(START)
+    now = slot - timedelta(seconds=10)
+
+    assert get_daemon_wake(now) == (now, slot)
+
+
+def test_no_busy_loop_over_a_day():
+    wakes = run_daemon_clock(24)
+    # Не больше двух пробуждений на слот: предзагрузка и открытие
+    slots = set()
+    now = START
+    while now < START + timedelta(hours=24):
+        now = get_next_slot_start(now)
+        slots.add(now)
+    assert len(wakes) <= 2 * len(slots) + 1
+    assert len(wakes) == len(set(wakes))
+
+
+def test_failed_cycle_retries_inside_open_slot():
+    now = datetime(2026, 10, 18, 16, 25, tzinfo=MSK)
+    wake_at, upcoming = get_daemon_wake(now, None, success=False)
+
+    assert wake_at == now + timedelta(seconds=screenshot_parser.DAEMON_RETRY_SECONDS)
+    assert upcoming is None
+
+
+def test_failed_cycles_do_not_spin():
+    wakes = run_daemon_clock(24, success=False)
+    gaps = [later - earlier for earlier, later in zip(wakes, wakes[1:])]
+    assert min(gaps) > timedelta(0)
@@ -0,0 +1,59 @@
+"""Тесты истории публикаций (history_store)"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+MSK = timezone(timedelta(hours=3))
+
+
+def msk(hour, minute=0, day=18):
+    return datetime(2026, 10, day, hour, minute, tzinfo=MSK)
+
+
+def test_last_published_and_window(history_db):
+    history_db.record_publication('fear_greed', published_at=msk(10))
+    history_db.record_publication('fear_greed', published_at=msk(16, 30))
+    history_db.record_publication('altcoin_season', published_at=msk(17))
+
+    assert history_db.get_last_published('fear_greed') == msk(16, 30)
+    assert history_db.get_last_published('fear_greed', msk(9), msk(11)) == msk(10)
+    # Конец окна не включается
+    assert history_db.get_last_published('fear_greed', msk(11), msk(16, 30)) is None
+    assert history_db.get_last_published('btc_dominance') is None
+
+
+def test_count_publications(history_db):
+    for hour in (7, 19):
+        history_db.record_publication('heatmap_blockchain', published_at=msk(hour))
+    history_db.record_publication('heatmap_blockchain', published_at=msk(7, day=19))
+
+    assert history_db.count_publications('heatmap_blockchain', msk(0), msk(0, day=19)) == 2
+
+
+def test_last_hash_skips_rows_without_hash(history_db):
+    history_db.record_publication('eth_etf', dhash='ab' * 32, published_at=msk(20))
+    history_db.record_publication('eth_etf', published_at=msk(21))
+
+    assert history_db.get_last_hash('eth_etf') == ('ab' * 32, msk(20))
+    assert history_db.get_last_hash('btc_etf') == (None, None)
+
+
+def test_state_roundtrip(history_db):
+    history_db.set_state('twitter_retry_at', '2026-10-18T12:00:00+00:00')
+    assert history_db.get_state('twitter_retry_at') == '2026-10-18T12:00:00+00:00'
+    history_db.set_state('twitter_retry_at', None)
+    assert history_db.get_state('twitter_retry_at') is None
+
+
+def test_legacy_json_imported_once(history_db, tmp_path):
+    (tmp_path / 'publication_history.json').write_text(json.dumps({
+        "last_published": {"fear_greed": "2026-10-18T13:30:00+00:00", "broken": "not a date"},
+        "last_publication": {"source": "fear_greed", "name": "Fear & Greed", "telegram": True},
+        "twitter_retry_at": "2026-10-18T14:00:00+00:00"
+    }), encoding='utf-8')
+
+    assert history_db.get_last_published('fear_greed') == msk(16, 30)
+    assert history_db.get_state('twitter_retry_at') == "2026-10-18T14:00:00+00:00"
+
+    history_db.close_history_db()
+    assert history_db.count_publications('fear_greed', msk(0), msk(0, day=19)) == 1
@@ -0,0 +1,67 @@
+"""Тесты JPEG-кодирования под лимит и dHash (image_pipeline)"""
+
+import random
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+from image_pipeline import build_renditions, dhash, encode_jpeg_to_budget, hash_distance
+
+
+def noisy_image(width=800, height=600, seed=1):
+    """Шум плохо сжимается: quality реально приходится подбирать"""
+    rng = random.Random(seed)
+    return Image.frombytes('RGB', (width, height), bytes(rng.getrandbits(8) for _ in range(width * height * 3)))
+
+
+def chart_image(shift=0):
+    img = Image.new('RGB', (640, 360), 'white')
+    draw = ImageDraw.Draw(img)
+    for x in range(0, 640, 40):
+        draw.rectangle([x, 360 - (x * 7 + shift) % 300, x + 30, 360], fill=(30, 160, 90))
+    return img
+
+
+def test_fits_at_max_quality_in_one_attempt():
+    data, params = encode_jpeg_to_budget(chart_image(), 1024 * 1024, max_quality=95)
+
+    assert len(data) <= 1024 * 1024
+    assert params['quality'] == 95
+    assert params['attempts'] == 1
+
+
+def test_quality_search_respects_budget():
+    budget = 150 * 1024
+    data, params = encode_jpeg_to_budget(noisy_image(), budget, max_quality=95, min_quality=20)
+
+    assert len(data) <= budget
+    assert 20 <= params['quality'] < 95
+    assert params['size'] == (800, 600)
+
+
+def test_downscales_when_min_quality_does_not_fit():
+    budget = 20 * 1024
+    data, params = encode_jpeg_to_budget(noisy_image(), budget, max_quality=90, min_quality=60)
+
+    assert len(data) <= budget
+    assert params['size'][0] < 800
+
+
+def test_renditions_respect_limits():
+    renditions = build_renditions(noisy_image(), {
+        "full": {"max_bytes": 10 * 1024 * 1024},
+        "small": {"max_width": 200, "max_height": 200, "max_bytes": 32 * 1024}
+    })
+
+    assert set(renditions) == {"full", "small"}
+    assert len(renditions['small']['bytes']) <= 32 * 1024
+    assert max(renditions['small']['size']) <= 200
+
+
+def test_dhash_tolerates_reencode_and_detects_change():
+    original = chart_image()
+    reencoded = Image.open(BytesIO(encode_jpeg_to_budget(original, 50 * 1024, max_quality=60)[0]))
+    changed = chart_image(shift=120)
+
+    assert hash_distance(dhash(original), dhash(reencoded)) <= 6
+    assert hash_distance(dhash(original), dhash(changed)) > 6
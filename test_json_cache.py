@@ -0,0 +1,30 @@
+"""Тесты атомарных JSON-кэшей (json_cache)"""
+
+import json
+
+from json_cache import load_json_cache, save_json_cache
+
+
+def test_roundtrip_creates_directory(tmp_path):
+    path = tmp_path / 'nested' / 'cache.json'
+
+    assert save_json_cache(str(path), {"домен": {"failures": 2}}, "кэша")
+    assert load_json_cache(str(path), "кэша") == {"домен": {"failures": 2}}
+
+
+def test_missing_or_broken_file_loads_empty(tmp_path):
+    path = tmp_path / 'cache.json'
+    assert load_json_cache(str(path), "кэша") == {}
+
+    path.write_text('{"truncated": ', encoding='utf-8')
+    assert load_json_cache(str(path), "кэша") == {}
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    path = tmp_path / 'cache.json'
+    save_json_cache(str(path), {"a": 1}, "кэша")
+
+    # json.dump падает на середине записи: прежний файл цел, временный удален
+    assert not save_json_cache(str(path), {"b": 2, "c": object()}, "кэша")
+    assert json.loads(path.read_text(encoding='utf-8')) == {"a": 1}
+    assert [p.name for p in tmp_path.iterdir()] == ['cache.json']
@@ -0,0 +1,38 @@
+"""Тесты публикации скриншота (publish_screenshot)"""
+
+import asyncio
+import threading
+
+import screenshot_parser
+
+SOURCE_KEY = 'fear_greed'
+
+
+def test_ai_comment_runs_off_event_loop(history_db, monkeypatch):
+    ai_threads = []
+    captions = []
+
+    def fake_ai_comment(source_key, image):
+        ai_threads.append(threading.current_thread())
+        return {"indicator_line": None, "alpha_take": "Fear is rising", "context_tag": None, "hashtags": None}
+
+    async def fake_send_photo(photo, caption, parse_mode='HTML', chat_ids=None):
+        captions.append(caption)
+        return True
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr(screenshot_parser, 'OPENAI_ENABLED', True)
+    monkeypatch.setattr(screenshot_parser, 'TWITTER_ENABLED', False)
+    monkeypatch.setattr(screenshot_parser, 'get_ai_comment', fake_ai_comment)
+    monkeypatch.setattr(screenshot_parser, 'send_telegram_photo', fake_send_photo)
+    monkeypatch.setattr(screenshot_parser.asyncio, 'sleep', no_sleep)
+    result = {"image_bytes": b'jpeg', "renditions": {"telegram": {"bytes": b'jpeg'}}, "dhash": None}
+
+    published = asyncio.run(screenshot_parser.publish_screenshot(SOURCE_KEY, screenshot_parser.SCREENSHOT_SOURCES[SOURCE_KEY], result))
+
+    assert published['telegram'] is True
+    # Синхронный запрос к OpenAI не блокирует event loop
+    assert ai_threads and ai_threads[0] is not threading.main_thread()
+    assert "Fear is rising" in captions[0]
@@ -0,0 +1,46 @@
+"""Тесты правил блокировки запросов (без браузера)"""
+
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from screenshot_parser import build_block_rules
+
+
+def test_block_regex_matches_globs():
+    _, url_regex = build_block_rules({})
+
+    assert url_regex.match('https://www.google-analytics.com/g/collect?v=2')
+    assert url_regex.match('https://www.facebook.com/tr?id=1')
+    assert not url_regex.match('https://coinmarketcap.com/charts/')
+    assert not url_regex.match('https://www.google-analytics.com')
+
+
+def test_block_rules_disabled():
+    assert build_block_rules({"block_resources": False}) == (set(), None)
+
+
+def find_playwright_node():
+    try:
+        import playwright
+    except ImportError:
+        return None
+    node = os.path.join(os.path.dirname(playwright.__file__), 'driver', 'node')
+    return node if os.path.exists(node) else shutil.which('node')
+
+
+@pytest.mark.skipif(not find_playwright_node(), reason="нет node драйвера Playwright")
+def test_block_regex_is_valid_javascript():
+    # context.route передает regex.pattern в new RegExp() драйвера
+    _, url_regex = build_block_rules({})
+    script = (
+        f"const re = new RegExp({json.dumps(url_regex.pattern)});"
+        "console.log(re.test('https://stats.g.doubleclick.net/j/collect'), re.test('https://coinmarketcap.com/'))"
+    )
+    result = subprocess.run([find_playwright_node(), '-e', script], capture_output=True, text=True, timeout=30)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ['true', 'false']
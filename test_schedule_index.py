@@ -0,0 +1,90 @@
+"""Тесты индекса расписания (schedule_index)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from schedule_index import compile_schedule, due_slots, next_slot, to_schedule_time
+
+MSK = timezone(timedelta(hours=3))
+
+
+def msk(hour, minute=0, second=0, day=18):
+    return datetime(2026, 10, day, hour, minute, second, tzinfo=MSK)
+
+
+def names(slots):
+    return [slot['name'] for slot in slots]
+
+
+def test_due_slot_start_is_inclusive():
+    assert names(due_slots(msk(16, 21))) == ['daily_market_sentiment']
+
+
+def test_due_slot_end_is_exclusive():
+    assert names(due_slots(msk(16, 59, 59))) == ['daily_market_sentiment']
+    assert due_slots(msk(17, 0)) == []
+
+
+def test_no_due_slot_before_first_start():
+    assert due_slots(msk(6, 50, 59)) == []
+
+
+def test_due_slot_bounds_are_utc():
+    slot = due_slots(msk(7, 0))[0]
+    assert slot['name'] == 'morning_heatmap'
+    assert slot['start'] == datetime(2026, 10, 18, 3, 51, tzinfo=timezone.utc)
+    assert slot['end'] == datetime(2026, 10, 18, 5, 0, tzinfo=timezone.utc)
+
+
+def test_guaranteed_windows_are_separate_index():
+    assert names(due_slots(msk(6, 30), guaranteed=True)) == ['morning_heatmap']
+    assert due_slots(msk(6, 30)) == []
+
+
+def test_next_slot_is_strictly_after():
+    slot = next_slot(msk(16, 21))
+    assert slot['name'] == 'crypto_liquidations_daily'
+    assert to_schedule_time(slot['start']) == msk(17, 51)
+
+
+def test_next_slot_rolls_over_to_next_day():
+    slot = next_slot(msk(23, 59))
+    assert slot['name'] == 'morning_heatmap'
+    assert to_schedule_time(slot['start']) == msk(6, 51, day=19)
+
+
+def test_next_guaranteed_window_rolls_over():
+    slot = next_slot(msk(21, 30), guaranteed=True)
+    assert slot['name'] == 'morning_heatmap'
+    assert to_schedule_time(slot['start']) == msk(6, 30, day=19)
+
+
+def test_compile_sorts_slots():
+    slots = compile_schedule({
+        "late": {"time_range_msk": (10, 11)},
+        "early": {"time_range_msk": (1, 2)}
+    })
+    assert names(slots) == ['early', 'late']
+    assert (slots[0]['start'], slots[0]['end']) == (60, 120)
+
+
+def test_compile_allows_touching_slots():
+    compile_schedule({
+        "a": {"time_range_msk": (1, 2)},
+        "b": {"time_range_msk": (2, 3)}
+    })
+
+
+def test_compile_rejects_overlap():
+    with pytest.raises(ValueError, match="пересекаются"):
+        compile_schedule({
+            "a": {"time_range_msk": (1, 2)},
+            "b": {"time_range_msk": (1.5, 3)}
+        })
+
+
+@pytest.mark.parametrize("interval", [(2, 1), (3, 3), (23, 25), (-1, 1)])
+def test_compile_rejects_invalid_interval(interval):
+    with pytest.raises(ValueError, match="некорректный интервал"):
+        compile_schedule({"bad": {"time_range_msk": interval}})
@@ -0,0 +1,44 @@
+"""Тесты выбора источника по расписанию и истории публикаций"""
+
+from datetime import datetime, timedelta, timezone
+
+import screenshot_parser
+
+MSK = timezone(timedelta(hours=3))
+
+
+def msk(hour, minute=0, day=18):
+    return datetime(2026, 10, day, hour, minute, tzinfo=MSK)
+
+
+def test_guaranteed_heatmap_forced_when_missing(history_db):
+    # 06:40 - окно гарантии открыто, слот morning_heatmap (06:51) еще нет
+    assert screenshot_parser.get_source_by_schedule(msk(6, 40)) == 'heatmap_blockchain'
+
+
+def test_guaranteed_heatmap_counted_window(history_db):
+    history_db.record_publication('heatmap_blockchain', published_at=msk(6, 10))
+
+    # Публикация в counted_msk засчитана: ни окно гарантии, ни одноименный слот не срабатывают
+    assert screenshot_parser.get_source_by_schedule(msk(6, 40)) is None
+    assert screenshot_parser.get_source_by_schedule(msk(7)) is None
+
+
+def test_guaranteed_heatmap_previous_day_not_counted(history_db):
+    history_db.record_publication('heatmap_blockchain', published_at=msk(7, day=17))
+
+    assert screenshot_parser.get_source_by_schedule(msk(7)) == 'heatmap_blockchain'
+
+
+def test_cooldown_blocks_recent_source(history_db):
+    history_db.record_publication('top_gainers', published_at=msk(21, 40))
+
+    assert screenshot_parser.select_scheduled_source(msk(22)) == (None, None)
+
+
+def test_cooldown_expires(history_db):
+    history_db.record_publication('top_gainers', published_at=msk(21, 20))
+
+    source_key, source_config = screenshot_parser.select_scheduled_source(msk(22))
+    assert source_key == 'top_gainers'
+    assert source_config['name']
@@ -94,7 +94,10 @@ async def test_screenshot(source_key):
             
             # Оптимизируем
             print(f"🔧 Оптимизация для Telegram...")
-            optimized_path = optimize_image_for_telegram(screenshot_path)
+            optimized_bytes = optimize_image_for_telegram(screenshot_path)
+            optimized_path = f"screenshots/{source_key}_test_{timestamp}_optimized.jpg"
+            with open(optimized_path, 'wb') as f:
+                f.write(optimized_bytes)
             
             print()
             print("="*70)
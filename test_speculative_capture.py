@@ -0,0 +1,102 @@
+"""Тесты спекулятивного захвата (capture_speculative, get_speculative_candidates)"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import screenshot_parser
+
+MSK = timezone(timedelta(hours=3))
+# Слот daily_market_sentiment: fear_greed, altcoin_season, btc_dominance, speculative 2
+SLOT_TIME = datetime(2026, 10, 18, 16, 30, tzinfo=MSK)
+
+
+@pytest.fixture
+def captures(monkeypatch):
+    """
+    capture_source по плану: plan[key] = (задержка, результат или исключение);
+    задержка None - захват не завершается сам. cancelled - отмененные захваты
+    """
+    env = {"plan": {}, "cancelled": []}
+
+    async def fake_capture(browser, source_key, source_config, fire_at=None):
+        delay, outcome = env['plan'][source_key]
+        try:
+            if delay is None:
+                await asyncio.Event().wait()
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            env['cancelled'].append(source_key)
+            raise
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(screenshot_parser, 'capture_source', fake_capture)
+    return env
+
+
+def speculate(candidates):
+    return asyncio.run(screenshot_parser.capture_speculative(None, candidates))
+
+
+def test_first_success_in_order_wins_and_rest_cancelled(captures):
+    captures['plan'] = {
+        'fear_greed': (0, None),
+        'altcoin_season': (0.01, {"source_key": 'altcoin_season'}),
+        'btc_dominance': (None, {"source_key": 'btc_dominance'})
+    }
+
+    source_key, result = speculate(['fear_greed', 'altcoin_season', 'btc_dominance'])
+
+    assert source_key == 'altcoin_season'
+    assert result == {"source_key": 'altcoin_season'}
+    assert captures['cancelled'] == ['btc_dominance']
+
+
+def test_candidate_order_beats_speed(captures):
+    # Случайный порядок слота сохраняется: быстрый второй кандидат не обгоняет первого
+    captures['plan'] = {
+        'fear_greed': (0.05, {"source_key": 'fear_greed'}),
+        'altcoin_season': (0, {"source_key": 'altcoin_season'})
+    }
+
+    assert speculate(['fear_greed', 'altcoin_season'])[0] == 'fear_greed'
+
+
+def test_failed_candidate_falls_through(captures):
+    captures['plan'] = {
+        'fear_greed': (0, RuntimeError("browser crashed")),
+        'altcoin_season': (0, {"source_key": 'altcoin_season'})
+    }
+
+    assert speculate(['fear_greed', 'altcoin_season'])[0] == 'altcoin_season'
+
+
+def test_all_failed_returns_first_candidate(captures):
+    captures['plan'] = {'fear_greed': (0, None), 'altcoin_season': (0, None)}
+
+    assert speculate(['fear_greed', 'altcoin_season']) == ('fear_greed', None)
+    assert captures['cancelled'] == []
+
+
+def test_candidates_exclude_sources_on_cooldown(history_db):
+    history_db.record_publication('altcoin_season', published_at=SLOT_TIME - timedelta(minutes=10))
+
+    assert screenshot_parser.get_speculative_candidates('fear_greed', SLOT_TIME) == ['fear_greed', 'btc_dominance']
+
+
+def test_candidates_limited_by_speculative_count(history_db):
+    candidates = screenshot_parser.get_speculative_candidates('fear_greed', SLOT_TIME)
+
+    assert candidates[0] == 'fear_greed'
+    assert len(candidates) == 2
+    assert candidates[1] in ('altcoin_season', 'btc_dominance')
+
+
+def test_no_speculation_outside_random_slot(history_db):
+    # 18:00 MSK - слот crypto_liquidations_daily с фиксированным источником
+    now = datetime(2026, 10, 18, 18, 0, tzinfo=MSK)
+
+    assert screenshot_parser.get_speculative_candidates('crypto_liquidations', now) == ['crypto_liquidations']
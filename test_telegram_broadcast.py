@@ -0,0 +1,67 @@
+"""Тесты рассылки фото в несколько чатов (send_telegram_photo): одна загрузка + file_id"""
+
+import asyncio
+
+import pytest
+
+import screenshot_parser
+
+PHOTO = b'\xff\xd8jpeg\xff\xd9'
+FILE_ID = 'AgACAgIAAxkBAAI'
+
+
+@pytest.fixture
+def bot(monkeypatch):
+    """
+    telegram_request по чатам: replies[chat_id] - ответ Bot API или исключение
+    (по умолчанию успех); calls - отправленные запросы
+    """
+    env = {"replies": {}, "calls": [], "invalidated": []}
+
+    async def fake_request(method, data=None, files=None, token=None, timeout=None):
+        env['calls'].append({"chat_id": data['chat_id'], "upload": files is not None, "photo": data.get('photo')})
+        reply = env['replies'].get(data['chat_id'], {"ok": True, "result": {"photo": [{"file_id": 'small'}, {"file_id": FILE_ID}]}})
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(screenshot_parser, 'telegram_request', fake_request)
+    monkeypatch.setattr(screenshot_parser, 'invalidate_credentials', env['invalidated'].append)
+    return env
+
+
+def send(chat_ids):
+    return asyncio.run(screenshot_parser.send_telegram_photo(PHOTO, 'caption', chat_ids=chat_ids))
+
+
+def test_uploads_once_and_reuses_file_id(bot):
+    assert send(['a', 'b', 'c']) is True
+
+    assert [call['upload'] for call in bot['calls']] == [True, False, False]
+    assert [call['photo'] for call in bot['calls'][1:]] == [FILE_ID, FILE_ID]
+
+
+def test_partial_failure_still_delivers_to_other_chats(bot):
+    bot['replies'] = {
+        'b': RuntimeError("connection reset"),
+        'c': {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+    }
+
+    assert send(['a', 'b', 'c', 'd']) is True
+    assert [call['chat_id'] for call in bot['calls']] == ['a', 'b', 'c', 'd']
+    assert sum(call['upload'] for call in bot['calls']) == 1
+
+
+def test_upload_moves_to_next_chat_when_first_fails(bot):
+    bot['replies'] = {'a': {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked"}}
+
+    assert send(['a', 'b', 'c']) is True
+    assert [(call['chat_id'], call['upload']) for call in bot['calls']] == [('a', True), ('b', True), ('c', False)]
+
+
+def test_revoked_token_stops_broadcast(bot):
+    bot['replies'] = {'a': {"ok": False, "error_code": 401, "description": "Unauthorized"}}
+
+    assert send(['a', 'b']) is False
+    assert [call['chat_id'] for call in bot['calls']] == ['a']
+    assert bot['invalidated'] == ['telegram']
@@ -0,0 +1,124 @@
+"""Тесты повторов Telegram Bot API (telegram_client) на httpx.MockTransport"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import telegram_client
+
+
+@pytest.fixture
+def telegram(monkeypatch):
+    """
+    Bot API из очереди ответов: responses - httpx.Response или исключение
+    на каждый запрос; sleeps - паузы между попытками (без реального ожидания)
+    """
+    env = {"responses": [], "requests": [], "sleeps": []}
+
+    def handler(request):
+        env['requests'].append(request)
+        response = env['responses'].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def fake_sleep(delay):
+        env['sleeps'].append(delay)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(telegram_client, 'get_session', lambda: client)
+    monkeypatch.setattr(telegram_client.asyncio, 'sleep', fake_sleep)
+    monkeypatch.setattr(telegram_client, 'TELEGRAM_MAX_RETRIES', 3)
+    monkeypatch.setattr(telegram_client, 'TELEGRAM_BACKOFF_BASE', 1.0)
+    monkeypatch.setattr(telegram_client, 'TELEGRAM_MAX_RETRY_AFTER', 60)
+    return env
+
+
+def request(method='sendMessage'):
+    return asyncio.run(telegram_client.telegram_request(method, data={"chat_id": "1"}, token='TOKEN'))
+
+
+def ok():
+    return httpx.Response(200, json={"ok": True, "result": {"message_id": 1}})
+
+
+def too_many_requests(retry_after=None, header=None):
+    payload = {"ok": False, "error_code": 429, "description": "Too Many Requests"}
+    if retry_after is not None:
+        payload['parameters'] = {"retry_after": retry_after}
+    return httpx.Response(429, json=payload, headers={"Retry-After": header} if header else None)
+
+
+def test_429_waits_retry_after_then_succeeds(telegram):
+    telegram['responses'] = [too_many_requests(retry_after=5), ok()]
+
+    assert request()['ok'] is True
+    assert telegram['sleeps'] == [5]
+    assert len(telegram['requests']) == 2
+
+
+def test_429_retry_after_zero_retries_immediately(telegram):
+    telegram['responses'] = [too_many_requests(retry_after=0), ok()]
+
+    assert request()['ok'] is True
+    assert telegram['sleeps'] == [0]
+
+
+def test_429_falls_back_to_retry_after_header(telegram):
+    telegram['responses'] = [too_many_requests(header='3'), ok()]
+
+    assert request()['ok'] is True
+    assert telegram['sleeps'] == [3]
+
+
+def test_429_longer_than_limit_is_not_retried(telegram):
+    telegram['responses'] = [too_many_requests(retry_after=3600)]
+
+    assert request()['error_code'] == 429
+    assert telegram['sleeps'] == []
+
+
+def test_5xx_backs_off_then_gives_up(telegram):
+    telegram['responses'] = [httpx.Response(502, text='Bad Gateway') for _ in range(4)]
+
+    result = request()
+
+    assert result == {"ok": False, "description": "HTTP 502"}
+    assert len(telegram['requests']) == 4
+    assert len(telegram['sleeps']) == 3
+    # Экспоненциальная пауза с jitter: [2^n / 2, 2^n]
+    for attempt, delay in enumerate(telegram['sleeps']):
+        assert 2 ** attempt / 2 <= delay <= 2 ** attempt
+
+
+def test_5xx_then_success(telegram):
+    telegram['responses'] = [httpx.Response(500), ok()]
+
+    assert request()['ok'] is True
+    assert len(telegram['sleeps']) == 1
+
+
+def test_4xx_is_not_retried(telegram):
+    telegram['responses'] = [httpx.Response(400, json={"ok": False, "error_code": 400, "description": "Bad Request: chat not found"})]
+
+    result = request()
+
+    assert result['description'] == "Bad Request: chat not found"
+    assert len(telegram['requests']) == 1
+    assert telegram['sleeps'] == []
+
+
+def test_connect_error_is_retried(telegram):
+    telegram['responses'] = [httpx.ConnectError("connection refused"), ok()]
+
+    assert request('sendPhoto')['ok'] is True
+    assert len(telegram['requests']) == 2
+
+
+def test_read_error_on_send_is_not_retried(telegram):
+    # Запрос мог дойти до Telegram: повтор sendPhoto дал бы дубль поста
+    telegram['responses'] = [httpx.ReadTimeout("read timeout")]
+
+    assert request('sendPhoto')['ok'] is False
+    assert len(telegram['requests']) == 1